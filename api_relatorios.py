@@ -0,0 +1,187 @@
+# API HTTP local para outros sistemas gerarem relatórios sem passar pela página Streamlit
+#
+# Uso:
+#   python api_relatorios.py --porta 8600
+#   curl -F dados=@inspecao.json -F maquina=@maquina.jpg -F ba1=@ba1.jpg \
+#        http://127.0.0.1:8600/relatorios -o relatorio.pdf
+#
+# O pedido é multipart/form-data. O campo "dados" é um JSON no formato dos manifestos de
+# gerar_lote.py (capa, dados_gerais, dados_pas, tabelas e tópicos); no lugar dos caminhos,
+# cada foto é o nome do campo do formulário em que o arquivo foi enviado:
+#
+#   {
+#     "codigo_relatorio": "IQONY-INSP-01", "ambito_aplicacao": "...", "data_revisao": "12/04/2025",
+#     "imagem_maquina": "maquina",
+#     "imagens_pas": {"PÁ 1": ["pa1_a", "pa1_b"]},
+#     "tabelas_externas": [[{"Localizacao": "B. A", "Descricao": "...", "Area": "...", "Código": "2"}], [], []],
+#     "topicos_externos": [{"Superfície do B.A": {"fotos": ["ba1"], "obs": "..."}}, {}, {}],
+#     ...
+#   }
+#
+# A montagem roda nos processos de trabalho de `FilaRelatorios`; o laço de eventos só recebe
+# o pedido, espera o resultado e devolve o PDF em blocos. Respostas de erro são JSON
+# ({"erro": "..."}): 400 para pedidos inválidos, 503 com a fila cheia e 500 se a geração falhar.
+import argparse
+import asyncio
+import json
+import re
+import sys
+import threading
+import unicodedata
+import uuid
+from urllib.parse import quote
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import banco_defeitos
+from cache_imagens import DIRETORIO_PADRAO
+from fila_relatorios import FilaCheia, FilaRelatorios
+from gerar_lote import manifesto_para_dados
+from imagens import validar_imagem
+
+PORTA_PADRAO = 8600
+BLOCO_RESPOSTA = 64 * 1024
+MAX_ARQUIVOS = 200            # Fotos por pedido (o formulário completo tem pouco mais de 70)
+MAX_TAMANHO_DADOS = 4 * 1024 * 1024  # Tamanho máximo do JSON do campo "dados"
+
+
+class PedidoInvalido(ValueError):
+    """Pedido que não pode virar um relatório (resposta 400)."""
+
+
+async def _ler_pedido(request):
+    # Devolve (manifesto, {nome do campo: bytes da foto})
+    try:
+        formulario = await request.form(max_files=MAX_ARQUIVOS, max_part_size=MAX_TAMANHO_DADOS)
+    except Exception as e:
+        raise PedidoInvalido(f"formulário multipart inválido: {e}")
+    try:
+        dados = formulario.get("dados")
+        if dados is None:
+            raise PedidoInvalido('campo "dados" ausente')
+        if isinstance(dados, UploadFile):
+            dados = await dados.read()
+        try:
+            manifesto = json.loads(dados)
+        except ValueError as e:
+            raise PedidoInvalido(f'campo "dados" não é um JSON válido: {e}')
+        if not isinstance(manifesto, dict):
+            raise PedidoInvalido('campo "dados" deve ser um objeto JSON')
+
+        fotos = {}
+        for nome, valor in formulario.multi_items():
+            if isinstance(valor, UploadFile) and nome != "dados":
+                fotos[nome] = await valor.read()
+        return manifesto, fotos
+    finally:
+        await formulario.close()  # Apaga os temporários das fotos grandes
+
+
+def _ler_foto(fotos, nome):
+    if nome not in fotos:
+        raise PedidoInvalido(f'{nome}: nenhum arquivo enviado com esse nome')
+    erro = validar_imagem(fotos[nome])
+    if erro:
+        raise PedidoInvalido(f"{nome}: {erro}")
+    return fotos[nome]
+
+
+def _content_disposition(codigo_relatorio):
+    # Nome com acentos em filename* (RFC 6266) e uma versão só ASCII em filename, para clientes antigos;
+    # sem caracteres de controle, o código do relatório não consegue quebrar o cabeçalho
+    nome = re.sub(r'[\x00-\x1f\x7f"/\\]', "_", f"relatorio_{codigo_relatorio or 'inspecao'}.pdf")
+    ascii_ = re.sub(r"[^A-Za-z0-9._-]", "_", unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii"))
+    return f"attachment; filename=\"{ascii_}\"; filename*=UTF-8''{quote(nome, safe='')}"
+
+
+async def _em_blocos(pdf):
+    for inicio in range(0, len(pdf), BLOCO_RESPOSTA):
+        yield pdf[inicio:inicio + BLOCO_RESPOSTA]
+
+
+async def gerar_relatorio(request):
+    fila = request.app.state.fila
+    try:
+        manifesto, fotos = await _ler_pedido(request)
+        # A conferência das fotos e o hash delas em `enviar` passam por todos os bytes: fora do laço de eventos
+        dados = await asyncio.to_thread(manifesto_para_dados, manifesto, ler_foto=lambda nome: _ler_foto(fotos, nome))
+    except ValueError as e:  # PedidoInvalido, perfil desconhecido
+        return JSONResponse({"erro": str(e)}, status_code=400)
+    except (AttributeError, TypeError) as e:  # Ex.: tópicos como lista em vez de objeto
+        return JSONResponse({"erro": f'estrutura do campo "dados" inválida: {e}'}, status_code=400)
+
+    sessao = uuid.uuid4().hex  # Cada pedido é independente (pedidos iguais usam o PDF já gerado)
+    try:
+        id_trabalho = await asyncio.to_thread(fila.enviar, sessao, dados)
+    except FilaCheia as e:
+        return JSONResponse({"erro": str(e)}, status_code=503, headers={"Retry-After": "5"})
+    try:
+        pdf, metricas = await asyncio.wrap_future(fila.futuro(id_trabalho))
+    except Exception as e:
+        print(f"Erro ao gerar o relatório pela API: {e}")
+        return JSONResponse({"erro": f"falha ao gerar o relatório: {e}"}, status_code=500)
+    finally:
+        fila.encerrar_sessao(sessao)
+
+    return StreamingResponse(
+        _em_blocos(pdf),
+        media_type="application/pdf",
+        headers={
+            "Content-Length": str(len(pdf)),
+            "Content-Disposition": _content_disposition(dados["codigo_relatorio"]),
+            "X-Tempo-Geracao": f"{metricas['segundos']:.3f}",
+            "X-Paginas": str(metricas["paginas"]),
+            "X-Reaproveitado": "1" if metricas.get("em_cache") else "0",
+        },
+    )
+
+
+async def saude(request):
+    return JSONResponse({"ok": True})
+
+
+def criar_aplicacao(fila):
+    """Aplicação ASGI que gera os relatórios na `fila` informada."""
+    aplicacao = Starlette(routes=[
+        Route("/relatorios", gerar_relatorio, methods=["POST"]),
+        Route("/saude", saude, methods=["GET"]),
+    ])
+    aplicacao.state.fila = fila
+    return aplicacao
+
+
+def iniciar_em_segundo_plano(fila, porta=PORTA_PADRAO, host="127.0.0.1"):
+    """Sobe a API em uma thread do processo atual (ex.: ao lado da página Streamlit), com a mesma fila."""
+    servidor = uvicorn.Server(uvicorn.Config(criar_aplicacao(fila), host=host, port=porta, log_level="warning"))
+    threading.Thread(target=servidor.run, name="api_relatorios", daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local para gerar relatórios de inspeção.")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço onde a API escuta")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    parser.add_argument("--processos", type=int, help="processos de trabalho (padrão: metade dos núcleos)")
+    parser.add_argument("--sem-cache", action="store_true", help="não usa o cache de imagens preparadas")
+    parser.add_argument("--banco", default=banco_defeitos.CAMINHO_PADRAO, help="banco SQLite onde os defeitos são registrados")
+    parser.add_argument("--sem-banco", action="store_true", help="não registra os defeitos no banco")
+    args = parser.parse_args(argv)
+
+    fila = FilaRelatorios(
+        max_workers=args.processos,
+        diretorio_cache=None if args.sem_cache else DIRETORIO_PADRAO,
+        caminho_banco=None if args.sem_banco else args.banco,
+    )
+    try:
+        uvicorn.run(criar_aplicacao(fila), host=args.host, port=args.porta)
+    finally:
+        fila.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# Banco SQLite com os defeitos de todos os relatórios gerados, para consultas na frota inteira
+#
+# Uso (consulta pela linha de comando):
+#   python banco_defeitos.py --localizacao "B.A" --severidade-min 3
+#   python banco_defeitos.py --turbina "SM2-09" --pa 2
+#   python banco_defeitos.py --severidade-min 3 --pdf defeitos_frota.pdf
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+
+CAMINHO_PADRAO = "defeitos.sqlite"
+PERFIL_REGISTRADO = "final"  # Rascunhos não entram no banco: só a versão entregue ao cliente
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS relatorios (
+    id INTEGER PRIMARY KEY,
+    identidade TEXT NOT NULL UNIQUE,  -- ver `identidade_relatorio`
+    codigo_relatorio TEXT NOT NULL,
+    ambito_aplicacao TEXT NOT NULL,
+    data_revisao TEXT,
+    gerado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS defeitos (
+    relatorio_id INTEGER NOT NULL REFERENCES relatorios(id) ON DELETE CASCADE,
+    pa INTEGER NOT NULL,
+    inspecao TEXT NOT NULL,         -- "externa" ou "interna"
+    localizacao TEXT NOT NULL,      -- como aparece no relatório ("B. A", "B.A.")
+    localizacao_chave TEXT NOT NULL,  -- sem espaços e pontos ("BA"), para a busca
+    descricao TEXT,
+    area TEXT,
+    codigo TEXT,
+    severidade INTEGER              -- número do código (0 a 5), ou NULL se não informado
+);
+CREATE INDEX IF NOT EXISTS idx_defeitos_local_sev ON defeitos (localizacao_chave, severidade);
+CREATE INDEX IF NOT EXISTS idx_defeitos_sev ON defeitos (severidade);
+CREATE INDEX IF NOT EXISTS idx_defeitos_relatorio ON defeitos (relatorio_id, pa);
+
+-- Busca por palavras do âmbito de aplicação ("SM2-09" em "Complexo Eólico Cutia - WTG SM2-09"),
+-- mantida em dia pelos gatilhos
+CREATE VIRTUAL TABLE IF NOT EXISTS relatorios_busca USING fts5(ambito_aplicacao, content='relatorios', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS relatorios_busca_inclusao AFTER INSERT ON relatorios BEGIN
+    INSERT INTO relatorios_busca (rowid, ambito_aplicacao) VALUES (new.id, new.ambito_aplicacao);
+END;
+CREATE TRIGGER IF NOT EXISTS relatorios_busca_exclusao AFTER DELETE ON relatorios BEGIN
+    INSERT INTO relatorios_busca (relatorios_busca, rowid, ambito_aplicacao) VALUES ('delete', old.id, old.ambito_aplicacao);
+END;
+"""
+
+# Bancos criados antes da coluna `identidade`: os relatórios antigos ficam cada um com a sua
+_MIGRACAO_IDENTIDADE = """
+CREATE TABLE relatorios_novo (
+    id INTEGER PRIMARY KEY,
+    identidade TEXT NOT NULL UNIQUE,
+    codigo_relatorio TEXT NOT NULL,
+    ambito_aplicacao TEXT NOT NULL,
+    data_revisao TEXT,
+    gerado_em TEXT NOT NULL
+);
+INSERT INTO relatorios_novo SELECT id, 'antigo:' || id, codigo_relatorio, ambito_aplicacao, data_revisao, gerado_em FROM relatorios;
+DROP TABLE relatorios;
+ALTER TABLE relatorios_novo RENAME TO relatorios;
+"""
+
+
+def chave_localizacao(localizacao):
+    # "B. A", "B.A" e "b.a." viram "BA"
+    return re.sub(r"[\s.]", "", localizacao or "").upper()
+
+
+def severidade(codigo):
+    # O código de classificação é um número, às vezes com texto junto ("3", "3 - grave"); "-" fica sem severidade
+    encontrado = re.match(r"\s*(\d+)", str(codigo or ""))
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def conectar(caminho=CAMINHO_PADRAO):
+    """Abre (e cria, se preciso) o banco; seguro para vários processos gravando ao mesmo tempo."""
+    conexao = sqlite3.connect(caminho, timeout=30)
+    conexao.execute("PRAGMA journal_mode=WAL")  # Leituras não esperam gravações de outros processos
+    # Antes de ligar as chaves estrangeiras: apagar a tabela antiga não pode apagar os defeitos.
+    # Vários processos abrem o banco ao mesmo tempo: a conferência e a migração são uma transação só
+    conexao.execute("BEGIN IMMEDIATE")
+    colunas = {coluna[1] for coluna in conexao.execute("PRAGMA table_info(relatorios)")}
+    if colunas and "identidade" not in colunas:
+        for comando in _MIGRACAO_IDENTIDADE.split(";"):
+            conexao.execute(comando)
+    conexao.commit()
+    conexao.execute("PRAGMA foreign_keys=ON")
+    nova_busca = conexao.execute("SELECT 1 FROM sqlite_master WHERE name = 'relatorios_busca'").fetchone() is None
+    conexao.executescript(_ESQUEMA)
+    if nova_busca:  # Indexa os relatórios gravados antes da busca existir
+        conexao.execute("INSERT INTO relatorios_busca (relatorios_busca) VALUES ('rebuild')")
+        conexao.commit()
+    return conexao
+
+
+def _preenchido(valor):
+    return bool(valor) and valor.strip() not in ("", "-")
+
+
+def identidade_relatorio(dados):
+    """Identifica um relatório no banco: o `id_relatorio` dos dados, se houver.
+
+    Sem ele, um resumo do conteúdo gravado (cabeçalho e tabelas de defeitos): o mesmo
+    relatório gerado de novo cai na mesma identidade, e relatórios diferentes que
+    mantiveram o código e o âmbito padrão do formulário não se substituem.
+    """
+    if dados.get("id_relatorio"):
+        return str(dados["id_relatorio"])
+    conteudo = {campo: dados.get(campo) for campo in
+                ("codigo_relatorio", "ambito_aplicacao", "data_revisao", "tabelas_externas", "tabelas_internas")}
+    return "conteudo:" + hashlib.sha256(json.dumps(conteudo, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def campos_registrados(dados):
+    """Só os campos dos dados usados por `registrar_relatorio` (sem as fotos)."""
+    campos = ("perfil", "id_relatorio", "codigo_relatorio", "ambito_aplicacao", "data_revisao", "tabelas_externas", "tabelas_internas")
+    return {campo: dados[campo] for campo in campos if campo in dados}
+
+
+def registrar_relatorio(conexao, dados):
+    """Grava as tabelas de defeitos de um relatório (o dicionário de `montar_relatorio`).
+
+    Um relatório com a mesma identidade (ver `identidade_relatorio`) substitui o
+    anterior, então gerar de novo o mesmo relatório não duplica os defeitos. Só
+    relatórios do perfil final são gravados (devolve None para os rascunhos); linhas
+    sem nenhum campo preenchido não são gravadas.
+    """
+    if dados.get("perfil", PERFIL_REGISTRADO) != PERFIL_REGISTRADO:
+        return None
+    identidade = identidade_relatorio(dados)
+    with conexao:
+        conexao.execute("DELETE FROM relatorios WHERE identidade = ?", (identidade,))
+        cursor = conexao.execute(
+            "INSERT INTO relatorios (identidade, codigo_relatorio, ambito_aplicacao, data_revisao, gerado_em)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                identidade,
+                dados.get("codigo_relatorio", ""),
+                dados.get("ambito_aplicacao", ""),
+                str(dados.get("data_revisao", "")),
+                time.strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        relatorio_id = cursor.lastrowid
+
+        linhas = []
+        for inspecao, tabelas in (("externa", dados.get("tabelas_externas", [])), ("interna", dados.get("tabelas_internas", []))):
+            for numero_pa, tabela in enumerate(tabelas, start=1):
+                for linha in tabela:
+                    descricao, area, codigo = linha.get("Descricao"), linha.get("Area"), linha.get("Código")
+                    if not any(_preenchido(v) for v in (descricao, area, codigo)):
+                        continue
+                    linhas.append((
+                        relatorio_id, numero_pa, inspecao, linha["Localizacao"], chave_localizacao(linha["Localizacao"]),
+                        descricao, area, codigo, severidade(codigo),
+                    ))
+        conexao.executemany(
+            "INSERT INTO defeitos (relatorio_id, pa, inspecao, localizacao, localizacao_chave, descricao, area, codigo, severidade)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            linhas,
+        )
+    return relatorio_id
+
+
+def consultar(conexao, turbina=None, localizacao=None, severidade_min=None, severidades=None, pa=None, inspecao=None):
+    """Lista os defeitos que atendem a todos os filtros informados.
+
+    `turbina` procura palavras do âmbito de aplicação (ex.: "SM2-09", ou o começo
+    "SM2-0"), pelo índice de busca; `localizacao` ignora
+    espaços e pontos ("B.A" encontra "B. A" e "B.A."); `severidades` é uma lista de
+    códigos aceitos e `severidade_min` o menor código aceito.
+    """
+    condicoes, parametros = [], []
+    if turbina:
+        condicoes.append("r.id IN (SELECT rowid FROM relatorios_busca WHERE relatorios_busca MATCH ?)")
+        parametros.append('"' + turbina.replace('"', '""') + '"*')  # Frase exata, com a última palavra como prefixo
+    if localizacao:
+        condicoes.append("d.localizacao_chave = ?")
+        parametros.append(chave_localizacao(localizacao))
+    if severidade_min is not None:
+        condicoes.append("d.severidade >= ?")
+        parametros.append(severidade_min)
+    if severidades:
+        condicoes.append(f"d.severidade IN ({', '.join('?' * len(severidades))})")
+        parametros.extend(severidades)
+    if pa is not None:
+        condicoes.append("d.pa = ?")
+        parametros.append(pa)
+    if inspecao:
+        condicoes.append("d.inspecao = ?")
+        parametros.append(inspecao)
+
+    consulta = (
+        "SELECT r.ambito_aplicacao, r.codigo_relatorio, r.data_revisao, d.pa, d.inspecao,"
+        " d.localizacao, d.descricao, d.area, d.codigo, d.severidade"
+        " FROM defeitos d JOIN relatorios r ON r.id = d.relatorio_id"
+        + (" WHERE " + " AND ".join(condicoes) if condicoes else "")
+        + " ORDER BY d.severidade DESC, r.ambito_aplicacao, d.pa"
+    )
+    conexao.row_factory = sqlite3.Row
+    return [dict(linha) for linha in conexao.execute(consulta, parametros)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta os defeitos registrados em todos os relatórios gerados.")
+    parser.add_argument("--banco", default=CAMINHO_PADRAO, help="arquivo do banco SQLite")
+    parser.add_argument("--turbina", help="palavras do âmbito de aplicação (ex.: SM2-09)")
+    parser.add_argument("--localizacao", help="localização na pá (ex.: B.A, TIP, SPDA)")
+    parser.add_argument("--severidade", type=int, nargs="+", help="códigos aceitos (ex.: 3 4)")
+    parser.add_argument("--severidade-min", type=int, help="menor código aceito")
+    parser.add_argument("--pa", type=int, help="número da pá")
+    parser.add_argument("--inspecao", choices=["externa", "interna"])
+    parser.add_argument("--pdf", help="grava o resultado como tabela neste arquivo PDF, em vez de listar no terminal")
+    args = parser.parse_args(argv)
+
+    conexao = conectar(args.banco)
+    inicio = time.perf_counter()
+    resultados = consultar(
+        conexao, turbina=args.turbina, localizacao=args.localizacao, severidade_min=args.severidade_min,
+        severidades=args.severidade, pa=args.pa, inspecao=args.inspecao,
+    )
+    segundos = time.perf_counter() - inicio
+
+    if args.pdf:
+        from relatorio_pdf import montar_resumo_frota  # O fpdf só é carregado quando o PDF é pedido
+
+        inicio = time.perf_counter()
+        with open(args.pdf, "wb") as arquivo:
+            arquivo.write(montar_resumo_frota(resultados))
+        print(f"{len(resultados)} defeito(s) gravados em {args.pdf} ({time.perf_counter() - inicio:.2f} s)")
+        return 0
+
+    for r in resultados:
+        print(
+            f"{r['ambito_aplicacao']} | {r['codigo_relatorio']} | PÁ {r['pa']} {r['inspecao']} | "
+            f"{r['localizacao']} | código {r['codigo']} | {r['descricao']} | {r['area']}"
+        )
+    print(f"{len(resultados)} defeito(s) em {segundos * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# Benchmark da geração do relatório com inspeções sintéticas
+#
+# Uso:
+#   python benchmark.py                                   # cenários padrão, resultado em benchmark.json
+#   python benchmark.py --base benchmark_anterior.json    # compara com uma execução anterior
+#   python benchmark.py --pas 3 --topicos 7 --fotos 2 --resolucao 4000x3000 --formato PNG
+#   python benchmark.py --cenarios tipico tipico_rascunho                # perfil final x rascunho
+#
+# Cada cenário roda em um processo novo, iniciado como os processos de trabalho da fila
+# (fila_relatorios.iniciar_trabalhador, sem cache de imagens), e passa por montar_relatorio.
+# São medidos: tempo total (mediana das repetições), tempo de cada etapa, pico de memória
+# (RSS) do processo e tamanho do PDF. Com --base, um cenário que piorar além de LIMITES
+# é marcado como regressão e o script termina com código 1.
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from fila_relatorios import iniciar_trabalhador
+from relatorio_pdf import PERFIS, TOPICOS_EXTERNA, TOPICOS_INTERNA, max_fotos, montar_relatorio
+
+try:
+    import resource  # Não existe no Windows: o pico de memória fica sem medida
+except ImportError:
+    resource = None
+
+CENARIOS = {
+    "leve": {"pas": 3, "topicos": 2, "fotos": 1, "largura": 1600, "altura": 1200, "formato": "JPEG"},
+    "tipico": {"pas": 3, "topicos": 4, "fotos": 2, "largura": 4000, "altura": 3000, "formato": "JPEG"},
+    # Mesmo cenário no perfil de rascunho: mostra o ganho de tempo e tamanho em relação ao final
+    "tipico_rascunho": {"pas": 3, "topicos": 4, "fotos": 2, "largura": 4000, "altura": 3000, "formato": "JPEG", "perfil": "rascunho"},
+    "completo_png": {"pas": 3, "topicos": 7, "fotos": 2, "largura": 3000, "altura": 2000, "formato": "PNG"},
+}
+
+# Piora máxima aceita em relação à base (fração) antes de marcar regressão
+LIMITES = {"tempo_s": 0.20, "rss_pico_mb": 0.15, "tamanho_pdf_kb": 0.05}
+
+
+# ------------------------ Inspeções sintéticas ------------------------
+
+def foto_sintetica(semente, largura, altura, formato="JPEG"):
+    """Gera uma "foto" com formas grandes e ruído fino, diferente para cada semente.
+
+    As formas fazem cada foto ser distinta (nenhuma é reaproveitada do cache de
+    imagens como outra) e o ruído deixa a compressão parecida com a de uma foto real.
+    """
+    rng = random.Random(semente)
+    formas = Image.new("RGB", (largura, altura), tuple(rng.randrange(256) for _ in range(3)))
+    desenho = ImageDraw.Draw(formas)
+    for _ in range(12):
+        x0, y0 = rng.randrange(largura), rng.randrange(altura)
+        x1, y1 = x0 + rng.randrange(largura // 8, largura // 2), y0 + rng.randrange(altura // 8, altura // 2)
+        desenho.ellipse((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+    ruido = Image.effect_noise((largura, altura), 40).convert("RGB")
+    img = Image.blend(formas, ruido, 0.25)
+
+    saida = BytesIO()
+    img.save(saida, formato, **({"quality": 92} if formato == "JPEG" else {}))
+    return saida.getvalue()
+
+
+def _tabela(numero_pa, linhas=7):
+    return [
+        {"Localizacao": f"L{i}", "Descricao": f"Erosão no ponto {i} da pá {numero_pa}", "Area": f"{i * 3} cm²", "Código": str(i % 5)}
+        for i in range(1, linhas + 1)
+    ]
+
+
+def inspecao_sintetica(pas=3, topicos=4, fotos=2, largura=4000, altura=3000, formato="JPEG", perfil="final"):
+    """Monta um dicionário no formato de `montar_relatorio` com fotos geradas."""
+    sementes = iter(range(1_000_000))
+
+    def nova_foto():
+        return foto_sintetica(next(sementes), largura, altura, formato)
+
+    def grupo_topicos(numero_pa, nomes):
+        # Tópicos reais do formulário, para as fotos passarem pelo mesmo limite por tópico do relatório
+        return {
+            topico: ([nova_foto() for _ in range(min(fotos, max_fotos(topico)))], f"Observação sobre {topico} da pá {numero_pa}")
+            for topico in nomes[:topicos]
+        }
+
+    return {
+        "perfil": perfil,
+        "ambito_aplicacao": "Benchmark - Parque Sintético",
+        "codigo_relatorio": "BENCH-01",
+        "revisado_por_1": "Revisor 1",
+        "revisado_por_2": "Revisor 2",
+        "data_revisao": "01/01/2025",
+        "dados_gerais": {"Fabricante Modelo": "Modelo X", "Ano de Fabricação": "2015", "Altura do torre": "100 m"},
+        "dados_pas": {"Fabricante": "Fabricante Y", "Tipo de Pá de Rotor": "Tipo Z"},
+        "imagem_maquina": nova_foto(),
+        "imagens_pas": {f"PÁ {n}": [nova_foto(), nova_foto()] for n in range(1, pas + 1)},
+        "tabelas_externas": [_tabela(n) for n in range(1, pas + 1)],
+        "topicos_externos": [grupo_topicos(n, TOPICOS_EXTERNA) for n in range(1, pas + 1)],
+        "tabelas_internas": [_tabela(n, 12) for n in range(1, pas + 1)],
+        "topicos_internos": [grupo_topicos(n, TOPICOS_INTERNA) for n in range(1, pas + 1)],
+    }
+
+
+# ------------------------ Medição ------------------------
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == "darwin" else 1024)  # bytes no macOS, KB no Linux
+
+
+def _medir(dados, repeticoes):
+    # Roda dentro do processo do cenário
+    tempos, etapas = [], []
+    for _ in range(repeticoes):
+        metricas = {}
+        inicio = time.perf_counter()
+        pdf = montar_relatorio(dados, metricas=metricas)
+        tempos.append(time.perf_counter() - inicio)
+        etapas.append(metricas["etapas"])
+
+    return {
+        "tempo_s": statistics.median(tempos),
+        "tempos_s": tempos,
+        "etapas_s": {nome: statistics.median(e[nome] for e in etapas) for nome in etapas[0]},
+        "rss_pico_mb": _pico_rss_mb(),
+        "tamanho_pdf_kb": len(pdf) / 1024,
+        "secoes": metricas["secoes"],  # Da última repetição
+    }
+
+
+def rodar_cenario(nome, parametros, repeticoes):
+    dados = inspecao_sintetica(**parametros)
+    fotos = [dados["imagem_maquina"]] + [f for fs in dados["imagens_pas"].values() for f in fs] + [
+        f for grupo in dados["topicos_externos"] + dados["topicos_internos"] for fs, _ in grupo.values() for f in fs
+    ]
+
+    # Processo novo por cenário: o pico de memória de um não contamina o do outro
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=iniciar_trabalhador,
+        initargs=(None,),
+    ) as executor:
+        medidas = executor.submit(_medir, dados, repeticoes).result()
+
+    return {
+        "nome": nome,
+        "parametros": parametros,
+        "fotos": len(fotos),
+        "entrada_mb": sum(len(f) for f in fotos) / (1024 * 1024),
+        **medidas,
+    }
+
+
+# ------------------------ Comparação com uma execução anterior ------------------------
+
+def comparar(resultados, base):
+    """Devolve a lista de regressões (textos) dos cenários presentes nas duas execuções."""
+    anteriores = {(c["nome"], json.dumps(c["parametros"], sort_keys=True)): c for c in base["cenarios"]}
+    regressoes = []
+    for cenario in resultados["cenarios"]:
+        anterior = anteriores.get((cenario["nome"], json.dumps(cenario["parametros"], sort_keys=True)))
+        if anterior is None:
+            continue
+        for medida, limite in LIMITES.items():
+            atual, antes = cenario.get(medida), anterior.get(medida)
+            if atual is None or not antes:
+                continue
+            variacao = atual / antes - 1
+            situacao = "REGRESSÃO" if variacao > limite else "ok"
+            print(f"  {cenario['nome']:<14} {medida:<15} {antes:10.2f} -> {atual:10.2f} ({variacao:+.1%}) {situacao}")
+            if variacao > limite:
+                regressoes.append(f"{cenario['nome']}: {medida} {variacao:+.1%} (limite {limite:.0%})")
+    return regressoes
+
+
+def _ambiente():
+    import fpdf
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "cpus": os.cpu_count(),
+        "fpdf2": fpdf.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede a geração do relatório com inspeções sintéticas.")
+    parser.add_argument("--cenarios", nargs="+", choices=sorted(CENARIOS), help="cenários pré-definidos (padrão: todos)")
+    parser.add_argument("--pas", type=int, help="cenário personalizado: número de pás")
+    parser.add_argument("--topicos", type=int, default=4, help=f"cenário personalizado: tópicos com fotos por pá (até {len(TOPICOS_EXTERNA)} externos e {len(TOPICOS_INTERNA)} internos)")
+    parser.add_argument("--fotos", type=int, default=2, help="cenário personalizado: fotos por tópico")
+    parser.add_argument("--resolucao", default="4000x3000", help="cenário personalizado: LARGURAxALTURA das fotos")
+    parser.add_argument("--formato", default="JPEG", help="cenário personalizado: formato das fotos (JPEG, PNG, WEBP...)")
+    parser.add_argument("--perfil", default="final", choices=sorted(PERFIS), help="cenário personalizado: perfil do relatório")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por cenário (vale a mediana)")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--base", help="resultado anterior (JSON) para detectar regressões")
+    args = parser.parse_args(argv)
+
+    cenarios = {nome: CENARIOS[nome] for nome in (args.cenarios or ([] if args.pas else CENARIOS))}
+    if args.pas:
+        largura, altura = (int(v) for v in args.resolucao.lower().split("x"))
+        cenarios["personalizado"] = {
+            "pas": args.pas, "topicos": args.topicos, "fotos": args.fotos,
+            "largura": largura, "altura": altura, "formato": args.formato.upper(), "perfil": args.perfil,
+        }
+
+    resultados = {"data": time.strftime("%Y-%m-%d %H:%M:%S"), "ambiente": _ambiente(), "cenarios": []}
+    for nome, parametros in cenarios.items():
+        cenario = rodar_cenario(nome, parametros, max(1, args.repeticoes))
+        resultados["cenarios"].append(cenario)
+        etapas = ", ".join(f"{etapa} {segundos:.2f}s" for etapa, segundos in cenario["etapas_s"].items())
+        rss = f"{cenario['rss_pico_mb']:.0f} MB" if cenario["rss_pico_mb"] is not None else "-"
+        print(
+            f"{nome}: {cenario['tempo_s']:.2f}s, pico {rss}, PDF {cenario['tamanho_pdf_kb']:.0f} KB, "
+            f"{cenario['fotos']} fotos ({etapas})"
+        )
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"Comparação com {args.base}:")
+        regressoes = comparar(resultados, base)
+        if regressoes:
+            print("Regressões encontradas:\n  " + "\n  ".join(regressoes), file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
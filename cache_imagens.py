@@ -0,0 +1,122 @@
+# Cache em disco das fotos já preparadas para o PDF (endereçado pelo conteúdo, com descarte LRU)
+import hashlib
+import os
+import tempfile
+import time
+
+try:
+    import fcntl  # Não existe no Windows: lá o descarte não é coordenado entre processos
+except ImportError:
+    fcntl = None
+
+DIRETORIO_PADRAO = ".cache_imagens"
+LIMITE_PADRAO = 512 * 1024 * 1024  # 512 MB
+IDADE_TEMPORARIOS = 3600  # Segundos até um temporário abandonado (processo encerrado ao gravar) ser apagado
+
+
+def chave_conteudo(dados, *parametros):
+    """Gera a chave do cache a partir dos bytes enviados e dos parâmetros de renderização."""
+    h = hashlib.sha256(dados)
+    h.update(repr(parametros).encode("utf-8"))
+    return h.hexdigest()
+
+
+class CacheImagens:
+    """Guarda cada imagem preparada em um arquivo cujo nome é a sua chave.
+
+    O horário de modificação do arquivo é atualizado a cada leitura, então os
+    arquivos mais antigos são os menos usados recentemente e saem primeiro
+    quando o total passa de `limite_bytes`.
+
+    Vários processos podem usar a mesma pasta: cada arquivo aparece completo de
+    uma vez (gravação + rename), um arquivo apagado por outro processo conta como
+    ausente, e o total é recontado na pasta a cada `limite_bytes / 16` gravados
+    por este processo, para enxergar o que os outros gravaram.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, limite_bytes=LIMITE_PADRAO):
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        os.makedirs(diretorio, exist_ok=True)
+        self._total = sum(tamanho for _, _, tamanho in self._entradas())
+        self._gravados = 0  # Bytes gravados por este processo desde a última recontagem
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave)
+
+    def _entradas(self):
+        # (horário de uso, caminho, tamanho) de cada arquivo do cache
+        with os.scandir(self.diretorio) as it:
+            for entrada in it:
+                if entrada.is_file() and not entrada.name.startswith("."):
+                    info = entrada.stat()
+                    yield info.st_mtime, entrada.path, info.st_size
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                dados = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(caminho)  # Marca como usado agora (LRU)
+        except FileNotFoundError:
+            pass  # Descartado por outro processo logo após a leitura: os bytes lidos continuam válidos
+        return dados
+
+    def guardar(self, chave, dados):
+        caminho = self._caminho(chave)
+        try:
+            os.utime(caminho)  # Já guardado (por este ou outro processo)
+            return
+        except FileNotFoundError:
+            pass
+
+        # Escreve em arquivo temporário e renomeia, para nunca expor um arquivo pela metade
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=".tmp_")
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+
+        self._total += len(dados)
+        self._gravados += len(dados)
+        if self._total > self.limite_bytes or self._gravados > self.limite_bytes // 16:
+            self._descartar()
+
+    def _descartar(self):
+        # Só um processo descarta por vez; os outros seguem sem esperar
+        if fcntl is None:
+            self._descartar_menos_usados()
+            return
+        with open(os.path.join(self.diretorio, ".trava"), "a") as trava:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            self._descartar_menos_usados()
+
+    def _descartar_menos_usados(self):
+        # Reconta a pasta e remove os arquivos menos usados até o cache voltar para o limite
+        self._apagar_temporarios_abandonados()
+        entradas = sorted(self._entradas())
+        self._total = sum(tamanho for _, _, tamanho in entradas)
+        self._gravados = 0
+        for _, caminho, tamanho in entradas:
+            if self._total <= self.limite_bytes:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            self._total -= tamanho
+
+    def _apagar_temporarios_abandonados(self):
+        limite = time.time() - IDADE_TEMPORARIOS
+        with os.scandir(self.diretorio) as it:
+            for entrada in it:
+                try:
+                    if entrada.name.startswith(".tmp_") and entrada.stat().st_mtime < limite:
+                        os.remove(entrada.path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,327 @@
+# Gravação incremental de um PDF grande a partir de vários PDFs menores gerados pelo fpdf
+#
+# Cada parte é lida pelo pypdf (strings, streams e referências interpretados por um leitor de PDF
+# de verdade); só os objetos são renumerados e gravados aqui, um de cada vez, para o arquivo
+# final não precisar ficar inteiro em memória.
+import hashlib
+from io import BytesIO
+import time
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, TextStringObject,
+)
+
+# Números fixos no arquivo final (gravados no fim, em `fechar`)
+_ARVORE, _CATALOGO, _MARCADORES = 1, 2, 3
+_SEM_JUNCAO = ("/AcroForm", "/StructTreeRoot")  # Estruturas do documento inteiro que não dá para emendar
+
+
+def _referencias(objeto):
+    """Números dos objetos referenciados dentro de um objeto direto, na ordem em que aparecem."""
+    if isinstance(objeto, IndirectObject):
+        return [objeto.idnum]
+    if isinstance(objeto, DictionaryObject):
+        return [n for valor in objeto.values() for n in _referencias(valor)]
+    if isinstance(objeto, ArrayObject):
+        return [n for valor in objeto for n in _referencias(valor)]
+    return []
+
+
+def _trocar(objeto, nova):
+    """Troca cada referência pelo resultado de `nova(referência)`, alterando o objeto (exceto se ele for uma)."""
+    if isinstance(objeto, IndirectObject):
+        return nova(objeto)
+    if isinstance(objeto, DictionaryObject):
+        for chave, valor in list(objeto.items()):
+            objeto[chave] = _trocar(valor, nova)
+    elif isinstance(objeto, ArrayObject):
+        for i, valor in enumerate(objeto):
+            objeto[i] = _trocar(valor, nova)
+    return objeto
+
+
+def _ref(dicionario, chave):
+    # A referência guardada na chave (sem resolver), ou None
+    return dicionario.raw_get(chave) if chave in dicionario else None
+
+
+def _serializar(objeto):
+    saida = BytesIO()
+    objeto.write_to_stream(saida)
+    return saida.getvalue()
+
+
+def _folhas_nomes(no):
+    # Pares (nome, valor) de uma árvore de nomes (/Names com /Kids ou /Names direto)
+    no = no.get_object()
+    folha = no["/Names"] if "/Names" in no else []
+    pares = list(zip(folha[::2], folha[1::2]))
+    for filho in (no["/Kids"] if "/Kids" in no else []):
+        pares += _folhas_nomes(filho)
+    return pares
+
+
+class EscritorPDF:
+    """Junta vários PDFs do fpdf em um arquivo só, gravando cada parte assim que chega.
+
+    Só a parte sendo anexada fica em memória: as páginas e imagens já anexadas estão
+    no arquivo. Objetos iguais entre as partes (imagens fixas, fontes, conteúdos
+    repetidos) são gravados uma única vez e reaproveitados pelas partes seguintes.
+
+    Do catálogo de cada parte, os marcadores (/Outlines) são emendados na ordem das
+    partes e as árvores de nomes (/Names, /Dests) são unidas (um nome repetido com
+    valores diferentes é um erro). As demais entradas (/PageLayout, /OpenAction...)
+    valem as da primeira parte; partes com formulário ou estrutura de acessibilidade
+    (/AcroForm, /StructTreeRoot) são recusadas com ValueError.
+    """
+
+    def __init__(self, caminho):
+        self._arquivo = open(caminho, "wb")
+        self._arquivo.write(b"%PDF-1.4\n%\xe9\xeb\xf1\xbf\n")
+        self._deslocamentos = {}
+        self._proximo = _MARCADORES + 1
+        self._paginas = []
+        self._gravados = {}  # identidade do conteúdo -> número do objeto já gravado
+        self.versao = b"1.4"
+        self._data = None  # /CreationDate da primeira parte: o arquivo não depende da hora em que foi gerado
+        self._catalogo = {}     # Entradas da primeira parte, já renumeradas
+        self._nomes = {}        # árvore (/Dests, /EmbeddedFiles...) -> {nome: valor renumerado}
+        self._dests = {}        # /Dests antigo (dicionário no catálogo) -> valor renumerado
+        self._marcadores = []   # (número, item) dos marcadores do primeiro nível, gravados no fim
+        self._total_marcadores = 0
+
+    @property
+    def total_paginas(self):
+        return len(self._paginas)
+
+    def _gravar(self, numero, objeto):
+        self._deslocamentos[numero] = self._arquivo.tell()
+        self._arquivo.write(b"%d 0 obj\n" % numero + _serializar(objeto) + b"\nendobj\n")
+
+    def anexar(self, pdf):
+        """Acrescenta ao fim do arquivo todas as páginas de um PDF gerado pelo fpdf (bytes)."""
+        leitor = PdfReader(BytesIO(pdf))
+        self.versao = max(self.versao, pdf[5:8])
+        catalogo = leitor.trailer["/Root"].get_object()
+        for chave in _SEM_JUNCAO:
+            if chave in catalogo:
+                raise ValueError(f"PDF com {chave} no catálogo: não é possível juntar com outros")
+        info = leitor.trailer.get("/Info")
+        if self._data is None and info is not None:
+            data = info.get_object().get("/CreationDate")
+            self._data = data.encode("latin-1") if data else None
+
+        # Páginas: o pypdf já copia nelas o que herdavam da árvore (/MediaBox, /Resources...)
+        objetos_paginas = {pagina.indirect_reference.idnum: pagina for pagina in leitor.pages}
+        paginas = list(objetos_paginas)
+
+        # Números fixos: a árvore de páginas, o catálogo e a raiz dos marcadores de cada parte
+        # viram os do arquivo final; não são gravados aqui
+        fixos = {leitor.trailer.raw_get("/Root").idnum: _CATALOGO}
+        fixos.update((no.idnum, _ARVORE) for no in self._nos_arvore(catalogo.raw_get("/Pages")))
+        marcadores = catalogo["/Outlines"] if "/Outlines" in catalogo else None
+        topo = []  # Marcadores do primeiro nível, na ordem
+        if marcadores is not None:
+            fixos[catalogo.raw_get("/Outlines").idnum] = _MARCADORES
+            item = _ref(marcadores, "/First")
+            while item is not None and item.idnum not in topo:
+                topo.append(item.idnum)
+                item = _ref(item.get_object(), "/Next")
+            self._total_marcadores += abs(int(marcadores.get("/Count", len(topo))))
+        # Árvores de nomes e /Dests: o arquivo ganha as suas, com os nomes de todas as partes
+        nomes = self._pares_nomes(catalogo.get("/Names"))
+        dests = list(catalogo["/Dests"].items()) if "/Dests" in catalogo else []
+        fora = self._nos_nomes(catalogo.get("/Names"))
+        if isinstance(_ref(catalogo, "/Dests"), IndirectObject):
+            fora.add(_ref(catalogo, "/Dests").idnum)
+
+        # Objetos alcançáveis a partir das páginas, dos marcadores, dos nomes e das demais entradas do catálogo
+        raizes = [IndirectObject(n, 0, leitor) for n in paginas] + [valor for _, valor in nomes + dests]
+        raizes += [valor for chave, valor in catalogo.items() if chave not in ("/Pages", "/Names", "/Dests", "/Outlines", "/Type")]
+        if marcadores is not None:
+            raizes.append(marcadores)
+        objetos, referencias, bases = {}, {}, {}
+        pendentes = [n for raiz in raizes for n in _referencias(raiz)]
+        while pendentes:
+            numero = pendentes.pop()
+            if numero in objetos or numero in fixos or numero in fora:
+                continue
+            objeto = objetos_paginas.get(numero) or leitor.get_object(numero)
+            objetos[numero] = objeto
+            referencias[numero] = _referencias(objeto)
+            pendentes.extend(referencias[numero])
+            # Conteúdo sem os números das referências: base da identidade (ver abaixo)
+            _trocar(objeto, lambda _: IndirectObject(0, 0, None))
+            bases[numero] = hashlib.sha256(_serializar(objeto)).digest()
+
+        # Identidade de cada objeto: o conteúdo mais a identidade dos objetos referenciados.
+        # Páginas, marcadores e o que estiver em ciclo ou apontar para eles nunca são compartilhados.
+        identidades = {}
+
+        def identidade(numero, visitando=()):
+            if numero in identidades:
+                return identidades[numero]
+            if numero in fixos or numero in paginas or numero in visitando or numero not in objetos:
+                return None
+            h = hashlib.sha256(bases[numero])
+            for ref in referencias[numero]:
+                sub = identidade(ref, visitando + (numero,))
+                if sub is None:
+                    identidades[numero] = None
+                    return None
+                h.update(sub)
+            identidades[numero] = h.digest()
+            return identidades[numero]
+
+        # Numeração nova: objetos já gravados por outra parte são reaproveitados
+        novos = dict(fixos)
+        for numero in sorted(objetos):
+            chave = identidade(numero)
+            if chave is not None and chave in self._gravados:
+                novos[numero] = self._gravados[chave]
+            else:
+                novos[numero] = self._proximo
+                self._proximo += 1
+
+        def renumerada(ref):
+            return IndirectObject(novos[ref.idnum], 0, None)
+
+        for numero in sorted(objetos):
+            if novos[numero] in self._deslocamentos:
+                continue
+            objeto = objetos[numero]
+            ordem = iter(referencias[numero])
+            _trocar(objeto, lambda _: IndirectObject(novos[next(ordem)], 0, None))
+            if numero in topo:
+                continue  # Gravados no fim: o primeiro e o último de cada parte se ligam aos das partes vizinhas
+            self._gravar(novos[numero], objeto)
+            if identidades.get(numero) is not None:
+                self._gravados[identidades[numero]] = novos[numero]
+
+        self._marcadores += [(novos[n], objetos[n]) for n in topo]
+        self._juntar_catalogo(catalogo, nomes, dests, renumerada)
+        self._paginas.extend(novos[n] for n in paginas)
+        self._arquivo.flush()
+
+    def _nos_arvore(self, no):
+        # A raiz da árvore de páginas e os nós intermediários (referências)
+        nos = [no]
+        no = no.get_object()
+        for filho in (no["/Kids"] if "/Kids" in no else []):
+            if filho.get_object().get("/Type") == "/Pages":
+                nos += self._nos_arvore(filho)
+        return nos
+
+    def _nos_nomes(self, nomes):
+        # Números dos nós das árvores de nomes: não vão para o arquivo, que ganha uma árvore nova
+        numeros = set()
+
+        def visitar(no):
+            if isinstance(no, IndirectObject):
+                numeros.add(no.idnum)
+            no = no.get_object()
+            for filho in (no["/Kids"] if "/Kids" in no else []):
+                visitar(filho)
+
+        if nomes is not None:
+            if isinstance(nomes, IndirectObject):
+                numeros.add(nomes.idnum)
+            for arvore in nomes.get_object().values():
+                visitar(arvore)
+        return numeros
+
+    def _pares_nomes(self, nomes):
+        if nomes is None:
+            return []
+        return [par for arvore in nomes.get_object().values() for par in _folhas_nomes(arvore)]
+
+    def _juntar_catalogo(self, catalogo, nomes, dests, renumerada):
+        for arvore, no in (catalogo["/Names"].items() if "/Names" in catalogo else []):
+            self._juntar_nomes(self._nomes.setdefault(arvore, {}), _folhas_nomes(no), renumerada)
+        self._juntar_nomes(self._dests, dests, renumerada)
+        for chave, valor in catalogo.items():
+            if chave not in ("/Pages", "/Type", "/Outlines", "/Names", "/Dests") and chave not in self._catalogo:
+                self._catalogo[chave] = _trocar(valor, renumerada)
+
+    @staticmethod
+    def _juntar_nomes(destino, pares, renumerada):
+        for nome, valor in pares:
+            valor = _trocar(valor, renumerada)
+            if nome in destino and _serializar(destino[nome]) != _serializar(valor):
+                raise ValueError(f"Nome {nome!r} definido com valores diferentes em duas partes")
+            destino[nome] = valor
+
+    def _gravar_marcadores(self):
+        # Raiz única com os marcadores do primeiro nível de todas as partes, na ordem
+        if not self._marcadores:
+            return
+        for i, (numero, item) in enumerate(self._marcadores):
+            item[NameObject("/Parent")] = IndirectObject(_MARCADORES, 0, None)
+            for chave, vizinho in (("/Prev", i - 1), ("/Next", i + 1)):
+                if 0 <= vizinho < len(self._marcadores):
+                    item[NameObject(chave)] = IndirectObject(self._marcadores[vizinho][0], 0, None)
+                else:
+                    item.pop(chave, None)
+            self._gravar(numero, item)
+        self._gravar(_MARCADORES, DictionaryObject({
+            NameObject("/Type"): NameObject("/Outlines"),
+            NameObject("/First"): IndirectObject(self._marcadores[0][0], 0, None),
+            NameObject("/Last"): IndirectObject(self._marcadores[-1][0], 0, None),
+            NameObject("/Count"): NumberObject(self._total_marcadores),
+        }))
+        self._catalogo["/Outlines"] = IndirectObject(_MARCADORES, 0, None)
+
+    def fechar(self):
+        """Grava a árvore de páginas, o catálogo e a tabela xref, e fecha o arquivo."""
+        self._gravar(_ARVORE, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(IndirectObject(n, 0, None) for n in self._paginas),
+            NameObject("/Count"): NumberObject(len(self._paginas)),
+        }))
+        self._gravar_marcadores()
+
+        catalogo = DictionaryObject({NameObject(k): v for k, v in self._catalogo.items()})
+        catalogo[NameObject("/Type")] = NameObject("/Catalog")
+        catalogo[NameObject("/Pages")] = IndirectObject(_ARVORE, 0, None)
+        if self._nomes:
+            # Uma folha por árvore, com os nomes em ordem (exigido pela especificação)
+            catalogo[NameObject("/Names")] = DictionaryObject({
+                NameObject(arvore): DictionaryObject({NameObject("/Names"): ArrayObject(
+                    item for nome in sorted(pares, key=lambda n: n.encode("utf-8") if isinstance(n, str) else bytes(n))
+                    for item in (nome, pares[nome])
+                )})
+                for arvore, pares in self._nomes.items()
+            })
+        if self._dests:
+            catalogo[NameObject("/Dests")] = DictionaryObject(self._dests)
+        self._gravar(_CATALOGO, catalogo)
+
+        info = self._proximo
+        data = self._data or time.strftime("D:%Y%m%d%H%M%SZ", time.gmtime()).encode("ascii")
+        self._gravar(info, DictionaryObject({NameObject("/CreationDate"): TextStringObject(data.decode("latin-1"))}))
+
+        inicio_xref = self._arquivo.tell()
+        linhas = [b"xref", b"0 %d" % (info + 1), b"0000000000 65535 f "]
+        for n in range(1, info + 1):
+            # Sem marcadores, o número reservado para eles fica livre
+            linhas.append(b"%010d 00000 n " % self._deslocamentos[n] if n in self._deslocamentos else b"0000000000 00000 f ")
+        self._arquivo.write(b"\n".join(linhas) + b"\n")
+        self._arquivo.write(
+            b"trailer\n<<\n/Size %d\n/Root %d 0 R\n/Info %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n"
+            % (info + 1, _CATALOGO, info, inicio_xref)
+        )
+
+        # A versão do cabeçalho é a maior entre as partes (o cabeçalho tem tamanho fixo)
+        self._arquivo.seek(5)
+        self._arquivo.write(self.versao)
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.fechar()
+        else:
+            self._arquivo.close()
@@ -0,0 +1,263 @@
+# Fila de geração de relatórios em processos de trabalho, fora da execução do script Streamlit
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+import weakref
+
+import banco_defeitos
+import imagens
+from cache_imagens import CacheImagens
+from relatorio_pdf import carregar_recursos, montar_relatorio
+
+MAX_PENDENTES_PADRAO = 8  # Relatórios na fila + em geração antes de recusar novos pedidos
+LIMITE_PRONTOS_PADRAO = 128 * 1024 * 1024  # PDFs já gerados guardados para pedidos repetidos
+
+_cache = None  # Cache de imagens do processo de trabalho
+_banco = None  # Conexão com o banco de defeitos do processo de trabalho
+
+
+class FilaCheia(Exception):
+    """Levantada quando a fila já tem o máximo de relatórios pendentes."""
+
+
+def iniciar_trabalhador(diretorio_cache, threads_imagens=None, caminho_banco=None):
+    # Roda uma vez em cada processo de trabalho, antes do primeiro relatório
+    global _cache, _banco
+    _cache = CacheImagens(diretorio_cache) if diretorio_cache else None
+    _banco = banco_defeitos.conectar(caminho_banco) if caminho_banco else None
+    # Dentro do processo de trabalho as fotos são preparadas em threads (o Pillow libera o GIL)
+    imagens.configurar_pool(ThreadPoolExecutor(max_workers=threads_imagens or os.cpu_count() or 1))
+    carregar_recursos()
+
+
+def gerar_no_trabalhador(dados):
+    """Gera um relatório dentro de um processo iniciado por `iniciar_trabalhador`.
+
+    Devolve `(bytes do PDF, métricas)` e registra as métricas em uma linha JSON na saída de
+    erros (a saída padrão fica para quem chama, como a linha de comando de `gerar_lote`).
+    Com um banco de defeitos configurado, as tabelas do relatório também são gravadas nele.
+    """
+    inicio = time.perf_counter()
+    metricas = {}
+    pdf = montar_relatorio(dados, cache=_cache, metricas=metricas)
+    metricas["segundos"] = time.perf_counter() - inicio
+
+    if _banco is not None:
+        try:
+            banco_defeitos.registrar_relatorio(_banco, dados)
+        except Exception as e:  # O PDF já está pronto: uma falha no banco não impede a entrega
+            print(f"Erro ao gravar os defeitos no banco: {e}")
+
+    print(json.dumps({
+        "evento": "relatorio_gerado",
+        "codigo_relatorio": dados.get("codigo_relatorio", ""),
+        "pid": os.getpid(),
+        **metricas,
+    }, ensure_ascii=False), file=sys.stderr, flush=True)
+    return pdf, metricas
+
+
+def _pronto():
+    return True
+
+
+def _sem_fotos(dados):
+    # Cópia dos dados com cada foto (bytes ou caminho) trocada pelo hash do conteúdo
+    def topicos(grupo):
+        return {t: ([imagens.hash_foto(f) for f in fotos], obs) for t, (fotos, obs) in grupo.items()}
+
+    return {
+        **dados,
+        "id_relatorio": None,  # Só identifica o relatório no banco de defeitos: o PDF é o mesmo
+        "imagem_maquina": imagens.hash_foto(dados["imagem_maquina"]) if dados.get("imagem_maquina") else None,
+        "imagens_pas": {pa: [imagens.hash_foto(f) for f in fotos] for pa, fotos in dados.get("imagens_pas", {}).items()},
+        "topicos_externos": [topicos(g) for g in dados.get("topicos_externos", [])],
+        "topicos_internos": [topicos(g) for g in dados.get("topicos_internos", [])],
+    }
+
+
+def digest_dados(dados):
+    """Identifica um pedido pelo conteúdo: mesmos campos e fotos geram o mesmo digest.
+
+    As fotos entram pelo hash do conteúdo, então a mesma foto em memória ou em um
+    arquivo no disco dá o mesmo digest.
+    """
+    return hashlib.sha256(pickle.dumps(_sem_fotos(dados), protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class FilaRelatorios:
+    """Pool limitado de processos que gera relatórios a partir de `montar_relatorio`.
+
+    - no máximo `max_pendentes` relatórios ficam na fila ou em geração (`FilaCheia` além disso);
+    - um clique repetido na mesma sessão com os mesmos dados devolve o trabalho já existente;
+    - um pedido igual a um já gerado (de qualquer sessão) é atendido na hora com o mesmo
+      PDF, guardado em memória até `limite_prontos` bytes (os menos usados saem primeiro);
+      igual a um ainda em geração, espera o mesmo trabalho;
+    - os processos são iniciados na criação, já com fpdf, Pillow e `assets/` carregados;
+    - com `caminho_banco`, cada pedido atendido (gerado, reaproveitado ou que esperou um
+      igual em geração) grava as suas tabelas no banco de defeitos, com o seu `id_relatorio`.
+
+    Com vários processos do servidor na mesma máquina (`processos_servidor`), os
+    núcleos são divididos entre as filas de todos eles, em vez de cada fila
+    ocupar a máquina inteira.
+    """
+
+    def __init__(self, max_workers=None, max_pendentes=MAX_PENDENTES_PADRAO, diretorio_cache=None, caminho_banco=None,
+                 processos_servidor=1, limite_prontos=LIMITE_PRONTOS_PADRAO):
+        nucleos = max(1, (os.cpu_count() or 2) // max(1, processos_servidor))
+        max_workers = max_workers or max(1, nucleos // 2)
+        self._parametros_executor = dict(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=iniciar_trabalhador,
+            # O banco é gravado por esta fila, não pelos processos de trabalho: um pedido atendido
+            # com um PDF já gerado não passa por eles, mas também tem que entrar no banco
+            initargs=(diretorio_cache, max(1, nucleos // max_workers)),
+        )
+        self._caminho_banco = caminho_banco
+        self._banco = None  # Conexão usada só pela thread de `_registros`
+        self._registros = ThreadPoolExecutor(max_workers=1) if caminho_banco else None
+        self._executor = self._novo_executor()
+        self._vagas = threading.BoundedSemaphore(max_pendentes)
+        self._lock = threading.RLock()  # `_concluido` pode rodar dentro de `enviar`, se o trabalho já terminou
+        self._trabalhos = {}   # id do trabalho -> Future
+        self._por_sessao = {}  # sessão -> (digest dos dados, id do trabalho)
+        self._prontos = OrderedDict()  # digest dos dados -> (bytes do PDF, métricas), do menos ao mais usado
+        self._bytes_prontos = 0
+        self._em_geracao = {}  # digest dos dados -> Future ainda não concluído
+        self.limite_prontos = limite_prontos
+
+    def _novo_executor(self):
+        # Sobe todos os processos agora, em vez de no primeiro pedido
+        executor = ProcessPoolExecutor(**self._parametros_executor)
+        for _ in range(self._parametros_executor["max_workers"]):
+            executor.submit(_pronto)
+        return executor
+
+    def _submeter(self, dados):
+        try:
+            return self._executor.submit(gerar_no_trabalhador, dados)
+        except BrokenProcessPool:
+            # Um processo de trabalho morreu (ex.: falta de memória) e o pool não aceita mais
+            # trabalhos: os pendentes já falharam com o mesmo erro, então sobe um pool novo
+            print("Processo de geração de relatórios interrompido: reiniciando os processos de trabalho")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._novo_executor()
+            return self._executor.submit(gerar_no_trabalhador, dados)
+
+    def enviar(self, sessao, dados, dono=None):
+        """Coloca um relatório na fila e devolve o id do trabalho.
+
+        Com `dono` (um objeto do estado da sessão), o trabalho da sessão é descartado
+        quando esse objeto deixa de existir, junto com a sessão.
+        """
+        digest = digest_dados(dados)
+        with self._lock:
+            anterior = self._por_sessao.get(sessao)
+            if anterior is None and dono is not None:
+                weakref.finalize(dono, self.encerrar_sessao, sessao)
+            if anterior and anterior[0] == digest:
+                futuro = self._trabalhos.get(anterior[1])
+                if futuro is not None and not (futuro.done() and futuro.exception()):
+                    return anterior[1]  # Clique repetido: reaproveita o trabalho
+
+            id_trabalho = uuid.uuid4().hex
+            pronto = self._prontos.get(digest)
+            if digest in self._em_geracao:
+                futuro = self._em_geracao[digest]  # Pedido igual já em geração (outra sessão): espera o mesmo
+            elif pronto is not None:
+                # Mesmos dados já gerados: devolve os mesmos bytes sem passar pela fila
+                self._prontos.move_to_end(digest)
+                futuro = Future()
+                futuro.set_result((pronto[0], {**pronto[1], "em_cache": True}))
+            else:
+                if not self._vagas.acquire(blocking=False):
+                    raise FilaCheia("Muitos relatórios em geração. Tente novamente em instantes.")
+                try:
+                    futuro = self._submeter(dados)
+                except BaseException:
+                    self._vagas.release()  # Nada entrou na fila: a vaga não seria liberada por `_concluido`
+                    raise
+                self._em_geracao[digest] = futuro
+                futuro.add_done_callback(lambda f: self._concluido(digest, f))
+
+            # Cada sessão guarda só o último trabalho; o anterior é descartado
+            if anterior:
+                self._trabalhos.pop(anterior[1], None)
+            self._trabalhos[id_trabalho] = futuro
+            self._por_sessao[sessao] = (digest, id_trabalho)
+        if self._registros is not None:
+            defeitos = banco_defeitos.campos_registrados(dados)
+            futuro.add_done_callback(lambda f: self._registrar(defeitos, f))
+        return id_trabalho
+
+    def _registrar(self, defeitos, futuro):
+        # Grava os defeitos de um pedido atendido, fora da thread que entregou o PDF
+        if futuro.cancelled() or futuro.exception() is not None:
+            return
+        self._registros.submit(self._gravar_defeitos, defeitos)
+
+    def _gravar_defeitos(self, defeitos):
+        try:
+            if self._banco is None:
+                self._banco = banco_defeitos.conectar(self._caminho_banco)
+            banco_defeitos.registrar_relatorio(self._banco, defeitos)
+        except Exception as e:  # O PDF já está pronto: uma falha no banco não impede a entrega
+            print(f"Erro ao gravar os defeitos no banco: {e}")
+
+    def _concluido(self, digest, futuro):
+        # Libera a vaga e guarda o PDF gerado para os próximos pedidos iguais
+        self._vagas.release()
+        with self._lock:
+            self._em_geracao.pop(digest, None)
+            if futuro.cancelled() or futuro.exception() is not None:
+                return
+            pdf, metricas = futuro.result()
+            if digest in self._prontos or len(pdf) > self.limite_prontos:
+                return
+            self._prontos[digest] = (pdf, metricas)
+            self._bytes_prontos += len(pdf)
+            while self._bytes_prontos > self.limite_prontos:
+                _, (antigo, _) = self._prontos.popitem(last=False)
+                self._bytes_prontos -= len(antigo)
+
+    def estado(self, id_trabalho):
+        """Um entre "desconhecido", "na fila", "gerando", "pronto" e "erro"."""
+        futuro = self._trabalhos.get(id_trabalho)
+        if futuro is None:
+            return "desconhecido"
+        if futuro.done():
+            return "erro" if futuro.exception() else "pronto"
+        return "gerando" if futuro.running() else "na fila"
+
+    def futuro(self, id_trabalho):
+        """`Future` do trabalho, para esperar o resultado sem consultar `estado` (ex.: com asyncio)."""
+        return self._trabalhos[id_trabalho]
+
+    def resultado(self, id_trabalho):
+        """Bytes do PDF de um trabalho concluído (levanta a exceção se a geração falhou)."""
+        return self._trabalhos[id_trabalho].result()[0]
+
+    def metricas(self, id_trabalho):
+        """Medições da montagem de um trabalho concluído (ver `montar_relatorio`)."""
+        return self._trabalhos[id_trabalho].result()[1]
+
+    def encerrar_sessao(self, sessao):
+        with self._lock:
+            anterior = self._por_sessao.pop(sessao, None)
+            if anterior:
+                self._trabalhos.pop(anterior[1], None)
+
+    def fechar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._registros is not None:
+            self._registros.shutdown(wait=True)  # Termina de gravar os defeitos já entregues
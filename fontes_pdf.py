@@ -0,0 +1,260 @@
+# Fontes TrueType do relatório, para textos com qualquer caractere (aspas curvas, travessões,
+# letras acentuadas fora do Latin-1...), que as fontes padrão do PDF não conseguem gravar
+#
+# Cada arquivo de fonte é analisado uma única vez e as métricas (larguras, mapa de caracteres,
+# descritor) ficam gravadas em disco (JSON), valendo também depois de reiniciar. Cada relatório
+# recebe a sua cópia leve da fonte; estilos que caem no mesmo arquivo usam a mesma cópia, para
+# o arquivo ser embutido uma vez só. Ao gravar o PDF, o subconjunto da fonte com os glifos
+# usados é reaproveitado de outro relatório do processo que usou os mesmos glifos.
+import copy
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from io import BytesIO
+
+import fpdf
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf.enums import TextEmphasis
+from fpdf.fonts import FontDescriptorFlags, PDFFontDescriptor, SubsetMap, TTFFont
+from fpdf.output import OutputProducer
+
+DIRETORIO_METRICAS = ".cache_fontes"
+LIMITE_SUBCONJUNTOS = 64  # Subconjuntos guardados por processo antes de recomeçar o cache
+
+# Pastas procuradas, em ordem; RELATORIO_FONTES aponta para uma pasta própria
+DIRETORIOS_FONTES = [
+    os.environ.get("RELATORIO_FONTES", ""),
+    "assets/fontes",
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+    "/usr/share/fonts/truetype/msttcorefonts",
+    "/usr/share/fonts/truetype/liberation",
+    "/usr/share/fonts/truetype/dejavu",
+    "/Library/Fonts",
+]
+
+# Famílias aceitas no lugar da Arial, em ordem de preferência: arquivos de cada estilo
+FAMILIAS = [
+    {"": ["arial.ttf"], "B": ["arialbd.ttf", "arial_bold.ttf", "arial bold.ttf"], "I": ["ariali.ttf", "arial_italic.ttf", "arial italic.ttf"]},
+    {"": ["liberationsans-regular.ttf"], "B": ["liberationsans-bold.ttf"], "I": ["liberationsans-italic.ttf"]},
+    {"": ["dejavusans.ttf"], "B": ["dejavusans-bold.ttf"], "I": ["dejavusans-oblique.ttf"]},
+]
+
+# Caracteres que recebem sempre os mesmos códigos no subconjunto da fonte, em todos os
+# relatórios: os trechos fixos gravados (cabeçalho, rodapé) só usam esses caracteres e
+# continuam válidos quando copiados para outro relatório. Quase todos aparecem em qualquer
+# relatório; os que sobram custam poucos KB no PDF
+CARACTERES_BASE = "".join(map(chr, range(0x20, 0x7F))) + "ÁÀÂÃÉÊÍÓÔÕÚÜÇáàâãéêíóôõúüçºª°²"
+
+# Tabelas que o fpdf descarta ao embutir a fonte; o subconjunto guardado já sai sem elas
+TABELAS_DESCARTADAS = ["FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta", "sbix", "CBDT", "CBLC",
+                       "EBDT", "EBLC", "EBSC", "SVG ", "CPAL", "COLR"]
+
+_arquivos = None     # estilo -> caminho do arquivo TTF (vazio se nenhuma família foi encontrada)
+_modelos = {}        # caminho -> fonte montada a partir das métricas, copiada para cada relatório
+_conteudos = {}      # caminho -> bytes do arquivo
+_subconjuntos = {}   # (caminho, glifos) -> bytes do subconjunto da fonte, com os nomes dos glifos
+
+
+def _procurar(nomes):
+    for diretorio in DIRETORIOS_FONTES:
+        if not diretorio or not os.path.isdir(diretorio):
+            continue
+        por_nome = {nome.lower(): nome for nome in os.listdir(diretorio)}
+        for nome in nomes:
+            if nome in por_nome:
+                return os.path.join(diretorio, por_nome[nome])
+    return None
+
+
+def arquivos_fontes():
+    """Arquivos TTF usados no lugar da Arial, por estilo ("", "B", "I").
+
+    Usa a primeira família encontrada com o estilo normal; um estilo ausente usa o
+    arquivo normal. Sem nenhuma família, devolve {} e o PDF fica com as fontes padrão.
+    """
+    global _arquivos
+    if _arquivos is None:
+        _arquivos = {}
+        for familia in FAMILIAS:
+            normal = _procurar(familia[""])
+            if normal:
+                _arquivos = {estilo: _procurar(nomes) or normal for estilo, nomes in familia.items()}
+                break
+        else:
+            print("Nenhuma fonte TrueType encontrada: usando as fontes padrão do PDF (só caracteres Latin-1)")
+    return _arquivos
+
+
+def _conteudo(caminho):
+    if caminho not in _conteudos:
+        with open(caminho, "rb") as f:
+            _conteudos[caminho] = f.read()
+    return _conteudos[caminho]
+
+
+# ------------------------ Métricas gravadas em disco ------------------------
+def _chave_metricas(caminho):
+    # Muda se o arquivo da fonte ou a versão do fpdf mudar
+    info = os.stat(caminho)
+    origem = f"{os.path.abspath(caminho)}|{info.st_size}|{info.st_mtime_ns}|{fpdf.__version__}"
+    return hashlib.sha256(origem.encode("utf-8")).hexdigest() + ".json"
+
+
+def _analisar(caminho):
+    # Deixa o fpdf ler a fonte e guarda só o que não muda entre documentos, em tipos que o JSON
+    # grava (mapas com chave numérica viram listas de pares)
+    fonte = TTFFont(fpdf.FPDF(), caminho, "analise", "")
+    desc = fonte.desc
+    return {
+        "descritor": {
+            "ascent": desc.ascent, "descent": desc.descent, "cap_height": desc.cap_height, "flags": desc.flags.value,
+            "font_b_box": desc.font_b_box, "italic_angle": desc.italic_angle, "stem_v": desc.stem_v,
+            "missing_width": desc.missing_width,
+        },
+        "larguras": sorted(fonte.cw.items()),
+        "cmap": sorted(fonte.cmap.items()),
+        "glyph_ids": sorted(fonte.glyph_ids.items()),
+        "atributos": {
+            nome: getattr(fonte, nome)
+            for nome in ("name", "scale", "up", "ut", "sp", "ss", "is_compressed", "is_cff", "is_cid_keyed", "is_symbol")
+        },
+        "cff_ros": list(fonte.cff_ros) if fonte.cff_ros else None,
+    }
+
+
+def _carregar_metricas(caminho, diretorio=DIRETORIO_METRICAS):
+    arquivo = os.path.join(diretorio, _chave_metricas(caminho)) if diretorio else None
+    try:
+        with open(arquivo, encoding="utf-8") as f:
+            return json.load(f)
+    except (TypeError, OSError, ValueError):
+        metricas = _analisar(caminho)
+        if arquivo:
+            try:
+                os.makedirs(diretorio, exist_ok=True)
+                descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp_")
+                with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                    json.dump(metricas, f)
+                os.replace(temporario, arquivo)
+            except OSError as e:
+                print(f"Erro ao gravar as métricas da fonte {caminho}: {e}")
+        return metricas
+
+
+def _modelo(caminho):
+    # Mesmo resultado de `TTFFont(pdf, caminho, ...)`, montado uma vez por processo a partir das
+    # métricas, sem analisar o arquivo de novo; cada relatório recebe uma cópia (ver `_nova_fonte`).
+    # Preenche os atributos internos do TTFFont sem passar pelo __init__: depende da versão fixada
+    # em requirements.txt (fpdf2==2.8.9). Ao atualizar o fpdf2, conferir com tests/test_fontes_pdf.py
+    modelo = _modelos.get(caminho)
+    if modelo is None:
+        metricas = _carregar_metricas(caminho)
+        modelo = TTFFont.__new__(TTFFont)
+        for nome, valor in metricas["atributos"].items():
+            setattr(modelo, nome, valor)
+        modelo.cmap = {codigo: nome for codigo, nome in metricas["cmap"]}
+        modelo.glyph_ids = {codigo: indice for codigo, indice in metricas["glyph_ids"]}
+        modelo.cff_ros = tuple(metricas["cff_ros"]) if metricas["cff_ros"] else None
+        descritor = dict(metricas["descritor"], flags=FontDescriptorFlags(metricas["descritor"]["flags"]))
+        modelo.desc = PDFFontDescriptor(**descritor)
+        padrao = descritor["missing_width"]
+        modelo.cw = defaultdict(lambda: padrao, {codigo: largura for codigo, largura in metricas["larguras"]})
+        modelo.type = "TTF"
+        modelo.ttffile = caminho
+        modelo.collection_font_number = 0
+        modelo.unicode_range = None
+        modelo.palette_index = 0
+        modelo.color_font = None
+        modelo._hbfont = None
+        _modelos[caminho] = modelo
+    return modelo
+
+
+def _nova_fonte(pdf, caminho, fontkey, estilo):
+    fonte = copy.copy(_modelo(caminho))
+    # O descritor é completado pelo fpdf ao gravar: cada documento tem o seu
+    fonte.desc = copy.copy(fonte.desc)
+    fonte.i = len(pdf.fonts) + 1
+    fonte.fontkey = fontkey
+    fonte.emphasis = TextEmphasis.coerce(estilo)
+    fonte.biggest_size_pt = 0
+    fonte.missing_glyphs = []
+    # Só usada ao gravar, quando é trocada pelo subconjunto (ver `ProdutorPDF`); aberta sem
+    # decodificar nenhuma tabela
+    fonte.ttfont = ttLib.TTFont(BytesIO(_conteudo(caminho)), recalcTimestamp=False, lazy=True)
+    fonte.subset = SubsetMap(fonte)
+    for caractere in CARACTERES_BASE:
+        fonte.subset.pick(ord(caractere))
+    return fonte
+
+
+def registrar_fonte(pdf, familia, estilo):
+    """Registra no `pdf` a fonte TrueType que substitui `familia` no `estilo` informado.
+
+    Um estilo sem arquivo próprio reaproveita a fonte já registrada do mesmo arquivo.
+    Devolve False (e o fpdf continua usando a fonte padrão) se não houver arquivo TTF.
+    """
+    caminho = arquivos_fontes().get(estilo)
+    if caminho is None:
+        return False
+    fontkey = f"{familia.lower()}{estilo}"
+    if fontkey not in pdf.fonts:
+        mesma = [fonte for fonte in pdf.fonts.values() if getattr(fonte, "ttffile", None) == caminho]
+        pdf.fonts[fontkey] = mesma[0] if mesma else _nova_fonte(pdf, caminho, fontkey, estilo)
+    return True
+
+
+# ------------------------ Gravação do PDF ------------------------
+def _subconjunto(caminho, glifos):
+    # Fonte reduzida aos `glifos`, feita uma vez por conjunto de glifos; os nomes dos glifos são
+    # mantidos para o fpdf reencontrá-los ao reduzir de novo (agora uma fonte pequena)
+    chave = (caminho, frozenset(glifos))
+    dados = _subconjuntos.get(chave)
+    if dados is None:
+        fonte = ttLib.TTFont(BytesIO(_conteudo(caminho)), recalcTimestamp=False, lazy=True)
+        opcoes = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, glyph_names=True)
+        opcoes.drop_tables += TABELAS_DESCARTADAS
+        subsetter = ftsubset.Subsetter(opcoes)
+        subsetter.populate(glyphs=glifos)
+        subsetter.subset(fonte)
+        saida = BytesIO()
+        fonte.save(saida)
+        dados = saida.getvalue()
+        if len(_subconjuntos) >= LIMITE_SUBCONJUNTOS:
+            _subconjuntos.clear()
+        _subconjuntos[chave] = dados
+    # As caixas dos glifos já foram calculadas ao gravar o subconjunto: sem recalcular, o fpdf
+    # grava os glifos sem decodificá-los
+    return ttLib.TTFont(BytesIO(dados), recalcBBoxes=False, recalcTimestamp=False, lazy=True)
+
+
+@contextmanager
+def _fontes_para_gravar(pdf):
+    # Cada fonte uma vez só (estilos que compartilham a fonte ocupam várias chaves) e as
+    # fontes deste módulo já reduzidas aos glifos usados
+    fontes = dict(pdf.fonts)
+    unicas = {}
+    for fonte in fontes.values():
+        unicas.setdefault(id(fonte), fonte)
+    pdf.fonts.clear()
+    pdf.fonts.update((fonte.fontkey, fonte) for fonte in unicas.values())
+    try:
+        for fonte in unicas.values():
+            if isinstance(fonte, TTFFont) and fonte.ttffile in _modelos:
+                fonte.ttfont = _subconjunto(fonte.ttffile, fonte.subset.get_all_glyph_names())
+        yield
+    finally:
+        pdf.fonts.clear()
+        pdf.fonts.update(fontes)
+
+
+class ProdutorPDF(OutputProducer):
+    """Gerador do PDF do fpdf para documentos com fontes deste módulo (`pdf.output(output_producer_class=ProdutorPDF)`)."""
+
+    def bufferize(self):
+        with _fontes_para_gravar(self.fpdf):
+            return super().bufferize()
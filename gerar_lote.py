@@ -0,0 +1,248 @@
+# Geração de relatórios em lote, sem a interface Streamlit, a partir de um manifesto por aerogerador
+#
+# Uso:
+#   python gerar_lote.py manifestos/*.json --saida relatorios/ --processos 8
+#   python gerar_lote.py manifestos/*.json --consolidado parque.pdf   # um único PDF, na ordem dos manifestos
+#   python gerar_lote.py manifestos/*.json --perfil rascunho          # fotos em baixa resolução, mais rápido
+#
+# Cada PDF tem o nome do seu manifesto; manifestos de mesmo nome em pastas diferentes
+# (parque_a/wtg01.json, parque_b/wtg01.json) ganham o nome da pasta (parque_a_wtg01.pdf).
+#
+# Cada manifesto (JSON, ou YAML se o PyYAML estiver instalado) tem os mesmos campos do formulário.
+# Caminhos de fotos são relativos à pasta do manifesto:
+#
+#   {
+#     "ambito_aplicacao": "Complexo Eólico Cutia - WTG SM2-09",
+#     "codigo_relatorio": "IQONY-INSP-01",
+#     "perfil": "final",   (opcional: "final" ou "rascunho"; --perfil vale para todos os manifestos)
+#     "revisado_por_1": "", "revisado_por_2": "", "data_revisao": "12/04/2025",
+#     "dados_gerais": {"Fabricante Modelo": "WEG AGW 110 2.1 MW", ...},
+#     "dados_pas": {"Fabricante": "...", ...},
+#     "imagem_maquina": "fotos/maquina.jpg",
+#     "imagens_pas": {"PÁ 1": ["fotos/pa1_a.jpg", "fotos/pa1_b.jpg"], "PÁ 2": [], "PÁ 3": []},
+#     "tabelas_externas": [[{"Localizacao": "B. A", "Descricao": "...", "Area": "...", "Código": "2"}, ...], [...], [...]],
+#     "topicos_externos": [{"Superfície do B.A": {"fotos": ["fotos/ba.jpg"], "obs": "..."}}, {}, {}],
+#     "tabelas_internas": [[...], [...], [...]],
+#     "topicos_internos": [{...}, {}, {}]
+#   }
+import argparse
+from collections import Counter
+import functools
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import banco_defeitos
+from cache_imagens import CacheImagens, DIRETORIO_PADRAO
+from fila_relatorios import gerar_no_trabalhador, iniciar_trabalhador
+from imagens import validar_imagem
+from relatorio_pdf import PERFIS, montar_relatorio_consolidado
+
+
+def ler_manifesto(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        if caminho.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("Manifestos YAML precisam do PyYAML (pip install pyyaml).")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _ler_foto(pasta, caminho):
+    # As fotos seguem como caminhos: só são lidas na preparação, uma de cada vez por thread
+    completo = os.path.abspath(os.path.join(pasta, caminho))
+    if not os.path.isfile(completo):
+        raise FileNotFoundError(f"{caminho}: foto não encontrada")
+    erro = validar_imagem(completo)  # Recusa antes de começar a montar o PDF, lendo só o cabeçalho
+    if erro:
+        raise ValueError(f"{caminho}: {erro}")
+    return completo
+
+
+def _topicos(ler_foto, topicos):
+    # {"tópico": {"fotos": [caminhos], "obs": "..."}} -> {"tópico": ([caminhos absolutos], "...")}
+    return {
+        titulo: ([ler_foto(foto) for foto in topico.get("fotos", [])], topico.get("obs", ""))
+        for titulo, topico in topicos.items()
+    }
+
+
+def _tabela(linhas):
+    return [
+        {
+            "Localizacao": linha.get("Localizacao", ""),
+            "Descricao": linha.get("Descricao", "") or "-",
+            "Area": linha.get("Area", "") or "-",
+            "Código": str(linha.get("Código", "") or "-"),
+        }
+        for linha in linhas
+    ]
+
+
+def _tres(lista):
+    # Sempre três pás, completando com itens vazios
+    return (list(lista or []) + [[]] * 3)[:3]
+
+
+def manifesto_para_dados(manifesto, pasta=None, perfil=None, ler_foto=None):
+    """Converte um manifesto no dicionário aceito por `montar_relatorio`, conferindo as fotos do disco.
+
+    `perfil`, se informado, substitui o perfil do manifesto (ValueError se não estiver
+    em `PERFIS`). Com `ler_foto`, cada
+    referência de foto do manifesto é resolvida por essa função em vez de ser um
+    caminho relativo a `pasta` (ex.: fotos enviadas pela API HTTP).
+    """
+    ler_foto = ler_foto or functools.partial(_ler_foto, pasta)
+    perfil = perfil or manifesto.get("perfil", "final")
+    if perfil not in PERFIS:
+        raise ValueError(f"perfil desconhecido: {perfil!r} (use {' ou '.join(sorted(PERFIS))})")
+    return {
+        "perfil": perfil,
+        "id_relatorio": manifesto.get("id_relatorio"),
+        "ambito_aplicacao": manifesto.get("ambito_aplicacao", ""),
+        "codigo_relatorio": manifesto.get("codigo_relatorio", ""),
+        "revisado_por_1": manifesto.get("revisado_por_1", ""),
+        "revisado_por_2": manifesto.get("revisado_por_2", ""),
+        "data_revisao": manifesto.get("data_revisao", ""),
+        "dados_gerais": {k: str(v) for k, v in manifesto.get("dados_gerais", {}).items()},
+        "dados_pas": {k: str(v) for k, v in manifesto.get("dados_pas", {}).items()},
+        "imagem_maquina": ler_foto(manifesto["imagem_maquina"]) if manifesto.get("imagem_maquina") else None,
+        "imagens_pas": {
+            f"PÁ {i}": [ler_foto(foto) for foto in manifesto.get("imagens_pas", {}).get(f"PÁ {i}", [])[:2]]
+            for i in range(1, 4)
+        },
+        "tabelas_externas": [_tabela(t) for t in _tres(manifesto.get("tabelas_externas"))],
+        "topicos_externos": [_topicos(ler_foto, t or {}) for t in _tres(manifesto.get("topicos_externos"))],
+        "tabelas_internas": [_tabela(t) for t in _tres(manifesto.get("tabelas_internas"))],
+        "topicos_internos": [_topicos(ler_foto, t or {}) for t in _tres(manifesto.get("topicos_internos"))],
+    }
+
+
+def _repetidos(nomes):
+    contagem = Counter(nomes.values())
+    return [caminho for caminho, nome in nomes.items() if contagem[nome] > 1]
+
+
+def nomes_saida(manifestos):
+    """Nome do PDF de cada manifesto (caminho absoluto -> nome), sem dois no mesmo arquivo.
+
+    O nome é o do manifesto; manifestos de mesmo nome em pastas diferentes ganham
+    o nome da pasta na frente ("parque_a_wtg01.pdf") e, se ainda assim repetirem,
+    um trecho do hash do caminho.
+    """
+    caminhos = dict.fromkeys(os.path.abspath(m) for m in manifestos)  # O mesmo manifesto duas vezes é gerado uma vez
+    nomes = {c: os.path.splitext(os.path.basename(c))[0] for c in caminhos}
+    for caminho in _repetidos(nomes):
+        nomes[caminho] = f"{os.path.basename(os.path.dirname(caminho))}_{nomes[caminho]}"
+    for caminho in _repetidos(nomes):
+        nomes[caminho] += "_" + hashlib.sha256(caminho.encode("utf-8")).hexdigest()[:8]
+    return {c: nome + ".pdf" for c, nome in nomes.items()}
+
+
+def gerar_de_manifesto(caminho, destino, perfil=None):
+    """Gera o PDF de um manifesto em `destino`; roda dentro de um processo de trabalho."""
+    inicio = time.perf_counter()
+    dados = _carregar_manifesto(caminho, perfil)
+    pdf, _ = gerar_no_trabalhador(dados)
+
+    with open(destino, "wb") as f:
+        f.write(pdf)
+    return destino, len(pdf), time.perf_counter() - inicio
+
+
+def _id_relatorio(manifesto, caminho):
+    # No banco de defeitos, o mesmo arquivo de manifesto gerado de novo substitui o relatório anterior
+    return manifesto.get("id_relatorio") or f"manifesto:{os.path.abspath(caminho)}"
+
+
+def _carregar_manifesto(caminho, perfil=None):
+    manifesto = ler_manifesto(caminho)
+    dados = manifesto_para_dados(manifesto, os.path.dirname(os.path.abspath(caminho)), perfil)
+    dados["id_relatorio"] = _id_relatorio(manifesto, caminho)
+    return dados
+
+
+def _defeitos_do_manifesto(manifesto, caminho, perfil=None):
+    # Só os campos usados pelo banco de defeitos (sem ler as fotos)
+    return {
+        "perfil": perfil or manifesto.get("perfil", "final"),
+        "id_relatorio": _id_relatorio(manifesto, caminho),
+        "codigo_relatorio": manifesto.get("codigo_relatorio", ""),
+        "ambito_aplicacao": manifesto.get("ambito_aplicacao", ""),
+        "data_revisao": manifesto.get("data_revisao", ""),
+        "tabelas_externas": [_tabela(t) for t in _tres(manifesto.get("tabelas_externas"))],
+        "tabelas_internas": [_tabela(t) for t in _tres(manifesto.get("tabelas_internas"))],
+    }
+
+
+def gerar_consolidado(manifestos, destino, diretorio_cache, caminho_banco=None, perfil=None):
+    """Gera um único PDF com todos os manifestos, um aerogerador por vez (memória limitada)."""
+    inicio = time.perf_counter()
+    cache = CacheImagens(diretorio_cache) if diretorio_cache else None
+    carregar = functools.partial(_carregar_manifesto, perfil=perfil)
+    paginas = montar_relatorio_consolidado(manifestos, destino, carregar, cache=cache)
+    if caminho_banco:
+        banco = banco_defeitos.conectar(caminho_banco)
+        for caminho in manifestos:
+            banco_defeitos.registrar_relatorio(banco, _defeitos_do_manifesto(ler_manifesto(caminho), caminho, perfil))
+    total = time.perf_counter() - inicio
+    print(f"{destino}: {len(manifestos)} aerogerador(es), {paginas} páginas, "
+          f"{os.path.getsize(destino) / 1024:.0f} KB em {total:.2f}s")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios de inspeção em lote a partir de manifestos.")
+    parser.add_argument("manifestos", nargs="+", help="arquivos de manifesto (.json, .yaml ou .yml)")
+    parser.add_argument("--saida", default="relatorios", help="pasta onde os PDFs são gravados")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="relatórios gerados ao mesmo tempo")
+    parser.add_argument("--sem-cache", action="store_true", help="não usa o cache de imagens preparadas")
+    parser.add_argument("--consolidado", help="grava um único PDF com todos os manifestos, em vez de um por aerogerador")
+    parser.add_argument("--banco", default=banco_defeitos.CAMINHO_PADRAO, help="banco SQLite onde os defeitos são registrados")
+    parser.add_argument("--sem-banco", action="store_true", help="não registra os defeitos no banco")
+    parser.add_argument("--perfil", choices=sorted(PERFIS), help="qualidade de todos os relatórios (padrão: a do manifesto)")
+    args = parser.parse_args(argv)
+
+    diretorio_cache = None if args.sem_cache else DIRETORIO_PADRAO
+    caminho_banco = None if args.sem_banco else args.banco
+    if args.consolidado:
+        return gerar_consolidado(args.manifestos, args.consolidado, diretorio_cache, caminho_banco, args.perfil)
+
+    os.makedirs(args.saida, exist_ok=True)
+    processos = max(1, min(args.processos, len(args.manifestos)))
+    threads_imagens = max(1, (os.cpu_count() or 1) // processos)
+
+    inicio = time.perf_counter()
+    falhas = 0
+    with ProcessPoolExecutor(
+        max_workers=processos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=iniciar_trabalhador,
+        initargs=(diretorio_cache, threads_imagens, caminho_banco),
+    ) as executor:
+        futuros = {
+            executor.submit(gerar_de_manifesto, caminho, os.path.join(args.saida, nome), args.perfil): caminho
+            for caminho, nome in nomes_saida(args.manifestos).items()
+        }
+        for futuro in as_completed(futuros):
+            try:
+                destino, tamanho, segundos = futuro.result()
+                print(f"{destino}: {segundos:.2f}s, {tamanho / 1024:.0f} KB")
+            except Exception as e:
+                falhas += 1
+                print(f"ERRO em {futuros[futuro]}: {e}", file=sys.stderr)
+
+    total = time.perf_counter() - inicio
+    gerados = len(futuros) - falhas
+    print(f"{gerados} relatório(s) em {total:.2f}s ({gerados / total:.2f} relatórios/s, {processos} processos)")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# Preparação das fotos enviadas antes da montagem do PDF
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO  # Manipulação de fluxos de bytes
+import hashlib
+import mmap
+import multiprocessing
+import os
+
+from PIL import Image, ImageOps  # Biblioteca para manipulação de imagens
+
+from cache_imagens import chave_conteudo
+
+MM_POR_POLEGADA = 25.4
+DPI_PADRAO = 200        # Resolução final das fotos dentro do quadro
+QUALIDADE_PADRAO = 80   # Qualidade do JPEG gerado (1 a 95)
+
+# Formatos aceitos nos uploads (o que o Pillow identifica no cabeçalho do arquivo)
+FORMATOS_ACEITOS = {"JPEG", "MPO", "PNG", "WEBP", "BMP", "TIFF", "GIF"}
+
+# Orientações EXIF que trocam largura e altura (rotação de 90° ou 270°)
+_ORIENTACOES_GIRADAS = {5, 6, 7, 8}
+
+# Pool criado uma única vez por processo e reaproveitado entre relatórios. O padrão são processos
+# em todos os núcleos (scripts e lotes); quem já roda em vários processos, como os processos de
+# trabalho de `FilaRelatorios` e o servidor Streamlit, troca por threads com `configurar_pool`
+# (o Pillow libera o GIL ao decodificar, redimensionar e codificar)
+_pool = None
+
+
+def tamanho_em_pixels(largura_mm, altura_mm, dpi=DPI_PADRAO):
+    # Converte o tamanho do quadro no PDF (mm) para pixels na resolução pedida
+    return (
+        max(1, round(largura_mm / MM_POR_POLEGADA * dpi)),
+        max(1, round(altura_mm / MM_POR_POLEGADA * dpi)),
+    )
+
+
+def abrir_foto(foto):
+    # Uma foto chega em memória (bytes) ou como caminho de um arquivo no disco (uploads grandes)
+    return foto if isinstance(foto, str) else BytesIO(foto)
+
+
+def hash_foto(foto):
+    """SHA-256 do conteúdo da foto; arquivos no disco são lidos por mmap, sem copiar para a memória."""
+    if isinstance(foto, str):
+        with open(foto, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return hashlib.sha256().digest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return hashlib.sha256(mapa).digest()
+    return hashlib.sha256(foto).digest()
+
+
+def _para_rgb(img):
+    # JPEG não tem transparência: aplica o canal alfa sobre fundo branco, como a página do PDF
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        fundo = Image.new("RGB", img.size, (255, 255, 255))
+        fundo.paste(img, mask=img.getchannel("A"))
+        return fundo
+    return img.convert("RGB")
+
+
+def validar_imagem(foto):
+    """Confere só o cabeçalho do arquivo; devolve a mensagem de erro ou None se a foto é aceita.
+
+    Não decodifica os pixels: serve para recusar arquivos corrompidos ou de outro
+    tipo já no envio, antes de a montagem do PDF começar.
+    """
+    try:
+        with Image.open(abrir_foto(foto)) as img:  # Lê só o cabeçalho
+            return conferir_aberta(img)
+    except Image.DecompressionBombError:
+        return "imagem grande demais"
+    except Exception:
+        return "arquivo corrompido ou não é uma imagem"
+
+
+def conferir_aberta(img):
+    # Mesma conferência de `validar_imagem`, numa imagem já aberta pelo Pillow
+    if img.format not in FORMATOS_ACEITOS:
+        return f"formato {img.format} não suportado"
+    if img.width < 1 or img.height < 1:
+        return "imagem sem dimensões"
+    return None
+
+
+def preparar_imagem(foto, largura_mm, altura_mm, dpi=DPI_PADRAO, qualidade=QUALIDADE_PADRAO):
+    """Reduz a foto ao tamanho do quadro onde será desenhada e recodifica como JPEG.
+
+    A imagem é esticada no quadro pelo PDF de qualquer forma, então cada eixo é
+    reduzido separadamente até a resolução `dpi`; fotos menores não são ampliadas.
+    JPEGs são decodificados já reduzidos (modo draft do Pillow), só até a resolução
+    que o quadro precisa, e a orientação EXIF é aplicada na mesma passada.
+    """
+    with Image.open(abrir_foto(foto)) as img:
+        return preparar_versoes(img, [(largura_mm, altura_mm, dpi, qualidade)])[0]
+
+
+def preparar_versoes(img, versoes):
+    """Prepara várias versões de uma foto já aberta pelo Pillow, decodificando-a uma vez só.
+
+    `versoes` é uma lista de `(largura_mm, altura_mm, dpi, qualidade)`; devolve os
+    JPEGs na mesma ordem. A foto é decodificada na maior resolução pedida e as
+    versões menores são reduzidas a partir dela.
+    """
+    pedidos = [(tamanho_em_pixels(largura_mm, altura_mm, dpi), qualidade) for largura_mm, altura_mm, dpi, qualidade in versoes]
+    largura_px = max(largura for (largura, _), _ in pedidos)
+    altura_px = max(altura for (_, altura), _ in pedidos)
+
+    # O draft age sobre a imagem como está gravada: com rotação de 90°, os eixos do quadro se invertem
+    orientacao = img.getexif().get(0x0112, 1)
+    img.draft("RGB", (altura_px, largura_px) if orientacao in _ORIENTACOES_GIRADAS else (largura_px, altura_px))
+    if orientacao != 1:
+        img = ImageOps.exif_transpose(img)
+    img = _para_rgb(img)
+
+    saidas = []
+    for (largura_px, altura_px), qualidade in pedidos:
+        versao = img
+        novo_tamanho = (min(img.width, largura_px), min(img.height, altura_px))
+        if novo_tamanho != img.size:
+            versao = img.resize(novo_tamanho, Image.LANCZOS)
+        saida = BytesIO()
+        versao.save(saida, "JPEG", quality=qualidade, optimize=True)
+        saidas.append(saida.getvalue())
+    return saidas
+
+
+def _preparar_tarefa(tarefa):
+    return preparar_imagem(*tarefa)
+
+
+def configurar_pool(executor):
+    """Troca o pool usado em `preparar_imagens` (ex.: threads dentro de um processo de trabalho)."""
+    global _pool
+    _pool = executor
+
+
+def _obter_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def mapear(funcao, itens):
+    """Aplica `funcao` a cada item no mesmo pool de `preparar_imagens`, mantendo a ordem.
+
+    Com processos, `funcao` precisa ser uma função de módulo (é enviada aos processos por nome).
+    """
+    itens = list(itens)
+    if len(itens) <= 1:
+        return [funcao(item) for item in itens]
+    return list(_obter_pool().map(funcao, itens))
+
+
+def _parametros(tarefa):
+    # Parâmetros de renderização completos (com os padrões) que entram na chave do cache
+    _, largura_mm, altura_mm, *resto = tarefa
+    dpi = resto[0] if len(resto) > 0 else DPI_PADRAO
+    qualidade = resto[1] if len(resto) > 1 else QUALIDADE_PADRAO
+    return largura_mm, altura_mm, dpi, qualidade
+
+
+def _preparar_lote(tarefas, chaves, cache):
+    # Consulta o cache e manda só as fotos que faltam para o pool
+    resultados = [None] * len(tarefas)
+    pendentes = []
+    for i in range(len(tarefas)):
+        if cache is not None:
+            resultados[i] = cache.obter(chaves[i])
+        if resultados[i] is None:
+            pendentes.append(i)
+
+    novos = mapear(_preparar_tarefa, [tarefas[i] for i in pendentes])
+
+    for i, dados in zip(pendentes, novos):
+        resultados[i] = dados
+        if cache is not None:
+            cache.guardar(chaves[i], dados)
+    return resultados
+
+
+def preparar_imagens(tarefas, cache=None):
+    """Prepara um lote de fotos em paralelo, mantendo a ordem de entrada.
+
+    Cada tarefa é uma tupla `(foto, largura_mm, altura_mm)` com os mesmos
+    argumentos opcionais de `preparar_imagem` (`dpi`, `qualidade`); a foto são os
+    bytes ou o caminho de um arquivo no disco. Com um
+    `CacheImagens`, só as fotos que ainda não estão no cache são processadas.
+
+    A mesma foto (mesmos bytes) usada em vários quadros é preparada uma única vez,
+    no maior deles; assim cada foto distinta vira um só objeto de imagem no PDF.
+    Fotos diferentes nunca são unificadas, por mais parecidas que sejam: cada uma
+    é uma evidência da inspeção.
+    """
+    unicas = []   # (dados, largura_mm, altura_mm, dpi, qualidade) de cada foto distinta
+    indices = {}  # (hash dos bytes, dpi, qualidade) -> posição em `unicas`
+    destino = []  # posição em `unicas` de cada tarefa recebida
+    for tarefa in tarefas:
+        largura_mm, altura_mm, dpi, qualidade = _parametros(tarefa)
+        identidade = (hash_foto(tarefa[0]), dpi, qualidade)
+        j = indices.get(identidade)
+        if j is None:
+            j = indices[identidade] = len(unicas)
+            unicas.append((tarefa[0], largura_mm, altura_mm, dpi, qualidade))
+        else:
+            # Mesmo conteúdo em outro quadro: prepara no maior tamanho de cada eixo
+            dados, largura_ant, altura_ant, _, _ = unicas[j]
+            unicas[j] = (dados, max(largura_mm, largura_ant), max(altura_mm, altura_ant), dpi, qualidade)
+        destino.append(j)
+
+    chaves = [None] * len(unicas)  # Chave do cache de cada foto distinta
+    for (hash_bytes, _, _), j in indices.items():
+        chaves[j] = chave_conteudo(hash_bytes, *unicas[j][1:])
+
+    preparadas = _preparar_lote(unicas, chaves, cache)
+    return [preparadas[j] for j in destino]
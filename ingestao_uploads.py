@@ -0,0 +1,207 @@
+# Registro dos arquivos enviados na sessão: cada upload é lido uma única vez
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter
+
+from imagens import validar_imagem
+
+LIMITE_MEMORIA_PADRAO = 1 * 1024 * 1024  # Arquivos maiores que isso vão para o disco
+COTA_PADRAO = 300 * 1024 * 1024          # Total de fotos aceito por sessão
+DIRETORIO_TEMPORARIO = os.path.join(tempfile.gettempdir(), "relatorio_uploads")
+_BLOCO = 1024 * 1024
+
+
+def limpar_sobras(diretorio_base=DIRETORIO_TEMPORARIO, idade_segundos=24 * 3600):
+    """Apaga pastas de sessões antigas que ficaram para trás (servidor encerrado à força)."""
+    if not os.path.isdir(diretorio_base):
+        return
+    limite = time.time() - idade_segundos
+    for nome in os.listdir(diretorio_base):
+        caminho = os.path.join(diretorio_base, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                shutil.rmtree(caminho, ignore_errors=True)
+        except OSError:
+            pass  # Apagada por outro processo ao mesmo tempo
+
+
+class RegistroUploads:
+    """Guarda os bytes de cada upload uma vez e entrega só uma referência (o hash).
+
+    O Streamlit devolve um novo `UploadedFile` a cada rerun, mas o `file_id` não
+    muda enquanto o arquivo continua no campo. Assim, um arquivo já visto não é
+    lido de novo; fotos iguais enviadas em campos diferentes ocupam a memória uma vez.
+    Arquivos que não são imagens válidas (conferido só pelo cabeçalho) são recusados.
+
+    Arquivos acima de `limite_memoria` são gravados na pasta temporária da sessão
+    e `obter` devolve o caminho (lido por mmap no hash e aberto sob demanda pelo
+    Pillow). Acima de `cota_bytes` no total, os novos envios são recusados. A pasta
+    é apagada quando o registro sai da sessão (ou no fim do processo).
+
+    Memória: o próprio Streamlit mantém em memória cada arquivo enquanto ele está
+    num campo (até `server.maxUploadSize` por arquivo), e o registro não tem como
+    liberar essa cópia. O que o registro limita é a sua parte: guarda em memória
+    só arquivos até `limite_memoria`, no máximo `cota_bytes` no total; os maiores
+    ficam só no disco, e os pedidos à fila de relatórios levam o caminho, não os
+    bytes. Por sessão, a memória fica em torno dos arquivos nos campos mais os
+    pequenos (até `cota_bytes`).
+
+    Arquivos usados por um relatório ainda na fila (`reter_ate`) só são apagados
+    do disco depois que ele termina, mesmo que saiam dos campos antes.
+    """
+
+    def __init__(self, limite_memoria=LIMITE_MEMORIA_PADRAO, cota_bytes=COTA_PADRAO, diretorio_base=DIRETORIO_TEMPORARIO):
+        self.limite_memoria = limite_memoria
+        self.cota_bytes = cota_bytes
+        self.diretorio_base = diretorio_base
+        self._diretorio = None  # Criado no primeiro arquivo grande
+        self._hashes = {}     # file_id -> hash do conteúdo
+        self._conteudos = {}  # hash do conteúdo -> bytes, ou caminho do arquivo no disco
+        self._tamanhos = {}   # hash do conteúdo -> tamanho em bytes
+        self._vistos = set()  # file_ids presentes nos campos na execução atual
+        self._erros = {}      # file_id -> motivo da recusa
+        self._externos = set()  # Hashes de fotos que já estavam no disco (pasta do drone): nunca apagadas
+        self._retidos = Counter()  # hash -> relatórios na fila que ainda vão abrir o arquivo
+        self._a_apagar = {}        # hash -> caminho que saiu dos campos, apagado quando deixar de ser retido
+        self._lock = threading.Lock()  # `_liberar` roda na thread que conclui os relatórios
+
+    @property
+    def total_bytes(self):
+        return sum(self._tamanhos.values())
+
+    def _pasta_sessao(self):
+        if self._diretorio is None:
+            os.makedirs(self.diretorio_base, exist_ok=True)
+            self._diretorio = tempfile.mkdtemp(prefix="sessao_", dir=self.diretorio_base)
+            weakref.finalize(self, shutil.rmtree, self._diretorio, ignore_errors=True)
+        return self._diretorio
+
+    def _gravar_em_disco(self, arquivo):
+        # Copia em blocos calculando o hash; o nome final do arquivo é o hash do conteúdo
+        h = hashlib.sha256()
+        descritor, temporario = tempfile.mkstemp(dir=self._pasta_sessao(), suffix=".parcial")
+        with os.fdopen(descritor, "wb") as destino:
+            arquivo.seek(0)
+            for bloco in iter(lambda: arquivo.read(_BLOCO), b""):
+                h.update(bloco)
+                destino.write(bloco)
+        referencia = h.hexdigest()
+        caminho = os.path.join(self._diretorio, referencia)
+        os.replace(temporario, caminho)
+        return referencia, caminho
+
+    def ingerir(self, arquivo):
+        """Devolve a referência (hash) do arquivo enviado, lendo os bytes só na primeira vez.
+
+        Devolve None se o arquivo foi recusado (o motivo fica em `erro`).
+        """
+        self._vistos.add(arquivo.file_id)
+        if arquivo.file_id in self._erros:
+            return None
+        referencia = self._hashes.get(arquivo.file_id)
+        if referencia is not None:
+            return referencia
+
+        if self.total_bytes + arquivo.size > self.cota_bytes:
+            self._erros[arquivo.file_id] = f"limite de {self.cota_bytes // (1024 * 1024)} MB de fotos por sessão atingido"
+            return None
+
+        if arquivo.size > self.limite_memoria:
+            referencia, conteudo = self._gravar_em_disco(arquivo)
+            with self._lock:
+                self._a_apagar.pop(referencia, None)  # Mesmo conteúdo enviado de novo: volta a ser usado
+        else:
+            conteudo = arquivo.getvalue()
+            referencia = hashlib.sha256(conteudo).hexdigest()
+        erro = validar_imagem(conteudo)
+        if erro:
+            self._erros[arquivo.file_id] = erro
+            if isinstance(conteudo, str) and referencia not in self._conteudos:
+                os.remove(conteudo)
+            return None
+
+        self._conteudos.setdefault(referencia, conteudo)
+        self._tamanhos[referencia] = arquivo.size
+        self._hashes[arquivo.file_id] = referencia
+        return referencia
+
+    def ingerir_caminho(self, caminho, referencia):
+        """Usa uma foto que já está no disco (ex.: pasta do drone, com o hash vindo do índice).
+
+        O arquivo não é copiado, não conta na cota da sessão e nunca é apagado pelo registro.
+        """
+        self._vistos.add(caminho)
+        self._hashes[caminho] = referencia
+        self._conteudos.setdefault(referencia, caminho)
+        self._externos.add(referencia)
+        return referencia
+
+    def ingerir_varios(self, arquivos):
+        referencias = (self.ingerir(arquivo) for arquivo in arquivos or [])
+        return [ref for ref in referencias if ref is not None]
+
+    def erro(self, arquivo):
+        """Motivo da recusa do arquivo, ou None se ele foi aceito."""
+        return self._erros.get(arquivo.file_id)
+
+    def obter(self, referencia):
+        """Bytes da foto, ou o caminho do arquivo na pasta da sessão para fotos grandes."""
+        return self._conteudos[referencia]
+
+    def iniciar_execucao(self):
+        # Chamado no início de cada execução completa da página
+        self._vistos = set()
+        if self._diretorio is not None:
+            try:
+                os.utime(self._diretorio)  # Sessão ativa: `limpar_sobras` de outro processo não apaga a pasta
+            except FileNotFoundError:
+                pass
+
+    def reter_ate(self, futuro, referencias):
+        """Mantém no disco os arquivos das `referencias` até o `futuro` (um relatório na fila) terminar.
+
+        O `futuro` guarda o registro até lá, então a pasta da sessão também não é
+        apagada antes, mesmo que a sessão termine.
+        """
+        referencias = list(referencias)
+        with self._lock:
+            self._retidos.update(referencias)
+        futuro.add_done_callback(lambda _: self._liberar(referencias))
+
+    def _liberar(self, referencias):
+        with self._lock:
+            self._retidos.subtract(referencias)
+            for referencia in set(referencias):
+                if self._retidos[referencia] <= 0:
+                    del self._retidos[referencia]
+                    self._apagar(self._a_apagar.pop(referencia, None))
+
+    @staticmethod
+    def _apagar(caminho):
+        if caminho is None:
+            return
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    def descartar_removidos(self):
+        """Esquece os arquivos que saíram dos campos (chamado no fim da execução completa)."""
+        self._hashes = {i: h for i, h in self._hashes.items() if i in self._vistos}
+        self._erros = {i: e for i, e in self._erros.items() if i in self._vistos}
+        em_uso = set(self._hashes.values())
+        with self._lock:
+            for referencia, conteudo in self._conteudos.items():
+                if referencia not in em_uso and isinstance(conteudo, str) and referencia not in self._externos:
+                    if self._retidos[referencia] > 0:
+                        self._a_apagar[referencia] = conteudo  # Um relatório na fila ainda vai abrir o arquivo
+                    else:
+                        self._apagar(conteudo)
+        self._conteudos = {h: d for h, d in self._conteudos.items() if h in em_uso}
+        self._tamanhos = {h: t for h, t in self._tamanhos.items() if h in em_uso}
+        self._externos &= em_uso
@@ -0,0 +1,299 @@
+# Índice das fotos que as equipes de drone deixam na pasta compartilhada depois de cada voo
+#
+# Uso:
+#   python pasta_drone.py --pasta /mnt/drone              (vigia a pasta continuamente)
+#   python pasta_drone.py --pasta /mnt/drone --uma-vez    (só indexa o que já está lá)
+#
+# A pasta tem uma subpasta por aerogerador e, dentro dela, opcionalmente uma por pá:
+#   /mnt/drone/WTG SM2-09/PA1/DJI_0001.JPG
+# Cada foto nova é conferida, tem o EXIF lido, ganha uma miniatura e deixa no cache de
+# imagens as versões reduzidas que o PDF e a pré-visualização vão pedir, tudo com uma leitura
+# e uma decodificação do arquivo; o formulário lista as fotos direto do índice (SQLite), sem
+# esperar nenhum processamento.
+#
+# A pasta é varrida a cada `intervalo` segundos, comparando tamanho e data de modificação:
+# pastas de rede não avisam o sistema de novos arquivos. Um arquivo só entra no índice
+# depois de ficar `ESTABILIDADE` segundos sem mudar (cópia terminada).
+import argparse
+from io import BytesIO
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from PIL import Image
+
+from cache_imagens import CacheImagens, DIRETORIO_PADRAO, chave_conteudo
+from imagens import conferir_aberta, hash_foto, mapear, preparar_versoes
+from relatorio_pdf import PERFIS, PREVIA_DPI, PREVIA_QUALIDADE
+
+CAMINHO_PADRAO = "fotos_drone.sqlite"
+INTERVALO_PADRAO = 10  # Segundos entre varreduras
+ESTABILIDADE = 5       # Segundos sem mudar até o arquivo ser considerado completo
+LOTE = 16              # Fotos processadas (em paralelo) e gravadas por transação
+EXTENSOES = {".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".bmp"}
+
+# Miniatura com a proporção do quadro dos tópicos (o PDF estica a foto no quadro)
+QUADRO_TOPICO = (86, 56)
+QUADRO_PA = (76, 46)  # Quadro de 80 x 50 mm da identificação das pás (seção 9)
+DPI_MINIATURA = 40
+QUALIDADE_MINIATURA = 70
+
+# Versões preparadas com antecedência, nos dois quadros: as do relatório final, do rascunho e da
+# pré-visualização (esta só existe para os tópicos)
+RESOLUCOES = [(p["dpi"], p["qualidade"]) for p in PERFIS.values()] + [(PREVIA_DPI, PREVIA_QUALIDADE)]
+VERSOES_CACHE = [(*QUADRO_TOPICO, dpi, qualidade) for dpi, qualidade in RESOLUCOES] + [
+    (*QUADRO_PA, p["dpi"], p["qualidade"]) for p in PERFIS.values()
+]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fotos (
+    caminho TEXT PRIMARY KEY,
+    turbina TEXT NOT NULL,          -- primeira subpasta da pasta vigiada
+    pa INTEGER,                     -- número da pá, se a foto está numa subpasta "PA1", "Pá 2"...
+    nome TEXT NOT NULL,
+    tamanho INTEGER NOT NULL,
+    modificada_ns INTEGER NOT NULL,
+    hash TEXT,                      -- SHA-256 do conteúdo (mesma referência do registro de uploads)
+    largura INTEGER,
+    altura INTEGER,
+    capturada_em TEXT,              -- data do EXIF ("2025-04-12 10:31:07"), se houver
+    camera TEXT,
+    miniatura BLOB,
+    erro TEXT,                      -- motivo da recusa; fotos com erro não aparecem no formulário
+    indexada_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fotos_turbina ON fotos (turbina, pa, capturada_em);
+"""
+
+
+def conectar(caminho=CAMINHO_PADRAO):
+    """Abre (e cria, se preciso) o índice; o vigia grava enquanto a página lê."""
+    conexao = sqlite3.connect(caminho, timeout=30)
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.executescript(_ESQUEMA)
+    return conexao
+
+
+def numero_pa(nome_pasta):
+    # "PA1", "Pá 2", "pa_3", "Blade 1" -> número da pá
+    encontrado = re.search(r"(?:p[aá]|blade)\s*[_-]?\s*(\d+)", nome_pasta or "", re.IGNORECASE)
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def _arquivos(pasta):
+    # (caminho, turbina, pá, stat) de cada foto dentro das subpastas dos aerogeradores
+    for raiz, subpastas, nomes in os.walk(pasta):
+        subpastas.sort()
+        partes = os.path.relpath(raiz, pasta).split(os.sep)
+        if partes == ["."]:
+            continue  # Fotos soltas na raiz não têm aerogerador
+        for nome in sorted(nomes):
+            if os.path.splitext(nome)[1].lower() not in EXTENSOES:
+                continue
+            caminho = os.path.join(raiz, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue  # Apagado durante a varredura
+            yield caminho, partes[0], numero_pa(partes[1]) if len(partes) > 1 else None, info
+
+
+def _exif(img):
+    # (largura, altura, data da captura, câmera), com largura e altura já na orientação da foto
+    exif = img.getexif()
+    largura, altura = img.size
+    if exif.get(0x0112, 1) in (5, 6, 7, 8):
+        largura, altura = altura, largura
+    data = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)  # DateTimeOriginal ou DateTime
+    if data:
+        data = re.sub(r"^(\d{4}):(\d{2}):(\d{2})", r"\1-\2-\3", str(data).strip("\x00 "))
+    camera = " ".join(str(exif.get(t, "")).strip("\x00 ") for t in (0x010F, 0x0110)).strip()
+    return largura, altura, data or None, camera or None
+
+
+def _ler_foto(tarefa):
+    """Tudo o que o índice e o cache de imagens precisam de uma foto, lendo e decodificando o arquivo uma vez.
+
+    Roda no pool de `imagens` (um processo ou thread por foto). Devolve um dicionário com
+    os campos da foto no índice e `versoes`: os JPEGs de `VERSOES_CACHE`, na mesma ordem
+    (só com `preparar` verdadeiro). Erros viram o campo `erro`, sem exceção.
+    """
+    caminho, preparar = tarefa
+    try:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+        img = Image.open(BytesIO(dados))  # Só o cabeçalho; os pixels são decodificados em preparar_versoes
+    except Image.DecompressionBombError:
+        return {"erro": "imagem grande demais"}
+    except Exception:
+        return {"erro": "arquivo corrompido ou não é uma imagem"}  # As mesmas mensagens de imagens.validar_imagem
+    with img:
+        erro = conferir_aberta(img)
+        if erro:
+            return {"erro": erro}
+        try:
+            campos = {"hash": hash_foto(dados).hex()}
+            campos["largura"], campos["altura"], campos["capturada_em"], campos["camera"] = _exif(img)
+            miniatura = (*QUADRO_TOPICO, DPI_MINIATURA, QUALIDADE_MINIATURA)
+            campos["miniatura"], *campos["versoes"] = preparar_versoes(img, [miniatura] + (VERSOES_CACHE if preparar else []))
+        except Exception as e:
+            return {"erro": f"falha ao ler a foto: {e}"}
+    return campos
+
+
+def _indexar_lote(conexao, lote, cache):
+    # Fotos do lote lidas em paralelo; a miniatura e as versões do cache saem da mesma decodificação
+    lidas = mapear(_ler_foto, [(caminho, cache is not None) for caminho, _, _, _ in lote])
+    linhas = []
+    for (caminho, turbina, pa, info), campos in zip(lote, lidas):
+        versoes = campos.pop("versoes", [])
+        linha = {
+            "caminho": caminho, "turbina": turbina, "pa": pa, "nome": os.path.basename(caminho),
+            "tamanho": info.st_size, "modificada_ns": info.st_mtime_ns, "hash": None, "largura": None,
+            "altura": None, "capturada_em": None, "camera": None, "miniatura": None, "erro": None,
+            "indexada_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+            **campos,
+        }
+        linhas.append(linha)
+
+        # Versões do PDF e da pré-visualização deixadas prontas no cache de imagens, com as mesmas
+        # chaves que `imagens.preparar_imagens` vai procurar
+        if versoes:
+            hash_bytes = bytes.fromhex(linha["hash"])
+            try:
+                for versao, dados in zip(VERSOES_CACHE, versoes):
+                    cache.guardar(chave_conteudo(hash_bytes, *versao), dados)
+            except Exception as e:
+                print(f"Erro ao preparar as fotos do drone no cache de imagens: {e}")
+
+    with conexao:
+        conexao.executemany(
+            "INSERT OR REPLACE INTO fotos (caminho, turbina, pa, nome, tamanho, modificada_ns, hash, largura, altura,"
+            " capturada_em, camera, miniatura, erro, indexada_em) VALUES (:caminho, :turbina, :pa, :nome, :tamanho,"
+            " :modificada_ns, :hash, :largura, :altura, :capturada_em, :camera, :miniatura, :erro, :indexada_em)",
+            linhas,
+        )
+
+
+def varrer(conexao, pasta, cache=None):
+    """Indexa as fotos novas ou alteradas da `pasta` e esquece as apagadas.
+
+    Devolve (fotos indexadas, fotos removidas do índice). Se a pasta não estiver acessível
+    (compartilhamento desmontado ou fora do ar) gera `FileNotFoundError` e o índice fica como está;
+    uma pasta acessível mas sem nenhuma foto também não apaga o índice.
+    """
+    if not os.path.isdir(pasta):
+        raise FileNotFoundError(f"pasta não acessível: {pasta}")
+    conhecidas = {
+        caminho: (tamanho, modificada)
+        for caminho, tamanho, modificada in conexao.execute("SELECT caminho, tamanho, modificada_ns FROM fotos")
+    }
+    limite = time.time() - ESTABILIDADE
+    presentes, lote, indexadas = set(), [], 0
+    for caminho, turbina, pa, info in _arquivos(pasta):
+        presentes.add(caminho)
+        if conhecidas.get(caminho) == (info.st_size, info.st_mtime_ns) or info.st_mtime > limite:
+            continue  # Já no índice, ou ainda sendo copiado
+        lote.append((caminho, turbina, pa, info))
+        if len(lote) == LOTE:
+            _indexar_lote(conexao, lote, cache)
+            indexadas, lote = indexadas + len(lote), []
+    if lote:
+        _indexar_lote(conexao, lote, cache)
+        indexadas += len(lote)
+
+    if not presentes and conhecidas:
+        # Ponto de montagem vazio (compartilhamento caiu) é mais provável que todas as fotos apagadas
+        print(f"Pasta do drone {pasta} sem nenhuma foto: o índice não foi alterado")
+        return indexadas, 0
+    removidas = [(caminho,) for caminho in conhecidas if caminho not in presentes]
+    with conexao:
+        conexao.executemany("DELETE FROM fotos WHERE caminho = ?", removidas)
+    return indexadas, len(removidas)
+
+
+def vigiar(pasta, caminho_banco=CAMINHO_PADRAO, intervalo=INTERVALO_PADRAO, diretorio_cache=DIRETORIO_PADRAO, parar=None):
+    """Varre a pasta a cada `intervalo` segundos até o evento `parar` ser acionado."""
+    conexao = conectar(caminho_banco)
+    cache = CacheImagens(diretorio_cache) if diretorio_cache else None
+    parar = parar or threading.Event()
+    while not parar.is_set():
+        try:
+            indexadas, removidas = varrer(conexao, pasta, cache)
+            if indexadas or removidas:
+                print(f"Pasta do drone: {indexadas} foto(s) indexada(s), {removidas} removida(s)")
+        except Exception as e:  # Pasta de rede fora do ar: tenta de novo na próxima varredura
+            print(f"Erro ao varrer a pasta do drone {pasta}: {e}")
+        parar.wait(intervalo)
+
+
+def iniciar_em_segundo_plano(pasta, caminho_banco=CAMINHO_PADRAO, intervalo=INTERVALO_PADRAO, diretorio_cache=DIRETORIO_PADRAO):
+    """Vigia a pasta em uma thread do processo atual (ex.: ao lado da página Streamlit)."""
+    parar = threading.Event()
+    threading.Thread(
+        target=vigiar, args=(pasta, caminho_banco, intervalo, diretorio_cache, parar), name="pasta_drone", daemon=True
+    ).start()
+    return parar
+
+
+# ------------------------ Consultas usadas pelo formulário ------------------------
+def turbinas(conexao):
+    """[(turbina, fotos válidas, última captura)], da pasta com fotos mais recentes para a mais antiga."""
+    return conexao.execute(
+        "SELECT turbina, COUNT(*), MAX(COALESCE(capturada_em, indexada_em)) AS ultima FROM fotos"
+        " WHERE erro IS NULL GROUP BY turbina ORDER BY ultima DESC"
+    ).fetchall()
+
+
+def fotos(conexao, turbina, pa=None):
+    """Fotos válidas do aerogerador em ordem de captura; com `pa`, as da pá e as sem pá definida."""
+    consulta = (
+        "SELECT caminho, nome, pa, hash, capturada_em FROM fotos WHERE erro IS NULL AND turbina = ?"
+        + (" AND (pa = ? OR pa IS NULL)" if pa is not None else "")
+        + " ORDER BY capturada_em, nome"
+    )
+    conexao.row_factory = sqlite3.Row
+    return [dict(linha) for linha in conexao.execute(consulta, (turbina, pa) if pa is not None else (turbina,))]
+
+
+def miniaturas(conexao, caminhos):
+    """Miniaturas JPEG das fotos, na ordem pedida (só as que continuam no índice)."""
+    if not caminhos:
+        return []
+    encontradas = dict(conexao.execute(
+        f"SELECT caminho, miniatura FROM fotos WHERE caminho IN ({', '.join('?' * len(caminhos))})", list(caminhos)
+    ))
+    return [encontradas[c] for c in caminhos if encontradas.get(c)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexa as fotos de drone deixadas na pasta compartilhada.")
+    parser.add_argument("--pasta", required=True, help="pasta com uma subpasta por aerogerador")
+    parser.add_argument("--banco", default=CAMINHO_PADRAO, help="arquivo do índice SQLite")
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_PADRAO, help="segundos entre varreduras")
+    parser.add_argument("--sem-cache", action="store_true", help="não prepara as versões reduzidas no cache de imagens")
+    parser.add_argument("--uma-vez", action="store_true", help="varre uma vez e termina")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.pasta):
+        print(f"Pasta não encontrada: {args.pasta}")
+        return 1
+    diretorio_cache = None if args.sem_cache else DIRETORIO_PADRAO
+    if args.uma_vez:
+        inicio = time.perf_counter()
+        cache = CacheImagens(diretorio_cache) if diretorio_cache else None
+        indexadas, removidas = varrer(conectar(args.banco), args.pasta, cache)
+        print(f"{indexadas} foto(s) indexada(s), {removidas} removida(s) em {time.perf_counter() - inicio:.1f} s")
+        return 0
+    try:
+        vigiar(args.pasta, args.banco, args.intervalo, diretorio_cache)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
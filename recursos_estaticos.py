@@ -0,0 +1,87 @@
+# Garante as imagens fixas do relatório (assets/) uma única vez por processo
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+URL_BASE = "https://raw.githubusercontent.com/Ruan2829/Relatoriodepa3/main/"
+
+# Caminho local -> SHA-256 esperado do conteúdo
+ASSETS = {
+    "assets/logo_iqony.png": "6bda92170d2f9b1c9306362166a0954bb3181d02a601f26aa66ca77da4a95bc9",
+    "assets/nomenclaturas.png": "138734e911aa7c92d0521a99a13aa48aac8db1a732adaa881c546fcb2bf7d47e",
+    "assets/wind_turbine_draw.png": "3f7b03154daf259b091bdf77078a6d50efd9eaff00619dc4b725447953bc8384",
+}
+
+TIMEOUT = (3, 10)  # Segundos para conectar e para receber os dados de cada download
+
+# Cópias que acompanham o código, usadas quando o download falha
+DIRETORIO_PACOTE = os.path.dirname(os.path.abspath(__file__))
+
+_lock = threading.Lock()
+_resultado = None  # Preenchido na primeira chamada de preparar_assets
+
+
+def _sha256(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _arquivo_valido(caminho, esperado):
+    try:
+        with open(caminho, "rb") as f:
+            return _sha256(f.read()) == esperado
+    except OSError:
+        return False
+
+
+def _gravar(caminho, dados):
+    # Grava em arquivo temporário e renomeia, para outro processo nunca ler um arquivo pela metade
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho) or ".", prefix=".tmp_")
+    with os.fdopen(fd, "wb") as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+
+def _obter_asset(caminho, esperado):
+    # Devolve a origem usada: "local", "github", "pacote" ou "ausente"
+    if _arquivo_valido(caminho, esperado):
+        return "local"
+
+    try:
+        response = requests.get(URL_BASE + caminho, timeout=TIMEOUT)
+        if response.status_code == 200 and _sha256(response.content) == esperado:
+            _gravar(caminho, response.content)
+            return "github"
+        print(f"Download inválido de {caminho}: status {response.status_code}")
+    except requests.RequestException as e:
+        print(f"Erro ao baixar {caminho}: {e}")
+
+    copia = os.path.join(DIRETORIO_PACOTE, caminho)
+    if os.path.abspath(copia) != os.path.abspath(caminho) and _arquivo_valido(copia, esperado):
+        with open(copia, "rb") as f:
+            _gravar(caminho, f.read())
+        return "pacote"
+    return "ausente"
+
+
+def preparar_assets():
+    """Confere os arquivos de `ASSETS` e busca os que faltam, em paralelo.
+
+    Só faz o trabalho na primeira chamada do processo; as seguintes devolvem o
+    mesmo resultado: `{"origens": {caminho: origem}, "segundos": duração}`.
+    """
+    global _resultado
+    with _lock:
+        if _resultado is None:
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=len(ASSETS)) as executor:
+                origens = dict(zip(ASSETS, executor.map(_obter_asset, ASSETS, ASSETS.values())))
+            segundos = time.perf_counter() - inicio
+            print(f"Assets prontos em {segundos:.2f}s: {origens}")
+            _resultado = {"origens": origens, "segundos": segundos}
+    return _resultado
@@ -1,13 +1,25 @@
 # Importa bibliotecas
 import streamlit as st  # Streamlit para interface web
-from fpdf import FPDF  # FPDF para geração do PDF
 import os  # Biblioteca para manipulação de arquivos
 from PIL import Image   # Biblioteca para manipulação de imagens
 import base64 # Biblioteca para codificação e decodificação de dados binários
 from io import BytesIO # Biblioteca para manipulação de fluxos de bytes
-import requests
+from recursos_estaticos import preparar_assets  # Download único e paralelo das imagens de assets/
 import unicodedata
-import uuid  # no topo do seu script
+import uuid
+import time
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import imagens  # Preparação das fotos (pool de threads neste processo, ver abaixo)
+from cache_imagens import CacheImagens, DIRETORIO_PADRAO  # Cache em disco das fotos já preparadas
+from fila_relatorios import FilaRelatorios, FilaCheia  # Geração do PDF em processos de trabalho
+from banco_defeitos import CAMINHO_PADRAO as BANCO_DEFEITOS  # Defeitos de todos os relatórios, para consultas
+from relatorio_pdf import max_fotos, montar_previa, rasterizar_paginas, titulo_classificacao  # Pré-visualização de uma pá
+from relatorio_pdf import TOPICOS_EXTERNA, TOPICOS_INTERNA
+from ingestao_uploads import RegistroUploads, limpar_sobras  # Cada upload é lido uma única vez por sessão
+from api_relatorios import iniciar_em_segundo_plano  # API HTTP local para outros sistemas
+import pasta_drone  # Índice das fotos deixadas pelas equipes de drone na pasta compartilhada
 
 def limpar_key(texto):
     texto = unicodedata.normalize("NFKD", texto).encode("ASCII", "ignore").decode("utf-8")
@@ -16,29 +28,121 @@ def limpar_key(texto):
 
 
 
-# -------------------- Baixar imagens do GitHub (se não existirem localmente) --------------------
+inicio_execucao = time.perf_counter()  # Início deste rerun, para medir o tempo da página
 
-# Dicionário com os caminhos locais e URLs das imagens no GitHub
-IMAGENS = {
-    "assets/logo_iqony.png": "https://raw.githubusercontent.com/Ruan2829/Relatoriodepa3/main/assets/logo_iqony.png",
-    "assets/nomenclaturas.png": "https://raw.githubusercontent.com/Ruan2829/Relatoriodepa3/main/assets/nomenclaturas.png",
-    "assets/wind_turbine_draw.png": "https://raw.githubusercontent.com/Ruan2829/Relatoriodepa3/main/assets/wind_turbine_draw.png",
-}
 
-#----------------- Cria a pasta 'assets' local se ainda não existir -------------------------
-os.makedirs("assets", exist_ok=True)
+@contextmanager
+def cronometro_bloco():
+    # Mostra no fim do bloco quanto tempo levou a última execução dele
+    inicio = time.perf_counter()
+    yield
+    st.caption(f"⏱️ Bloco atualizado em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+
+# -------------------- Imagens fixas do relatório (assets/) --------------------
+# Conferidas e, se faltarem, baixadas do GitHub uma única vez por processo (não a cada rerun)
+preparar_assets()
+
+
+
+# ----------------------- Fila de geração de relatórios (uma por processo do servidor) -----------------------
+# Vários processos do servidor (atrás de um balanceador) dividem os núcleos da máquina e
+# compartilham o cache de imagens, os assets e o banco de defeitos na pasta de trabalho
+PROCESSOS_SERVIDOR = int(os.environ.get("RELATORIO_PROCESSOS_SERVIDOR", "1"))
+
+
+@st.cache_resource
+def obter_fila_relatorios():
+    return FilaRelatorios(
+        diretorio_cache=DIRETORIO_PADRAO, caminho_banco=BANCO_DEFEITOS, processos_servidor=PROCESSOS_SERVIDOR
+    )
+
+
+# Pré-visualização e pasta do drone preparam fotos neste processo: em threads, não no pool de
+# processos padrão de imagens.py (cada processo novo executaria esta página de novo ao iniciar)
+@st.cache_resource
+def configurar_preparo_imagens():
+    imagens.configurar_pool(ThreadPoolExecutor(max_workers=os.cpu_count() or 1))
+
+
+configurar_preparo_imagens()
+
+# API HTTP opcional no mesmo processo, com a mesma fila (ver api_relatorios.py)
+PORTA_API = os.environ.get("RELATORIO_API_PORTA")
+
+
+@st.cache_resource
+def iniciar_api():
+    return iniciar_em_segundo_plano(obter_fila_relatorios(), porta=int(PORTA_API))
+
+
+# Os processos de trabalho executam este arquivo como "__mp_main__" ao iniciar: só o servidor sobe a API
+if PORTA_API and __name__ == "__main__":
+    iniciar_api()
+
+# Vigia opcional da pasta do drone no mesmo processo (ou rode `python pasta_drone.py --pasta ...` à parte)
+PASTA_DRONE = os.environ.get("RELATORIO_PASTA_DRONE")
 
-# Faz o download das imagens apenas se ainda não estiverem salvas localmente
-for caminho_local, url_github in IMAGENS.items():
-    if not os.path.exists(caminho_local):
-        try:
-            response = requests.get(url_github)
-            if response.status_code == 200:
-                with open(caminho_local, "wb") as f:
-                    f.write(response.content)
-        except Exception as e:
-            print(f"Erro ao baixar {url_github}: {e}")
 
+@st.cache_resource
+def iniciar_vigia_drone():
+    return pasta_drone.iniciar_em_segundo_plano(PASTA_DRONE)
+
+
+if PASTA_DRONE and __name__ == "__main__":
+    iniciar_vigia_drone()
+
+st.session_state.setdefault("id_sessao", uuid.uuid4().hex)  # Identifica a sessão na fila (evita cliques duplos)
+
+@st.cache_resource
+def limpar_uploads_antigos():
+    # Uma vez por processo: pastas de sessões de um servidor que não encerrou direito
+    limpar_sobras()
+
+
+limpar_uploads_antigos()
+
+# Os campos guardam só a referência (hash) de cada foto; os bytes ficam no registro da sessão
+# (fotos grandes na pasta temporária da sessão, até a cota por sessão)
+uploads = st.session_state.setdefault("uploads", RegistroUploads())
+uploads.iniciar_execucao()
+
+
+def ingerir_fotos(fotos):
+    # Registra as fotos e avisa, logo abaixo do campo, as que foram recusadas (ficam fora do PDF)
+    referencias = uploads.ingerir_varios(fotos)
+    for foto in fotos or []:
+        erro = uploads.erro(foto)
+        if erro:
+            st.error(f"❌ {foto.name}: {erro}. A foto não será usada no relatório.")
+    return referencias
+
+
+def consultar_drone(consulta, *args):
+    # Consulta rápida ao índice da pasta do drone (o vigia grava nele ao mesmo tempo)
+    conexao = pasta_drone.conectar(pasta_drone.CAMINHO_PADRAO)
+    try:
+        return consulta(conexao, *args)
+    finally:
+        conexao.close()
+
+
+def escolher_fotos_drone(rotulo, key, numero_pa, limite):
+    # Fotos já indexadas do aerogerador escolhido na seção 9; entram no relatório sem upload
+    turbina = st.session_state.get("turbina_drone")
+    if not turbina:
+        return []
+    disponiveis = {foto["caminho"]: foto for foto in consultar_drone(pasta_drone.fotos, turbina, numero_pa)}
+    escolhidas = st.multiselect(
+        rotulo,
+        list(disponiveis),
+        key=key,
+        max_selections=limite,
+        format_func=lambda c: f"{disponiveis[c]['nome']} ({disponiveis[c]['capturada_em'] or 'sem data'})",
+    )
+    if escolhidas:
+        st.image(consultar_drone(pasta_drone.miniaturas, escolhidas), width=130)
+    return [uploads.ingerir_caminho(c, disponiveis[c]["hash"]) for c in escolhidas]
 
 
 # -------------------------- Configuração da página Streamlit----------------------------------
@@ -84,486 +188,6 @@ st.markdown(
 )
 
 
-# ------------------------Classe PDF personalizada---------------------------
-class PDF(FPDF):
-    def header(self):
-        # Verifica se o arquivo da logo existe e insere a imagem no canto superior esquerdo (x=10, y=10, largura=30mm)
-        if os.path.exists("assets/logo_iqony.png"):
-            self.image("assets/logo_iqony.png", x=15, y=15, w=25)
-
-
-
-        # Define a posição e fonte do título central do relatório
-        self.set_xy(10, 10)                       # Define a posição (x=40, y=10) para o título
-        self.set_font("Arial", "B", 16)           # Define a fonte Arial, negrito, tamanho 12
-        self.cell(190, 40, "Relatório de Inspeção de Pás", border=1, ln=1, align="C")  # Linha 1 do título centralizada
-        self.ln(5)                            # Adiciona uma quebra de linha após o título
-
-        self.ln(5)
-# ------------------------------------ Rodapé do PDF Com imagem -------------------------------------
-    def footer(self):
-        # Adiciona imagem no canto inferior esquerdo
-        if os.path.exists("assets/wind_turbine_draw.png"):
-            self.image("assets/wind_turbine_draw.png", x=10, y=270, w=40)
-
-  # Ajuste 'x', 'y' e 'w' conforme o necessário
-
-        # Texto do rodapé
-        self.set_y(-10)
-        self.set_font("Arial", "I", 7)
-        self.multi_cell(
-            0, 4,      # Texto do rodapé, 0 largura, 6 altura
-            "Este documento é de propriedade da Iqony Solutions do Brasil LTDA. Nenhuma parte deste documento pode\n"
-            "ser distribuída sem sua permissão prévia por escrito.",
-            border=0, align="C"
-            
-        )
-        # Número da página centralizado
-        # Número da página no formato "Página X de Y"
-        self.set_y(-10)  # Ajusta posição
-        self.cell(0, 10, f"Página {self.page_no()} de {{nb}}", align="R") # adiciona um rodapé ao documento, mostrando o número da página atual e o total de páginas, como por exemplo: "Página 3 de 10"
-
-# -----------------------------------Área Departamento Responsável --------------------------
-
-    def primeira_pagina(self, ambito_aplicacao, codigo_relatorio, revisado_por_1, revisado_por_2, data_revisao):
-        self.set_font("Arial", "B", 12)
-        self.multi_cell(0, 50, f"Departamento Responsável: O&M.\nÂmbito da aplicação: {ambito_aplicacao}", border=1)
-        self.ln(10)
-        self.cell(95, 10, f"Número: {codigo_relatorio}", 1)
-        self.set_font("Arial", "B", 10)
-        self.cell(95, 10, "Revisão: 02", 1, ln=True)
-
-        self.set_font("Arial", "B", 10)
-        self.cell(45, 10, "", 1)
-        self.cell(80, 10, "(Assinatura):", 1)
-        self.cell(65, 10, "Data:", 1, ln=True)
-
-        self.set_font("Arial", "B", 10)
-        linhas = [
-            ["Elaborado por:", "Ruan Lopes da Silva", "12/04/2025"],
-            ["Revisado por:", "Thiago Abner ", "06/05/2025"],
-            ["Revisado por:", revisado_por_2, data_revisao],
-            ["Aprovado por:", "Vinícius Pazzini", "10/05/2025"]
-        ]
-        for linha in linhas:
-            self.cell(45, 10, linha[0], 1)
-            self.cell(80, 10, linha[1], 1)
-            self.cell(65, 10, linha[2], 1, ln=True) 
-    
-# --------------------------------- Sumário ---------------------------------------------------
-    def pagina_sumario(self): #
-        self.add_page()
-        self.set_font("Arial", "B", 14)
-        self.cell(0, 10, "Sumário", ln=True, align="C")
-        self.ln(5)
-
-        self.set_font("Arial", "B", 12)
-        topicos = [
-            "1. Introdução",
-            "2. Objetivo",
-            "3. Dados Gerais do Aerogerador",
-            "4. Dados Gerais das Pás",
-            "5. Nomenclaturas",
-            "6. Itens das pás a serem inspecionados",
-            "7. Referência da Avaliação de defeitos",
-            "8. Identificação da Máquina",
-            "9. Especificação e identificação das pás",
-            "10. Inspeção Externa",
-            "  10.1. Classificação de defeitos evidenciados na área externa da pá 1",
-            "  10.2. Classificação de defeitos evidenciados na área externa da pá 2",
-            "  10.3. Classificação de defeitos evidenciados na área externa da pá 3",
-            "11. Inspeção interna",
-            "  11.1. Classificação de defeitos evidenciados na área interna da pá 1",
-            "  11.2. Classificação de defeitos evidenciados na área interna da pá 2",
-            "  11.3. Classificação de defeitos evidenciados na área interna da pá 3",
-        ]
-        for item in topicos:
-            self.cell(0, 8, item, ln=True)
-
-
-# ------------------------ 3. Dados Gerais do Aerogerador e 4. Dados Gerais das Pás  - Objetivo e introdução---------------------
-    def pagina_dados(self, dados_gerais, dados_pas):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "1. Introdução", ln=True)
-
-        
-        self.set_font("Arial", "", 12)
-        self.multi_cell(0, 8,
-            "A atividade contratada consiste na inspeção das pás, realizada nas cascas externas, bordas de ataque e de fuga, "
-            "e em toda a extensão das pás. A análise e classificação dos defeitos, bem como a avaliação dos reparos, foram "
-            "realizadas pela equipe de serviços de O&M da IQONY.")
-        self.ln(5)
-
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "2. Objetivo", ln=True)
-        self.set_font("Arial", "", 12)
-        self.multi_cell(0, 8,
-            "Este relatório tem como objetivo apresentar os dados de uma inspeção de pás, realizada no aerogerador WEG modelo "
-            "AGW 110 2.1MW, localizado nos parques eólicos Cutia e Bento Miguel. As evidências têm por finalidade documentar o "
-            "estado operacional das pás.")
-        self.ln(5)
-
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "3. Dados Gerais do Aerogerador", ln=True)
-        self.set_font("Arial", "", 11)
-        for rotulo, valor in dados_gerais.items(): # 
-            self.cell(60, 10, rotulo, border=1)
-            self.cell(130, 10, valor, border=1, ln=True)
-
-        self.ln(5)
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "4. Dados Gerais das Pás", ln=True)
-        self.set_font("Arial", "", 11)
-        for rotulo, valor in dados_pas.items():
-            self.cell(60, 10, rotulo, border=1)
-            self.cell(130, 10, valor, border=1, ln=True)
-
-        self.ln(5)
-
-# ------------------------ 5. Nomenclaturas -------------------------------------
-    def pagina_nomenclaturas(self): 
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "5. Nomenclaturas", ln=True)
-        if os.path.exists("assets/nomenclaturas.png"):
-            self.image("assets/nomenclaturas.png", x=10, w=190)
-        else:
-            self.set_font("Arial", "I", 11)
-            self.multi_cell(0, 10, "Imagem de nomenclaturas não encontrada.")
-
-
-  # -------------- 6. Itens das Pás a Serem Inspecionados -----------------------------
-
-    def pagina_itens_referencia_identificacao(self, imagem_maquina_path=None):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "6. Itens das Pás a Serem Inspecionados", ln=True)
-
-        itens = [
-            ("Extradorso", "E.D."),
-            ("Intradorso", "I.D"),
-            ("Bordo de Ataque", "B.A."),
-            ("Bordo de Fuga", "B.F."),
-            ("Tip", "T.P."),
-            ("Raiz", "R.A."),
-            ("Almas (B.A e B.F)", "A.B.A, A.B.F"),
-            ("Áreas de Colagens (B.A e B.F)", "B.A.C, B.F.C"),
-            ("SPDA", "SPDA")
-        ]
-
-        for nome, sigla in itens:   # Cria uma célula para cada item
-            self.set_fill_color(220, 230, 241) # Cor de fundo azul claro
-            self.set_font("Arial", "B", 12) # Define a fonte para o título
-            self.cell(80, 10, nome, border=1, fill=True, align="C") # Cria célula com borda e fundo azul claro
-            self.set_font("Arial", "", 11) # Define a fonte para o conteúdo
-            self.cell(110, 10, sigla, border=1, ln=True) # Cria célula com borda e quebra de linha (ln=True)
-
-   # ----------------- 7. Referência da Avaliação de Defeitos -----------------------------------------
-        self.ln(5)
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "7. Referência da Avaliação de Defeitos", ln=True)
-
-        referencias = [
-            ("1", "Danos leves", "Operação normal"),
-            ("2", "Danos médios", "Reparo planejado"),
-            ("3", "Danos Graves", "Reparo imediato"),
-            ("4", "Danos Críticos", "Parar o aerogerador")
-        ]
-
-        for ref, desc, acao in referencias:
-            self.set_font("Arial", "", 11)
-            self.cell(20, 10, ref, border=1, align="C")
-            self.cell(70, 10, desc, border=1, align="C")
-            self.cell(100, 10, acao, border=1, ln=True, align="C")
-
-
- #-------------- 8. Identificação da Máquina ----------------------------------------------------------
-
-        self.ln(5)
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "8. Identificação da Máquina", ln=True)
-
-        if imagem_maquina_path and os.path.exists(imagem_maquina_path):
-            w = 190                 # Largura da imagem
-            h = w * 0.2             # Altura proporcional
-            x = (self.w - w) / 2    # Centraliza horizontalmente
-            y = self.get_y()        # Usa posição vertical atual após o título
-
-            self.rect(x, y, w, h)   # Borda ao redor da imagem
-            self.image(imagem_maquina_path, x=x + 2, y=y + 2, w=w - 4, h=h - 4)  # Imagem com margens internas
-            self.ln(h + 10)         # Espaço abaixo da imagem
-        else:
-            self.set_font("Arial", "I", 11)
-            self.multi_cell(0, 10, "Imagem de identificação da máquina não enviada.")
-
-
-# ------------------------ 9. Especificação e Identificação das Pás ---------------------
-    def pagina_identificacao_pas(self, imagens_pás):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "9. Especificação e Identificação das Pás", ln=True)
-        self.ln(1)
-
-        for nome_pa, lista_imgs in imagens_pás.items():
-            self.set_font("Arial", "B", 11)
-            self.cell(0, 10, nome_pa, ln=True)
-            self.ln(2)
-
-            altura_foto = 50
-            largura_foto = 80
-            espacamento_x = 10
-
-            # 🔵 Cálculo para centralizar
-            total_largura = len(lista_imgs) * largura_foto + (len(lista_imgs) - 1) * espacamento_x
-            x_inicial = (self.w - total_largura) / 2  # Centraliza as imagens
-            y_inicial = self.get_y()
-
-            for i, img in enumerate(lista_imgs):
-                if os.path.exists(img):
-                    x = x_inicial + i * (largura_foto + espacamento_x)
-                    y = y_inicial
-
-                    # 🔵 Desenha o retângulo (quadro)
-                    self.rect(x, y, largura_foto, altura_foto)
-
-                    # 🔵 Insere a imagem dentro do quadro
-                    self.image(img, x=x + 2, y=y + 2, w=largura_foto - 4, h=altura_foto - 4)
-
-            self.ln(altura_foto + 1)  # espaço abaixo das fotos antes da próxima PÁ
-
-
-
-    #----------------------- 10. Expeção externa e 10.1 Classificação de Defeitos Pa1, Pa2 e Pa3 -------------------
-
-
-    def pagina_inspecao_externa(self, numero_pa, tabela): 
-        self.add_page()
-
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "10. Inspeção Externa", ln=True)
-        self.ln(2)
-
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, f"10.{numero_pa}. Classificação de defeitos evidenciados na área externa da pá {numero_pa}", ln=True)
-        self.ln(2)
-
-        self.set_font("Arial", "B", 10)
-        self.cell(50, 10, "Localização", border=1)
-        self.cell(70, 10, "Descrição dos danos/ evidências", border=1)
-        self.cell(30, 10, "Área", border=1)
-        self.cell(40, 10, "Código", border=1, ln=True)
-
-        self.set_font("Arial", "", 10)
-        for linha in tabela:
-            self.cell(50, 10, linha["Localizacao"], border=1)
-            self.cell(70, 10, linha["Descricao"], border=1)
-            self.cell(30, 10, linha["Area"], border=1)
-            self.cell(40, 10, linha["Código"], border=1, ln=True)
-            self.ln(0)  # Adiciona um espaço entre as linhas da tabela
-
-
-    def pagina_inspecao_fotos(self, numero_pa, imagens_obs): 
-        #self.add_page()
-        self.set_font("Arial", "B", 12)
-
-        topicos = [
-            ("Superfície da pá lado sucção", 2),
-            ("Receptores do SPDA lado sucção", 2),
-            ("B.A lado da sucção", 2),
-            ("Superfície do B.A", 4),
-            ("Superfície da pá lado da pressão", 4),
-            ("Receptores do SPDA lado da pressão", 2),
-            ("Superfície no B.A lado da pressão", 2),
-        ]
-
-        for i, (titulo, qtd_max) in enumerate(topicos):
-            self.cell(0, 10, f"10.{numero_pa}.{i+1} {titulo}", ln=True)
-            self.ln(3)
-            imagens, obs = imagens_obs.get(titulo, ([], ""))
-            self._inserir_imagens_com_obs(imagens, obs, max_img=qtd_max)
-
-
-    def pagina_inspecao_externa_pa1(self, tabela_pa1):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "10. Inspeção Externa", ln=True)
-        self.ln(3)
-
-        self.set_font("Arial", "B", 11)
-        self.cell(0, 10, "10.1. Classificação de defeitos evidenciados na área externa da pá 1", ln=True)
-        self.ln(5)
-
-        # Cabeçalhos da tabela
-        self.set_font("Arial", "B", 10)
-        self.cell(50, 10, "Localização", border=1, align="C")
-        self.cell(70, 10, "Descrição dos danos/ evidências", border=1, align="C")
-        self.cell(30, 10, "Área", border=1, align="C")
-        self.cell(40, 10, "Código", border=1, ln=True, align="C")
-
-        # Linhas da tabela preenchidas a partir do dicionário
-        self.set_font("Arial", "", 10)
-        for linha in tabela_pa1:
-            self.cell(50, 10, linha["Localizacao"], border=1)
-            self.cell(70, 10, linha["Descricao"], border=1)
-            self.cell(30, 10, linha["Area"], border=1)
-            self.cell(40, 10, linha["Código"], border=1, ln=True)
-
-    def pagina_inspecao_externa_pa2(self, tabela_pa2):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "10.2. Classificação de defeitos evidenciados na área externa da pá 2", ln=True)
-        self.ln(5)
-
-        self.set_font("Arial", "B", 10)
-        self.cell(50, 10, "Localização", border=1)
-        self.cell(70, 10, "Descrição dos danos/ evidências", border=1)
-        self.cell(30, 10, "Área", border=1)
-        self.cell(40, 10, "Código", border=1, ln=True)
-
-        self.set_font("Arial", "", 10)
-        for linha in tabela_pa2:
-            self.cell(50, 10, linha["Localizacao"], border=1)
-            self.cell(70, 10, linha["Descricao"], border=1)
-            self.cell(30, 10, linha["Area"], border=1)
-            self.cell(40, 10, linha["Código"], border=1, ln=True)
-
-    def pagina_inspecao_externa_pa3(self, tabela_pa3):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "10.3. Classificação de defeitos evidenciados na área externa da pá 3", ln=True)
-        self.ln(5)
-
-        self.set_font("Arial", "B", 10)
-        self.cell(50, 10, "Localização", border=1)
-        self.cell(70, 10, "Descrição dos danos/ evidências", border=1)
-        self.cell(30, 10, "Área", border=1)
-        self.cell(40, 10, "Código", border=1, ln=True)
-
-        self.set_font("Arial", "", 10)
-        for linha in tabela_pa3:
-            self.cell(50, 10, linha["Localizacao"], border=1)
-            self.cell(70, 10, linha["Descricao"], border=1)
-            self.cell(30, 10, linha["Area"], border=1)
-            self.cell(40, 10, linha["Código"], border=1, ln=True)
-
-
-    def _inserir_imagens_com_obs(self, lista_imagens, observacao, max_img=2):
-        largura_img = 90  # Largura de cada imagem
-        altura_img = 60   # Altura de cada imagem
-        espacamento = 10  # Espaço horizontal entre imagens
-
-        x_inicial = 10  # Margem esquerda
-        y_inicial = self.get_y()  # Posição vertical atual
-
-        # Posiciona cada imagem lado a lado
-        for i, img_path in enumerate(lista_imagens[:max_img]):
-            if os.path.exists(img_path):
-                x = x_inicial + i * (largura_img + espacamento)  # Calcula a posição X de cada imagem
-                self.set_xy(x, y_inicial)  # Define a posição
-                self.rect(x, y_inicial, largura_img, altura_img)  # Desenha borda
-                self.image(img_path, x + 2, y_inicial + 2, w=largura_img - 4, h=altura_img - 4)  # Insere imagem dentro da borda
-
-        # Após todas as imagens, pula para linha de baixo
-        self.set_y(y_inicial + altura_img + 5)
-
-        self.set_font("Arial", "I", 11)
-        self.multi_cell(0, 8, f"Observações: {observacao or '-'}")
-        self.ln(10)
-
-
-    def pagina_inspecao_completa_pa(self, numero_pa, tabela, imagens_obs):
-        self.pagina_inspecao_externa(numero_pa, tabela)
-        self.pagina_inspecao_fotos(numero_pa, imagens_obs)
-
-        topicos = [
-            ("Superfície da pá lado sucção", 2),
-            ("Receptores do SPDA lado sucção", 2),
-            ("B.A lado da sucção", 2),
-            ("Superfície do B.A", 4),
-            ("Superfície da pá lado da pressão", 4),
-            ("Receptores do SPDA lado da pressão", 2),
-            ("Superfície no B.A lado da pressão", 2),
-        ]
-
-        for i, (titulo, max_img) in enumerate(topicos):
-            self.cell(0, 10, f"10.{numero_pa}.{i+1} {titulo}", ln=True)
-            self.ln(3)
-            imagens, obs = imagens_obs.get(titulo, ([], ""))
-            self._inserir_imagens_com_obs(imagens, obs, max_img=max_img)
-
-# ------------------------ 11. Inspeção Interna -------------------------------------
-
-    def pagina_inspecao_interna_completa_pa(self, numero_pa, fotos_identificacao, tabela_defeitos, imagens_obs):
-        self.add_page()
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, f"11. Inspeção Interna - Pá {numero_pa}", ln=True)
-        self.ln(5)
-
-        # 11.1 Identificação da pá
-        self.set_font("Arial", "B", 11)
-        self.cell(0, 10, "11.1 Identificação da pá", ln=True)
-        self.ln(2)
-
-        largura_img = 90
-        altura_img = 60
-        espacamento = 10
-
-        for i, img in enumerate(fotos_identificacao[:2]):
-            if os.path.exists(img):
-                x = 10 + i * (largura_img + espacamento)
-                y = self.get_y()
-                self.rect(x, y, largura_img, altura_img)
-                self.image(img, x + 2, y + 2, w=largura_img - 4, h=altura_img - 4)
-
-        self.ln(altura_img + 5)
-
-        # 11.2 Classificação de defeitos evidenciados
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "11. Inspeção Interna", ln=True)
-        self.ln(3)
-
-        self.set_font("Arial", "B", 11)
-        self.cell(0, 10, f"11.2 Classificação de defeitos evidenciados na área interna da pá {numero_pa}", ln=True)
-        self.ln(3)
-
-
-        self.set_font("Arial", "B", 10)
-        self.set_fill_color(220, 230, 241)
-        self.cell(50, 10, "Localização", border=1, fill=True, align="C")
-        self.cell(70, 10, "Descrição dos danos/ evidências", border=1, fill=True, align="C")
-        self.cell(30, 10, "Área", border=1, fill=True, align="C")
-        self.cell(40, 10, "Código", border=1, fill=True, align="C")
-        self.ln()
-
-        self.set_font("Arial", "", 10)
-        for linha in tabela_defeitos:
-            self.cell(50, 10, linha["Localizacao"], border=1)
-            self.cell(70, 10, linha["Descricao"], border=1)
-            self.cell(30, 10, linha["Area"], border=1)
-            self.cell(40, 10, linha["Código"], border=1)
-            self.ln()
-
-        self.ln(5)
-
-        # Subitens com fotos
-        topicos = [
-            f"11.2.1 B.A Não apresenta falhas de colagem visíveis",
-            f"11.2.2 Superfície entre as almas do B.F e Alma do B.A",
-            f"11.2.3 Coletores do SPDA",
-            f"11.2.4 B.F não apresenta falhas de colagem visíveis"
-        ]
-
-        for i, titulo in enumerate(topicos):
-            self.set_font("Arial", "B", 11)
-            self.cell(0, 10, titulo, ln=True)
-            self.ln(3)
-
-            imagens, obs = imagens_obs.get(titulo, ([], ""))
-            self._inserir_imagens_com_obs(imagens, obs, max_img=2)
-
-
-
 # -----------------------CAMPOS DE ENTRADA PARA O USUÁRIO VIA STREAMLIT-------------------------------
 
 #------------------------ Inputs Primeira pagina --------------------------------
@@ -604,13 +228,9 @@ with st.container():
         "Selecione a imagem (PNG ou JPG)",
     )
 
-    imagem_maquina_path = None
+    imagem_maquina_ref = None
     if imagem_maquina:
-        extensao = imagem_maquina.name.split(".")[-1].lower()  # 🔄 Usa o nome do arquivo e converte para minúsculo
-        imagem_maquina_path = f"imagem_maquina.{extensao}"
-
-        with open(imagem_maquina_path, "wb") as f:
-            f.write(imagem_maquina.read())
+        imagem_maquina_ref = next(iter(ingerir_fotos([imagem_maquina])), None)  # Lida só na primeira vez que aparece
 
         # Mostra imagem carregada abaixo
         #st.image(imagem_maquina, caption="Imagem carregada", use_column_width=True)
@@ -618,6 +238,21 @@ with st.container():
 # -------------------------- Especificação e identificação das pás ---------------------------------------------------------
 st.subheader("📷 9. Especificação e Identificação das Pás")
 
+# Fotos da pasta do drone: o aerogerador escolhido aqui alimenta as listas de fotos das pás e dos tópicos
+turbinas_drone = consultar_drone(pasta_drone.turbinas) if os.path.exists(pasta_drone.CAMINHO_PADRAO) else []
+if turbinas_drone:
+    nomes_turbinas = [turbina for turbina, _, _ in turbinas_drone]
+    sugerida = next((t for t in nomes_turbinas if t.lower() in ambito_aplicacao.lower()), None)
+    if "turbina_drone" not in st.session_state or st.session_state["turbina_drone"] not in [None] + nomes_turbinas:
+        st.session_state["turbina_drone"] = sugerida  # Sugere a pasta citada no âmbito da aplicação
+    fotos_por_turbina = {turbina: (quantidade, ultima) for turbina, quantidade, ultima in turbinas_drone}
+    st.selectbox(
+        "📂 Aerogerador na pasta do drone:",
+        [None] + nomes_turbinas,
+        key="turbina_drone",
+        format_func=lambda t: "Nenhum (só uploads)" if t is None else f"{t} ({fotos_por_turbina[t][0]} fotos, até {fotos_por_turbina[t][1]})",
+    )
+
 imagens_pás = {}
 for i in range(1, 4):
     with st.container():
@@ -628,342 +263,237 @@ for i in range(1, 4):
             key=f"fotos_pa_{i}"
         )
 
-        caminhos = []
-        for j, foto in enumerate(fotos[:2]):
-            extensao = foto.type.split("/")[-1]
-            nome_limpo = limpar_key(f"foto_pa_{i}_{j}")
-            caminho = f"{nome_limpo}.{extensao}"
-            with open(caminho, "wb") as f:
-                f.write(foto.read())
-            caminhos.append(caminho)
+        # Guarda só as referências; os bytes são lidos uma vez, no primeiro envio
+        drone = escolher_fotos_drone(f"Fotos do drone para PÁ {i}", f"drone_pa_{i}", i, 2)
+        imagens_pás[f"PÁ {i}"] = (ingerir_fotos(fotos[:2]) + drone)[:2]
 
-        imagens_pás[f"PÁ {i}"] = caminhos
 
-
-# ------------------------ Inputs Inspeção Externa -------------------------------------
-# 10. Inspeção Externa - Classificação de Defeitos (PÁ 1, PÁ 2 e PÁ 3)
+# ------------------------ Pré-visualização de uma pá -------------------------------------
+# Desenha só a tabela e os tópicos de uma pá, com miniaturas das fotos, sem montar o relatório inteiro.
+# Fica no fim do bloco de tópicos da pá: cada edição já executa de novo esse fragmento, que redesenha
+# na hora se os campos mudaram (sem consultas periódicas). A tabela da pá é outro fragmento; quando
+# ela muda com a pré-visualização ligada, pede uma execução da página para o bloco de tópicos redesenhar.
 
 
-st.subheader("🔍 10. Inspeção Externa - Classificação de Defeitos (PÁ 1)")
-
-# Lista das localizações da pá
-localizacoes = ["R.A Ping Teste", "I.D", "E. D", "B. A", "B. F", "TIP", "SPDA"]
+@st.cache_resource
+def obter_cache_previa():
+    return CacheImagens(DIRETORIO_PADRAO)
 
-# Lista para armazenar os dados preenchidos
-tabela_externa_pa1 = []
 
-# Gera campos de entrada para cada linha da tabela
-for loc in localizacoes:
-    col1, col2, col3 = st.columns([2, 2, 2])  # Cria 3 colunas com largura igual
+def previa_pa(numero_pa, inspecao, topicos):
+    if not st.toggle(f"👁️ Pré-visualizar a página da PÁ {numero_pa} (inspeção {inspecao})", key=f"previa_{inspecao}_pa{numero_pa}"):
+        return
+    tabela = st.session_state.get(f"secao_{inspecao}_pa{numero_pa}_tabela", [])
+    digest = hashlib.sha256(repr((tabela, topicos)).encode("utf-8")).hexdigest()
 
-    with col1:
-        desc = st.text_input(f"Descrição - {loc}", key=f"desc_{loc}")
+    estado = st.session_state.setdefault(f"previa_{inspecao}_pa{numero_pa}_estado", {})
+    if digest != estado.get("desenhado"):
+        inicio = time.perf_counter()
+        estado["desenhado"] = digest  # Não tenta de novo os mesmos campos se o desenho falhar
+        try:
+            topicos_bytes = {t: ([uploads.obter(ref) for ref in refs], obs) for t, (refs, obs) in topicos.items()}
+            pdf = montar_previa(titulo_classificacao(inspecao, numero_pa), tabela, topicos_bytes, numero_pa, cache=obter_cache_previa())
+            estado.update(pdf=pdf, paginas=rasterizar_paginas(pdf), ms=(time.perf_counter() - inicio) * 1000, erro=None)
+        except Exception as e:
+            estado["erro"] = str(e)
 
-    with col2:
-        area = st.text_input(f"Área - {loc}", key=f"area_{loc}")
+    if estado.get("erro"):
+        st.error(f"Erro ao desenhar a pré-visualização: {estado['erro']}")
+    if "pdf" not in estado:
+        return
+    if estado["paginas"] is None:
+        st.info("Instale o pacote pypdfium2 para ver a página aqui; por enquanto, baixe a pré-visualização em PDF.")
+        st.download_button("📥 Baixar pré-visualização", estado["pdf"], file_name=f"previa_{inspecao}_pa{numero_pa}.pdf", mime="application/pdf")
+    else:
+        st.image(estado["paginas"])
+    st.caption(f"⏱️ Pré-visualização desenhada em {estado['ms']:.0f} ms")
 
-    with col3:
-        cod_cor = st.text_input(f"Código - {loc}", key=f"cod_{loc}")
 
-    
-    # Armazena os dados para o PDF
-    tabela_externa_pa1.append({
-        "Localizacao": loc,
-        "Descricao": desc,
-        "Area": area,
-        "Código": cod_cor
-    })
+def guardar_tabela(inspecao, numero_pa, tabela):
+    # Última versão da tabela, usada pela pré-visualização (desenhada no bloco de tópicos da pá)
+    chave = f"secao_{inspecao}_pa{numero_pa}_tabela"
+    anterior = st.session_state.get(chave)
+    st.session_state[chave] = tabela
+    if anterior is not None and anterior != tabela and st.session_state.get(f"previa_{inspecao}_pa{numero_pa}"):
+        st.rerun()
 
-st.markdown("---") # Linha de separação
 
-# ------------------------------ pá 2 exterma --------------------------------------------
-st.subheader("🔍 10.2 Inspeção Externa - Classificação de Defeitos (PÁ 2)")
+# ------------------------ Inputs Inspeção Externa -------------------------------------
+# 10. Inspeção Externa - Classificação de Defeitos (PÁ 1, PÁ 2 e PÁ 3)
+# Cada bloco de pá é um fragmento: editar um campo executa de novo só aquele bloco, não o script inteiro
 
-tabela_externa_pa2 = []
+# Lista das localizações da pá
+localizacoes = ["R.A Ping Teste", "I.D", "E. D", "B. A", "B. F", "TIP", "SPDA"]
 
-for loc in localizacoes:
-    st.markdown(f"**📌 Localização: {loc}**")
-    
-    col1, col2, col3 = st.columns([2, 2, 2])
 
-    with col1:
-        desc = st.text_input(f"Descrição - {loc}", key=f"desc_pa2_{loc}")
+@st.fragment
+def tabela_defeitos_externa(numero_pa):
+    with cronometro_bloco():
+        titulo = "10." if numero_pa == 1 else f"10.{numero_pa}"
+        st.subheader(f"🔍 {titulo} Inspeção Externa - Classificação de Defeitos (PÁ {numero_pa})")
 
-    with col2:
-        area = st.text_input(f"Área - {loc}", key=f"area_pa2_{loc}")
+        prefixo = "" if numero_pa == 1 else f"pa{numero_pa}_"  # Mantém as chaves usadas antes
 
-    with col3:
-        cod_cor = st.text_input(f"Código- {loc}", key=f"cod_pa2_{loc}")
+        # Lista para armazenar os dados preenchidos
+        tabela = []
 
-    tabela_externa_pa2.append({
-        "Localizacao": loc,
-        "Descricao": desc,
-        "Area": area,
-        "Código": cod_cor
-    })
+        # Gera campos de entrada para cada linha da tabela
+        for loc in localizacoes:
+            st.markdown(f"**📌 Localização: {loc}**")
 
-#---------------------------------------- pá 3 -------------------------------------------
-st.subheader("🔍 10.3 Inspeção Externa - Classificação de Defeitos (PÁ 3)")
+            col1, col2, col3 = st.columns([2, 2, 2])  # Cria 3 colunas com largura igual
 
-tabela_externa_pa3 = []
+            with col1:
+                desc = st.text_input(f"Descrição - {loc}", key=f"desc_{prefixo}{loc}")
 
-for loc in localizacoes:
-    st.markdown(f"**📌 Localização: {loc}**")
-    
-    col1, col2, col3 = st.columns([2, 2, 2])
+            with col2:
+                area = st.text_input(f"Área - {loc}", key=f"area_{prefixo}{loc}")
 
-    with col1:
-        desc = st.text_input(f"Descrição - {loc}", key=f"desc_pa3_{loc}")
+            with col3:
+                cod_cor = st.text_input(f"Código - {loc}", key=f"cod_{prefixo}{loc}")
 
-    with col2:
-        area = st.text_input(f"Área - {loc}", key=f"area_pa3_{loc}")
+            # Armazena os dados para o PDF
+            tabela.append({
+                "Localizacao": loc,
+                "Descricao": desc,
+                "Area": area,
+                "Código": cod_cor
+            })
 
-    with col3:
-        cod_cor = st.text_input(f"Código - {loc}", key=f"cod_pa3_{loc}")
+        st.markdown("---") # Linha de separação
+    guardar_tabela("externa", numero_pa, tabela)
+    return tabela
 
-    tabela_externa_pa3.append({
-        "Localizacao": loc,
-        "Descricao": desc,
-        "Area": area,
-        "Código": cod_cor
-    })
 
+tabela_externa_pa1 = tabela_defeitos_externa(1)
+tabela_externa_pa2 = tabela_defeitos_externa(2)
+tabela_externa_pa3 = tabela_defeitos_externa(3)
 
-       
 
 # 📸 INSPEÇÃO EXTERNA - NOVO MODELO
 
-# --- Inspeção Externa - PÁ 1 ---
-
-st.subheader("🔍 10.1 Inspeção Externa - PÁ 1")
-
-topicos_externa = [
-    "Superfície da pá lado sucção",
-    "Receptores do SPDA lado sucção",
-    "B.A lado da sucção",
-    "Superfície do B.A",
-    "Superfície da pá lado da pressão",
-    "Receptores do SPDA lado da pressão",
-    "Superfície no B.A lado da pressão"
-]
-
-topicos_selecionados_pa1 = st.multiselect(
-    "Selecione os tópicos com problemas na PÁ 1:", 
-    topicos_externa, 
-    key="topicos_selecionados_pa1"
-)
-
-imagens_obs_externa_pa1 = {}
-
-for topico in topicos_selecionados_pa1:
-    st.markdown(f"### 📸 {topico} (PÁ 1)")
-    
-    key_foto = limpar_key(f"fotos_externa_pa1_{topico}")
-    fotos = st.file_uploader(
-        f"Envie até 2 fotos para '{topico}' (PÁ 1)",
-
-        accept_multiple_files=True,
-        key=key_foto
-    )
-
-
-    key_obs = limpar_key(f"obs_externa_pa1_{topico}")
-    obs = st.text_area(f"Observações sobre '{topico}' (PÁ 1)", key=key_obs)
-
-    imagens_obs_externa_pa1[topico] = (fotos, obs)
-
+topicos_externa = TOPICOS_EXTERNA  # Listas em relatorio_pdf, junto do limite de fotos de cada tópico
 
-# ------------------------------------ Inspeção Externa - PÁ 2 ---------------------------------
 
-st.subheader("🔍 10.2 Inspeção Externa - PÁ 2")
-
-topicos_selecionados_pa2 = st.multiselect(
-    "Selecione os tópicos com problemas na PÁ 2:", 
-    topicos_externa, 
-    key="topicos_selecionados_pa2"
-)
-
-imagens_obs_externa_pa2 = {}
-
-for topico in topicos_selecionados_pa2:
-    st.markdown(f"### 📸 {topico} (PÁ 2)")
-
-    key_foto = limpar_key(f"fotos_externa_pa2_{topico}")
-    fotos = st.file_uploader(
-        f"Envie até 2 fotos para '{topico}' (PÁ 2)",
-  
-        accept_multiple_files=True,
-        key=key_foto
-    )
+@st.fragment
+def bloco_inspecao_externa(pa_num):
+    with cronometro_bloco():
+        st.subheader(f"🔍 10.{pa_num} Inspeção Externa - PÁ {pa_num}")
 
+        topicos_selecionados = st.multiselect(
+            f"Selecione os tópicos com problemas na PÁ {pa_num}:",
+            topicos_externa,
+            key=f"topicos_selecionados_pa{pa_num}"
+        )
 
-    key_obs = limpar_key(f"obs_externa_pa2_{topico}")
-    obs = st.text_area(f"Observações sobre '{topico}' (PÁ 2)", key=key_obs)
+        imagens_obs = {}
 
-    imagens_obs_externa_pa2[topico] = (fotos, obs)
+        for topico in topicos_selecionados:
+            st.markdown(f"### 📸 {topico} (PÁ {pa_num})")
 
-# ------------------- pa 3 ------------------
+            key_foto = limpar_key(f"fotos_externa_pa{pa_num}_{topico}")
+            fotos = st.file_uploader(
+                f"Envie até {max_fotos(topico)} fotos para '{topico}' (PÁ {pa_num})",
+                accept_multiple_files=True,
+                key=key_foto
+            )
 
-st.subheader("🔍 10.3 Inspeção Externa - PÁ 3")
+            drone = escolher_fotos_drone(
+                f"Fotos do drone para '{topico}' (PÁ {pa_num})", limpar_key(f"drone_externa_pa{pa_num}_{topico}"), pa_num, max_fotos(topico)
+            )
 
-topicos_selecionados_pa3 = st.multiselect(
-    "Selecione os tópicos com problemas na PÁ 3:", 
-    topicos_externa, 
-    key="topicos_selecionados_pa3"
-)
+            key_obs = limpar_key(f"obs_externa_pa{pa_num}_{topico}")
+            obs = st.text_area(f"Observações sobre '{topico}' (PÁ {pa_num})", key=key_obs)
 
-imagens_obs_externa_pa3 = {}
-
-for topico in topicos_selecionados_pa3:
-    st.markdown(f"### 📸 {topico} (PÁ 3)")
+            imagens_obs[topico] = (ingerir_fotos(fotos) + drone, obs)
+        previa_pa(pa_num, "externa", imagens_obs)
+    return imagens_obs
 
-    key_foto = limpar_key(f"fotos_externa_pa3_{topico}")
-    fotos = st.file_uploader(
-        f"Envie até 2 fotos para '{topico}' (PÁ 3)", 
-         
-        accept_multiple_files=True, 
-        key=key_foto
-    )
 
-    key_obs = limpar_key(f"obs_externa_pa3_{topico}")
-    obs = st.text_area(f"Observações sobre '{topico}' (PÁ 3)", key=key_obs)
+imagens_obs_externa_pa1 = bloco_inspecao_externa(1)
+imagens_obs_externa_pa2 = bloco_inspecao_externa(2)
+imagens_obs_externa_pa3 = bloco_inspecao_externa(3)
 
-    imagens_obs_externa_pa3[topico] = (fotos, obs)
 
-          
 # ----------------------------- INSPEÇÃO INTERNA -----------------------------
 
 
 
 # Função para gerar a tabela de defeitos internos
 
+@st.fragment
 def tabela_defeitos_interna(numero_pa):
-    st.subheader(f"📋 11.2 Inspeção Interna - Classificação de Defeitos - PÁ {numero_pa}")
-    tabela = []
-    localizacoes = [
-        "C.E.", "B.F.", "B.F.C.", "I.D.B.F.", "E.D.B.F.", "A.B.F.",
-        "I.D.E.A.", "A.B.A.", "I.D.B.A.", "E.D.B.A.", "B.A.", "B.A.C"
-    ]
-    for loc in localizacoes:
-        col1, col2, col3 = st.columns([2, 2, 2])
+    with cronometro_bloco():
+        st.subheader(f"📋 11.2 Inspeção Interna - Classificação de Defeitos - PÁ {numero_pa}")
+        tabela = []
+        localizacoes = [
+            "C.E.", "B.F.", "B.F.C.", "I.D.B.F.", "E.D.B.F.", "A.B.F.",
+            "I.D.E.A.", "A.B.A.", "I.D.B.A.", "E.D.B.A.", "B.A.", "B.A.C"
+        ]
+        for loc in localizacoes:
+            col1, col2, col3 = st.columns([2, 2, 2])
 
-        with col1:
-            desc = st.text_input(f"Descrição interna - {loc} (PÁ {numero_pa})", key=f"desc_def_interna_pa{numero_pa}_{loc}")
+            with col1:
+                desc = st.text_input(f"Descrição interna - {loc} (PÁ {numero_pa})", key=f"desc_def_interna_pa{numero_pa}_{loc}")
 
-        with col2:
-            area = st.text_input(f"Área interna - {loc} (PÁ {numero_pa})", key=f"area_def_interna_pa{numero_pa}_{loc}")
+            with col2:
+                area = st.text_input(f"Área interna - {loc} (PÁ {numero_pa})", key=f"area_def_interna_pa{numero_pa}_{loc}")
 
-        with col3:
-            cod_interno = st.text_input(f"Código - {loc} (PÁ {numero_pa})", key=f"cod_def_interna_pa{numero_pa}_{loc}")
+            with col3:
+                cod_interno = st.text_input(f"Código - {loc} (PÁ {numero_pa})", key=f"cod_def_interna_pa{numero_pa}_{loc}")
 
-        tabela.append({
-            "Localizacao": loc,
-            "Descricao": desc or "-",
-            "Area": area or "-",
-            "Código": cod_interno or "-"
-        })
+            tabela.append({
+                "Localizacao": loc,
+                "Descricao": desc or "-",
+                "Area": area or "-",
+                "Código": cod_interno or "-"
+            })
+    guardar_tabela("interna", numero_pa, tabela)
     return tabela
 
 # Listas de tópicos com fotos (Inspeção Interna)
-topicos_interna = [
-    "B.A",
-    "Superfície entre as almas do B.F e Alma do B.A",
-    "Coletores do SPDA",
-    "B.F"
-]
+topicos_interna = TOPICOS_INTERNA
 
 # Bloco dinâmico para fotos e observações por PÁ
 
 
+@st.fragment
 def bloco_inspecao_interna(pa_num):
-    st.subheader(f"📷 11.3 Itens com evidências fotográficas - PÁ {pa_num}")
-    imagens_obs = {}
-
-    topicos_selecionados = st.multiselect(
-        f"Selecione os tópicos com problemas (PÁ {pa_num} - interna):",
-        topicos_interna, 
-        key=limpar_key(f"topicos_interna_pa{pa_num}")
-    )
-
-    for topico in topicos_selecionados:
-        st.markdown(f"### 📸 {topico} (PÁ {pa_num})")
-
-        key_foto = limpar_key(f"fotos_interna_pa{pa_num}_{topico}")
-        fotos = st.file_uploader(
-            f"Envie até 2 fotos para '{topico}' (PÁ {pa_num})",
-        
-            accept_multiple_files=True,
-            key=key_foto
+    with cronometro_bloco():
+        st.subheader(f"📷 11.3 Itens com evidências fotográficas - PÁ {pa_num}")
+        imagens_obs = {}
+
+        topicos_selecionados = st.multiselect(
+            f"Selecione os tópicos com problemas (PÁ {pa_num} - interna):",
+            topicos_interna, 
+            key=limpar_key(f"topicos_interna_pa{pa_num}")
         )
 
-        key_obs = limpar_key(f"obs_interna_pa{pa_num}_{topico}")
-        obs = st.text_area(
-            f"Observações sobre '{topico}' (PÁ {pa_num})",
-            key=key_obs
-        )
-
-        imagens_obs[topico] = (fotos, obs)
-
-    return imagens_obs
-
+        for topico in topicos_selecionados:
+            st.markdown(f"### 📸 {topico} (PÁ {pa_num})")
 
+            key_foto = limpar_key(f"fotos_interna_pa{pa_num}_{topico}")
+            fotos = st.file_uploader(
+                f"Envie até {max_fotos(topico)} fotos para '{topico}' (PÁ {pa_num})",
+        
+                accept_multiple_files=True,
+                key=key_foto
+            )
 
-#------------------------ Inspeção Interna - PÁ 1 ----------------------------
-# PDF - Tabelas + Fotos
-
-def gerar_tabela_defeitos(pdf, titulo, tabela):
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, titulo, ln=True)
-    pdf.set_font("Arial", "B", 10)
-    pdf.set_fill_color(220, 230, 241)
-    pdf.cell(50, 10, "Localização", border=1, fill=True, align="C")
-    pdf.cell(70, 10, "Descrição dos danos/ evidências", border=1, fill=True, align="C")
-    pdf.cell(30, 10, "Área", border=1, fill=True, align="C")
-    pdf.cell(40, 10, "Código", border=1, fill=True, align="C")
-    pdf.ln()
-    pdf.set_font("Arial", "", 10)
-    for linha in tabela:
-        pdf.cell(50, 10, linha["Localizacao"], border=1)
-        pdf.cell(70, 10, linha["Descricao"], border=1)
-        pdf.cell(30, 10, linha["Area"], border=1)
-        pdf.cell(40, 10, linha["Código"], border=1)
-        pdf.ln()
-
-def inserir_topicos_fotos(pdf, imagens_obs, pa_num):
-    for titulo, (fotos, obs) in imagens_obs.items():
-        if fotos or obs:
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(0, 10, f"- {titulo}", ln=True)
-            pdf.ln(3)
-
-            largura_img = 90
-            altura_img = 60
-            espacamento = 10
-            x_inicial = 10  # Começar um pouco da margem
-            y_inicial = pdf.get_y()
-
-
-            for i, foto in enumerate(fotos[:2]):
-                if foto:
-                    extensao = foto.type.split("/")[-1]
-                    nome_unico = f"foto_pa{pa_num}_{uuid.uuid4().hex[:8]}.{extensao}"
-                    with open(nome_unico, "wb") as f:
-                        f.write(foto.read())
-    
-
-                    # Posiciona corretamente a imagem lado a lado
-                    x = x_inicial + i * (largura_img + espacamento)
-                    pdf.set_xy(x, y_inicial)
-                    pdf.rect(x, y_inicial, largura_img, altura_img)
-                    pdf.image(nome_unico, x + 2, y_inicial + 2, w=largura_img - 4, h=altura_img - 4)
-                    os.remove(nome_unico)
+            drone = escolher_fotos_drone(
+                f"Fotos do drone para '{topico}' (PÁ {pa_num})", limpar_key(f"drone_interna_pa{pa_num}_{topico}"), pa_num, max_fotos(topico)
+            )
 
+            key_obs = limpar_key(f"obs_interna_pa{pa_num}_{topico}")
+            obs = st.text_area(
+                f"Observações sobre '{topico}' (PÁ {pa_num})",
+                key=key_obs
+            )
 
-            pdf.set_y(y_inicial + altura_img + 5)  # Move para baixo depois das imagens
+            imagens_obs[topico] = (ingerir_fotos(fotos) + drone, obs)
 
-            pdf.set_font("Arial", "I", 11)
-            pdf.multi_cell(0, 8, f"Observações: {obs or '-'}")
-            pdf.ln(30)
+        previa_pa(pa_num, "interna", imagens_obs)
+    return imagens_obs
 
 
 
@@ -977,84 +507,126 @@ imagens_obs_interna_pa2 = bloco_inspecao_interna(2)
 imagens_obs_interna_pa3 = bloco_inspecao_interna(3)
 
 # -------------------------- Geração do PDF -----------------------------
-if st.button("📄 Gerar Relatório em PDF"):
-    pdf = PDF()
-    pdf.alias_nb_pages()
-    pdf.add_page()
-
-    # 👇 Depois começa a montar o PDF
-    pdf.primeira_pagina(
-        ambito_aplicacao,
-        codigo_relatorio,
-        revisado_por_1,
-        revisado_por_2,
-        data_revisao
-    )
+# O PDF é montado em um processo de trabalho (fila_relatorios); a página só acompanha o andamento
 
-    pdf.pagina_sumario()
+def fotos_em_bytes(imagens_obs):
+    # Troca as referências pelos bytes já guardados, para o pedido poder ir para outro processo
+    return {topico: ([uploads.obter(ref) for ref in refs], obs) for topico, (refs, obs) in imagens_obs.items()}
 
-    dados_gerais = {
-        "Fabricante Modelo": fabricante_modelo,
-        "Ano de Fabricação": ano_fabricacao,
-        "Altura do torre": altura_torre
-    }
 
-    dados_pas = {
-        "Fabricante": fabricante_pas,
-        "Tipo de Pá de Rotor": tipo_pa,
-        "Número de Série das Pás": num_serie_pas,
-        "Número de Série do Set": num_serie_set,
-        "Elementos de Fluxo de Ar": elementos_fluxo,
-        "Dispositivos de iluminação": dispositivos_luz
+perfil_pdf = st.radio(
+    "Qualidade do PDF:",
+    ["final", "rascunho"],
+    format_func={"final": "Final (cópia para o cliente)", "rascunho": "Rascunho (conferência rápida)"}.get,
+    horizontal=True,
+)
+
+if st.button("📄 Gerar Relatório em PDF"):
+    dados_relatorio = {
+        "perfil": perfil_pdf,
+        # No banco de defeitos, gerar de novo o mesmo relatório nesta sessão substitui o anterior
+        "id_relatorio": f"{st.session_state['id_sessao']}:{codigo_relatorio}:{ambito_aplicacao}",
+        "ambito_aplicacao": ambito_aplicacao,
+        "codigo_relatorio": codigo_relatorio,
+        "revisado_por_1": revisado_por_1,
+        "revisado_por_2": revisado_por_2,
+        "data_revisao": data_revisao,
+        "dados_gerais": {
+            "Fabricante Modelo": fabricante_modelo,
+            "Ano de Fabricação": ano_fabricacao,
+            "Altura do torre": altura_torre
+        },
+        "dados_pas": {
+            "Fabricante": fabricante_pas,
+            "Tipo de Pá de Rotor": tipo_pa,
+            "Número de Série das Pás": num_serie_pas,
+            "Número de Série do Set": num_serie_set,
+            "Elementos de Fluxo de Ar": elementos_fluxo,
+            "Dispositivos de iluminação": dispositivos_luz
+        },
+        "imagem_maquina": uploads.obter(imagem_maquina_ref) if imagem_maquina_ref else None,
+        "imagens_pas": {pa: [uploads.obter(ref) for ref in refs] for pa, refs in imagens_pás.items()},
+        "tabelas_externas": [tabela_externa_pa1, tabela_externa_pa2, tabela_externa_pa3],
+        "topicos_externos": [fotos_em_bytes(imagens_obs_externa_pa1), fotos_em_bytes(imagens_obs_externa_pa2), fotos_em_bytes(imagens_obs_externa_pa3)],
+        "tabelas_internas": [tabela_defeitos_pa1, tabela_defeitos_pa2, tabela_defeitos_pa3],
+        "topicos_internos": [fotos_em_bytes(imagens_obs_interna_pa1), fotos_em_bytes(imagens_obs_interna_pa2), fotos_em_bytes(imagens_obs_interna_pa3)],
     }
 
-    pdf.pagina_dados(dados_gerais, dados_pas)
-    pdf.pagina_nomenclaturas()
-    pdf.pagina_itens_referencia_identificacao(imagem_maquina_path)
-    pdf.pagina_identificacao_pas(imagens_pás)
-
-    # ----------------- Inspeção Externa -----------------
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "10. Inspeção Externa", ln=True)
-    pdf.ln(2)
-    gerar_tabela_defeitos(pdf, "10.1 Classificação de defeitos evidenciados na área externa da pá 1", tabela_externa_pa1)
-    inserir_topicos_fotos(pdf, imagens_obs_externa_pa1, 1)  
-
-    pdf.add_page()
-    gerar_tabela_defeitos(pdf, "10.2 Classificação de defeitos evidenciados na área externa da pá 2", tabela_externa_pa2)
-    inserir_topicos_fotos(pdf, imagens_obs_externa_pa2, 2)
-
-    pdf.add_page()
-    gerar_tabela_defeitos(pdf, "10.3 Classificação de defeitos evidenciados na área externa da pá 3", tabela_externa_pa3)
-    inserir_topicos_fotos(pdf, imagens_obs_externa_pa3, 3)
-
-    # ----------------- Inspeção Interna -----------------
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 10, "11. Inspeção Interna", ln=True)
-    pdf.ln(2)
-    gerar_tabela_defeitos(pdf, "11.2 Classificação de defeitos evidenciados na área interna da pá 1", tabela_defeitos_pa1)
-    inserir_topicos_fotos(pdf, imagens_obs_interna_pa1, 1)
-
-    pdf.add_page()
-    gerar_tabela_defeitos(pdf, "11.2 Classificação de defeitos evidenciados na área interna da pá 2", tabela_defeitos_pa2)
-    inserir_topicos_fotos(pdf, imagens_obs_interna_pa2, 2)
-
-    pdf.add_page()
-    gerar_tabela_defeitos(pdf, "11.2 Classificação de defeitos evidenciados na área interna da pá 3", tabela_defeitos_pa3)
-    inserir_topicos_fotos(pdf, imagens_obs_interna_pa3, 3)
-
-    # ----------------- Finalização -----------------
-    caminho_pdf = "relatorio_inspecao.pdf"
-    pdf.output(caminho_pdf)
-
-    st.success("✅ Relatório gerado com sucesso!")
-
-    with open(caminho_pdf, "rb") as f:
-        st.download_button(
-            label="📥 Baixar PDF",
-            data=f,
-            file_name="relatorio_inspecao.pdf",
-            mime="application/pdf"
+    # Fotos grandes vão para a fila como caminhos na pasta da sessão: ficam no disco até o PDF sair
+    referencias_usadas = ([imagem_maquina_ref] if imagem_maquina_ref else []) + [
+        ref for refs in imagens_pás.values() for ref in refs
+    ] + [
+        ref
+        for grupo in (imagens_obs_externa_pa1, imagens_obs_externa_pa2, imagens_obs_externa_pa3,
+                      imagens_obs_interna_pa1, imagens_obs_interna_pa2, imagens_obs_interna_pa3)
+        for refs, _ in grupo.values() for ref in refs
+    ]
+    try:
+        fila = obter_fila_relatorios()
+        st.session_state["trabalho_pdf"] = fila.enviar(
+            st.session_state["id_sessao"], dados_relatorio, dono=uploads  # O PDF guardado sai junto com a sessão
         )
+        uploads.reter_ate(fila.futuro(st.session_state["trabalho_pdf"]), referencias_usadas)
+        st.session_state["nome_pdf"] = f"relatorio_{limpar_key(codigo_relatorio) or 'inspecao'}.pdf"
+    except FilaCheia as e:
+        st.warning(f"⏳ {e}")
+
+
+def mostrar_metricas(metricas):
+    # Painel recolhível com o tempo e as imagens de cada seção do PDF
+    with st.expander(f"⏱️ Tempo de geração: {metricas['segundos']:.2f} s"):
+        if metricas.get("em_cache"):
+            st.caption("♻️ Mesmos dados de um relatório já gerado: o PDF foi reaproveitado, sem gerar de novo.")
+        st.caption(
+            " · ".join(f"{etapa}: {segundos * 1000:.0f} ms" for etapa, segundos in metricas["etapas"].items())
+            + f" · {metricas['paginas']} páginas · PDF de {metricas['bytes_pdf'] / 1024:.0f} KB"
+        )
+        st.dataframe(
+            [
+                {
+                    "Seção": " " * m["nivel"] + m["secao"],  # Recuo das seções medidas dentro de outras
+                    "Tempo (ms)": round(m["segundos"] * 1000, 1),
+                    "Imagens": m["imagens"],
+                    "Imagens (KB)": round(m["bytes_imagens"] / 1024, 1),
+                }
+                for m in metricas["secoes"]
+            ],
+            hide_index=True,
+        )
+
+
+trabalho_pdf = st.session_state.get("trabalho_pdf")
+if trabalho_pdf:
+    fila = obter_fila_relatorios()
+    em_andamento = fila.estado(trabalho_pdf) in ("na fila", "gerando")
+
+    # Enquanto o relatório está sendo gerado, só este bloco é executado de novo a cada segundo
+    @st.fragment(run_every=1 if em_andamento else None)
+    def acompanhar_relatorio():
+        estado = fila.estado(trabalho_pdf)
+        if estado in ("na fila", "gerando"):
+            st.info("⏳ Relatório na fila..." if estado == "na fila" else "⚙️ Gerando relatório...")
+        elif em_andamento:
+            st.rerun()  # Terminou: atualiza a página inteira e para de consultar
+        elif estado == "pronto":
+            st.success("✅ Relatório gerado com sucesso!")
+            st.download_button(
+                label="📥 Baixar PDF",
+                data=fila.resultado(trabalho_pdf),
+                file_name=st.session_state.get("nome_pdf", "relatorio_inspecao.pdf"),
+                mime="application/pdf"
+            )
+            mostrar_metricas(fila.metricas(trabalho_pdf))
+        elif estado == "erro":
+            try:
+                fila.resultado(trabalho_pdf)
+            except Exception as e:
+                st.error(f"Erro ao gerar o relatório: {e}")
+
+    acompanhar_relatorio()
+
+
+uploads.descartar_removidos()  # Só numa execução completa, quando todos os campos foram lidos
+st.caption(f"📎 Fotos desta sessão: {uploads.total_bytes / (1024 * 1024):.0f} de {uploads.cota_bytes / (1024 * 1024):.0f} MB")
+
+st.caption(f"⏱️ Página executada em {(time.perf_counter() - inicio_execucao) * 1000:.0f} ms")
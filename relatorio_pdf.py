@@ -0,0 +1,894 @@
+# Montagem do PDF do relatório de inspeção, separada da interface Streamlit
+# para poder rodar em processos de trabalho, em lote e a partir de outros scripts
+from fpdf import FPDF  # FPDF para geração do PDF
+from fpdf.enums import PDFResourceType
+from fpdf.image_datastructures import ImageCache
+from fpdf.image_parsing import preload_image
+from contextlib import contextmanager
+import copy
+import types
+from datetime import datetime, timezone
+import functools
+import os  # Biblioteca para manipulação de arquivos
+import time
+from io import BytesIO # Biblioteca para manipulação de fluxos de bytes
+
+from escritor_pdf import EscritorPDF  # Junta vários PDFs em um arquivo, gravando aos poucos
+from fontes_pdf import ProdutorPDF, registrar_fonte  # Fontes TrueType analisadas uma vez por processo
+from imagens import DPI_PADRAO, QUALIDADE_PADRAO, preparar_imagens  # Redução e recompressão das fotos antes do PDF
+from tabela_pdf import desenhar_tabela, quebrar_texto  # Tabelas com quebra de texto e cabeçalho repetido entre páginas
+
+
+# ------------------------ Recursos reaproveitados entre relatórios (um por processo) ------------------------
+# Imagens fixas e fontes, sempre registradas nesta ordem em cada relatório: assim os
+# números dos recursos (/I1, /F1...) são iguais em todos e os trechos gravados valem para todos
+IMAGENS_FIXAS = ["assets/logo_iqony.png", "assets/wind_turbine_draw.png", "assets/nomenclaturas.png"]
+FONTES_FIXAS = [("Arial", "B"), ("Arial", ""), ("Arial", "I")]
+
+# Perfis de qualidade do relatório, escolhidos pelo campo "perfil" dos dados:
+# - "final": cópia para o cliente, fotos na resolução padrão, logotipos e páginas comprimidas.
+#   200 DPI no quadro (cerca de 700 x 470 px numa foto de 90 x 60 mm) já é resolução de impressão;
+#   a resolução original da câmera (12 a 48 MP) deixaria cada foto dezenas de vezes maior sem
+#   nenhum detalhe visível no papel ou na tela em 100%. Com JPEG 80 os artefatos de compressão
+#   não aparecem nesse tamanho; de 80 para 95 o arquivo cresce muito sem ganho visível.
+#   O conteúdo das páginas vai comprimido (zlib); as fotos já vão em JPEG
+# - "rascunho": conferência rápida em campo, fotos em baixa resolução, sem logotipo e desenho
+#   do rodapé e sem compressão das páginas (as fotos continuam em JPEG)
+PERFIS = {
+    "final": {"dpi": DPI_PADRAO, "qualidade": QUALIDADE_PADRAO, "artes": True, "compressao": True},
+    "rascunho": {"dpi": 72, "qualidade": 60, "artes": False, "compressao": False},
+}
+PERFIL_PADRAO = "final"
+
+_imagens_fixas = None  # ImageCache com as imagens de assets/ já decodificadas
+_trechos_fixos = {}    # (nome, posição, estado gráfico) -> (conteúdo, estado gráfico final, x, y)
+LIMITE_TRECHOS = 256   # Trechos guardados por processo antes de recomeçar (cada posição nova é um trecho)
+
+
+def _carregar_imagens_fixas():
+    # Decodifica as imagens de assets/ (PNG com canal alfa é lento no fpdf) uma única vez por processo
+    global _imagens_fixas
+    if _imagens_fixas is None:
+        cache = ImageCache()
+        for caminho in IMAGENS_FIXAS:
+            if os.path.exists(caminho):
+                preload_image(cache, caminho)
+        _imagens_fixas = cache
+    return _imagens_fixas
+
+
+# ------------------------ Medição de tempo por seção ------------------------
+def medido(metodo):
+    """Registra em `pdf.medicoes` o tempo, as imagens e os bytes de imagem de cada chamada.
+
+    Serve para métodos do PDF e para funções que recebem o pdf como primeiro argumento.
+    """
+    @functools.wraps(metodo)
+    def envolvido(pdf, *args, **kwargs):
+        with pdf.medir(metodo.__name__):
+            return metodo(pdf, *args, **kwargs)
+    return envolvido
+
+
+# ------------------------Classe PDF personalizada---------------------------
+class PDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Reaproveita as imagens de assets/ já decodificadas neste processo
+        fixas = _carregar_imagens_fixas()
+        for nome, info in fixas.images.items():
+            self.image_cache.images[nome] = copy.copy(info)
+            self.image_cache.images[nome]["usages"] = 0
+        self.image_cache.icc_profiles.update(fixas.icc_profiles)
+
+        for familia, estilo in FONTES_FIXAS:
+            registrar_fonte(self, familia, estilo)  # TrueType no lugar da Arial padrão, se houver
+            self.set_font(familia, estilo)
+
+        # Numeração para relatórios que são parte de um documento maior (ver montar_relatorio_consolidado)
+        self.deslocamento_paginas = 0
+        self.total_paginas = None
+        self.somente_layout = False  # Só calcula a paginação: as imagens não são decodificadas nem embutidas
+        self.definir_perfil(PERFIL_PADRAO)
+
+        # Medição por seção (ver `medir`)
+        self.medicoes = []
+        self.imagens_inseridas = 0  # Imagens desenhadas nas páginas
+        self.bytes_imagens = 0      # Bytes das imagens embutidas no PDF, fixas ou não (cada imagem distinta conta uma vez)
+        self._nivel_medicao = 0
+
+    def output(self, *args, **kwargs):
+        # Embute as fontes TrueType uma vez cada, reaproveitando os subconjuntos já gerados no processo
+        kwargs.setdefault("output_producer_class", ProdutorPDF)
+        return super().output(*args, **kwargs)
+
+    def definir_perfil(self, nome):
+        """Aplica um dos `PERFIS`; vale para as páginas adicionadas depois da chamada."""
+        if nome not in PERFIS:
+            raise ValueError(f"Perfil desconhecido: {nome} (use {', '.join(PERFIS)})")
+        self.nome_perfil = nome
+        self.perfil = PERFIS[nome]
+        self.set_compression(self.perfil["compressao"])
+
+    @contextmanager
+    def medir(self, secao):
+        """Mede um trecho da montagem; trechos medidos dentro de outros ficam com `nivel` maior."""
+        medicao = {"secao": secao, "nivel": self._nivel_medicao}
+        self.medicoes.append(medicao)  # Entra na lista na ordem de início
+        inicio, imagens, bytes_imagens = time.perf_counter(), self.imagens_inseridas, self.bytes_imagens
+        self._nivel_medicao += 1
+        try:
+            yield
+        finally:
+            self._nivel_medicao -= 1
+            medicao["segundos"] = time.perf_counter() - inicio
+            medicao["imagens"] = self.imagens_inseridas - imagens
+            medicao["bytes_imagens"] = self.bytes_imagens - bytes_imagens
+
+    def image(self, name, *args, **kwargs):
+        if self.somente_layout:
+            return None
+        info = super().image(name, *args, **kwargs)
+        self._contar_imagem(info)
+        return info
+
+    def _contar_imagem(self, info):
+        # Conta no primeiro uso neste documento: as imagens de assets/ já chegam no cache
+        # (ver __init__) e só são embutidas se forem usadas
+        self.imagens_inseridas += 1
+        if info["usages"] == 1:
+            self.bytes_imagens += len(info.get("data") or b"") + len(info.get("smask") or b"")
+
+    def _estado_grafico(self):
+        # Estado gráfico atual comparável entre relatórios (a fonte vira o seu nome, não o objeto)
+        estado = self._get_current_graphics_state().as_kwargs()
+        fonte = estado.pop("current_font")
+        return repr((fonte.fontkey if fonte else None, sorted(estado.items())))
+
+    def _escrita_desativada(self):
+        # Durante medições (`multi_cell(dry_run=True)`...) o fpdf troca `_out` por uma função que não
+        # grava nada e desfaz as páginas criadas ao terminar: nada pode ser guardado nem copiado
+        return not isinstance(self._out, types.MethodType)
+
+    def _trecho_fixo(self, nome, desenhar):
+        """Desenha um trecho igual em todos os relatórios, reaproveitando o conteúdo já gerado.
+
+        Na primeira vez (por processo) `desenhar()` é executado e os comandos que ele
+        escreveu na página são guardados; nas seguintes, com a mesma posição e o mesmo
+        estado gráfico, os comandos são copiados direto para a página.
+        """
+        # Sem as imagens, ou com a escrita desativada, o conteúdo desenhado não pode ser guardado
+        if self.somente_layout or self._escrita_desativada():
+            desenhar()
+            return
+
+        # Posição arredondada a centésimos de mm: a mesma posição calculada por caminhos diferentes
+        # cai no mesmo trecho
+        posicao = tuple(round(v, 2) for v in (self.x, self.y, self.w, self.h))
+        chave = (nome, self.perfil["artes"], posicao, self._estado_grafico())
+        gravado = _trechos_fixos.get(chave)
+        pagina = self.page
+
+        if gravado is None:
+            inicio = len(self.pages[pagina].contents)
+            desenhar()
+            if self.page == pagina:  # Trechos que quebraram página não são guardados
+                conteudo = bytes(self.pages[pagina].contents[inicio:])
+                if len(_trechos_fixos) >= LIMITE_TRECHOS:
+                    _trechos_fixos.clear()
+                _trechos_fixos[chave] = (conteudo, self._get_current_graphics_state(), self.x, self.y)
+            return
+
+        conteudo, estado, x, y = gravado
+        self.pages[pagina].contents += conteudo
+
+        # Registra na página as fontes e imagens usadas pelo trecho copiado
+        imagens_por_indice = {info["i"]: info for info in self.image_cache.images.values()}
+        for tipo, recurso in self._resource_catalog.scan_stream(conteudo.decode("latin-1")):
+            if tipo in (PDFResourceType.FONT, PDFResourceType.X_OBJECT):
+                self._resource_catalog.add(tipo, int(recurso), pagina)
+            if tipo == PDFResourceType.X_OBJECT:
+                info = imagens_por_indice[int(recurso)]
+                info["usages"] += 1
+                self._contar_imagem(info)
+                if "smask" in info:  # Mesma exigência do FPDF.image para imagens com transparência
+                    self._set_min_pdf_version("1.4")
+
+        # Deixa o estado gráfico como o trecho original deixaria
+        estado = estado.copy()
+        if estado.current_font is not None:
+            estado.current_font = self.fonts[estado.current_font.fontkey]
+        self._pop_local_stack()
+        self._push_local_stack(estado)
+        self.set_xy(x, y)
+
+    @staticmethod
+    def imagem_disponivel(img):
+        # Aceita um caminho no disco ou uma imagem já em memória (bytes, BytesIO ou PIL)
+        if isinstance(img, str):
+            return os.path.exists(img)
+        return bool(img)
+
+    def header(self):
+        self._trecho_fixo("cabecalho", self._desenhar_cabecalho)
+
+    def _desenhar_cabecalho(self):
+        # Verifica se a logo foi carregada e insere a imagem no canto superior esquerdo (x=10, y=10, largura=30mm)
+        if self.perfil["artes"] and "assets/logo_iqony.png" in self.image_cache.images:
+            self.image("assets/logo_iqony.png", x=15, y=15, w=25)
+
+
+
+        # Define a posição e fonte do título central do relatório
+        self.set_xy(10, 10)                       # Define a posição (x=40, y=10) para o título
+        self.set_font("Arial", "B", 16)           # Define a fonte Arial, negrito, tamanho 12
+        self.cell(190, 40, "Relatório de Inspeção de Pás", border=1, ln=1, align="C")  # Linha 1 do título centralizada
+        self.ln(5)                            # Adiciona uma quebra de linha após o título
+
+        self.ln(5)
+# ------------------------------------ Rodapé do PDF Com imagem -------------------------------------
+    def footer(self):
+        self._trecho_fixo("rodape", self._desenhar_rodape)
+
+        # Número da página centralizado
+        # Número da página no formato "Página X de Y"
+        self.set_y(-10)  # Ajusta posição
+        total = self.total_paginas or "{nb}"  # Sem total definido, o fpdf preenche no output()
+        self.cell(0, 10, f"Página {self.page_no() + self.deslocamento_paginas} de {total}", align="R") # adiciona um rodapé ao documento, mostrando o número da página atual e o total de páginas, como por exemplo: "Página 3 de 10"
+
+    def _desenhar_rodape(self):
+        # Adiciona imagem no canto inferior esquerdo
+        if self.perfil["artes"] and "assets/wind_turbine_draw.png" in self.image_cache.images:
+            self.image("assets/wind_turbine_draw.png", x=10, y=270, w=40)
+
+  # Ajuste 'x', 'y' e 'w' conforme o necessário
+
+        # Texto do rodapé
+        self.set_y(-10)
+        self.set_font("Arial", "I", 7)
+        self.multi_cell(
+            0, 4,      # Texto do rodapé, 0 largura, 6 altura
+            "Este documento é de propriedade da Iqony Solutions do Brasil LTDA. Nenhuma parte deste documento pode\n"
+            "ser distribuída sem sua permissão prévia por escrito.",
+            border=0, align="C"
+            
+        )
+
+# -----------------------------------Área Departamento Responsável --------------------------
+
+    @medido
+    def primeira_pagina(self, ambito_aplicacao, codigo_relatorio, revisado_por_1, revisado_por_2, data_revisao):
+        self.set_font("Arial", "B", 12)
+        self.multi_cell(0, 50, f"Departamento Responsável: O&M.\nÂmbito da aplicação: {ambito_aplicacao}", border=1)
+        self.ln(10)
+        self.cell(95, 10, f"Número: {codigo_relatorio}", 1)
+        self.set_font("Arial", "B", 10)
+        self.cell(95, 10, "Revisão: 02", 1, ln=True)
+
+        self.set_font("Arial", "B", 10)
+        self.cell(45, 10, "", 1)
+        self.cell(80, 10, "(Assinatura):", 1)
+        self.cell(65, 10, "Data:", 1, ln=True)
+
+        self.set_font("Arial", "B", 10)
+        linhas = [
+            ["Elaborado por:", "Ruan Lopes da Silva", "12/04/2025"],
+            ["Revisado por:", "Thiago Abner ", "06/05/2025"],
+            ["Revisado por:", revisado_por_2, data_revisao],
+            ["Aprovado por:", "Vinícius Pazzini", "10/05/2025"]
+        ]
+        for linha in linhas:
+            self.cell(45, 10, linha[0], 1)
+            self.cell(80, 10, linha[1], 1)
+            self.cell(65, 10, linha[2], 1, ln=True) 
+    
+# --------------------------------- Sumário ---------------------------------------------------
+    @medido
+    def pagina_sumario(self): #
+        self.add_page()
+        self._trecho_fixo("sumario", self._desenhar_sumario)
+
+    def _desenhar_sumario(self):
+        self.set_font("Arial", "B", 14)
+        self.cell(0, 10, "Sumário", ln=True, align="C")
+        self.ln(5)
+
+        self.set_font("Arial", "B", 12)
+        topicos = [
+            "1. Introdução",
+            "2. Objetivo",
+            "3. Dados Gerais do Aerogerador",
+            "4. Dados Gerais das Pás",
+            "5. Nomenclaturas",
+            "6. Itens das pás a serem inspecionados",
+            "7. Referência da Avaliação de defeitos",
+            "8. Identificação da Máquina",
+            "9. Especificação e identificação das pás",
+            "10. Inspeção Externa",
+            "  10.1. Classificação de defeitos evidenciados na área externa da pá 1",
+            "  10.2. Classificação de defeitos evidenciados na área externa da pá 2",
+            "  10.3. Classificação de defeitos evidenciados na área externa da pá 3",
+            "11. Inspeção interna",
+            "  11.1. Classificação de defeitos evidenciados na área interna da pá 1",
+            "  11.2. Classificação de defeitos evidenciados na área interna da pá 2",
+            "  11.3. Classificação de defeitos evidenciados na área interna da pá 3",
+        ]
+        for item in topicos:
+            self.cell(0, 8, item, ln=True)
+
+
+# ------------------------ 3. Dados Gerais do Aerogerador e 4. Dados Gerais das Pás  - Objetivo e introdução---------------------
+    @medido
+    def pagina_dados(self, dados_gerais, dados_pas):
+        self.add_page()
+        self._trecho_fixo("introducao_objetivo", self._desenhar_introducao_objetivo)
+
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "3. Dados Gerais do Aerogerador", ln=True)
+        self.set_font("Arial", "", 11)
+        for rotulo, valor in dados_gerais.items(): # 
+            self.cell(60, 10, rotulo, border=1)
+            self.cell(130, 10, valor, border=1, ln=True)
+
+        self.ln(5)
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "4. Dados Gerais das Pás", ln=True)
+        self.set_font("Arial", "", 11)
+        for rotulo, valor in dados_pas.items():
+            self.cell(60, 10, rotulo, border=1)
+            self.cell(130, 10, valor, border=1, ln=True)
+
+        self.ln(5)
+
+    def _desenhar_introducao_objetivo(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "1. Introdução", ln=True)
+
+        
+        self.set_font("Arial", "", 12)
+        self.multi_cell(0, 8,
+            "A atividade contratada consiste na inspeção das pás, realizada nas cascas externas, bordas de ataque e de fuga, "
+            "e em toda a extensão das pás. A análise e classificação dos defeitos, bem como a avaliação dos reparos, foram "
+            "realizadas pela equipe de serviços de O&M da IQONY.")
+        self.ln(5)
+
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "2. Objetivo", ln=True)
+        self.set_font("Arial", "", 12)
+        self.multi_cell(0, 8,
+            "Este relatório tem como objetivo apresentar os dados de uma inspeção de pás, realizada no aerogerador WEG modelo "
+            "AGW 110 2.1MW, localizado nos parques eólicos Cutia e Bento Miguel. As evidências têm por finalidade documentar o "
+            "estado operacional das pás.")
+        self.ln(5)
+
+# ------------------------ 5. Nomenclaturas -------------------------------------
+    @medido
+    def pagina_nomenclaturas(self): 
+        self.add_page()
+        self._trecho_fixo("nomenclaturas", self._desenhar_nomenclaturas)
+
+    def _desenhar_nomenclaturas(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "5. Nomenclaturas", ln=True)
+        if "assets/nomenclaturas.png" in self.image_cache.images:
+            self.image("assets/nomenclaturas.png", x=10, w=190)
+        else:
+            self.set_font("Arial", "I", 11)
+            self.multi_cell(0, 10, "Imagem de nomenclaturas não encontrada.")
+
+
+  # -------------- 6. Itens das Pás a Serem Inspecionados -----------------------------
+
+    @medido
+    def pagina_itens_referencia_identificacao(self, imagem_maquina=None):
+        self.add_page()
+        self._trecho_fixo("itens_referencia", self._desenhar_itens_referencia)
+
+ #-------------- 8. Identificação da Máquina ----------------------------------------------------------
+
+        self.ln(5)
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "8. Identificação da Máquina", ln=True)
+
+        if imagem_maquina and self.imagem_disponivel(imagem_maquina):
+            w = 190                 # Largura da imagem
+            h = w * 0.2             # Altura proporcional
+            x = (self.w - w) / 2    # Centraliza horizontalmente
+            y = self.get_y()        # Usa posição vertical atual após o título
+
+            self.rect(x, y, w, h)   # Borda ao redor da imagem
+            self.image(imagem_maquina, x=x + 2, y=y + 2, w=w - 4, h=h - 4)  # Imagem com margens internas
+            self.ln(h + 10)         # Espaço abaixo da imagem
+        else:
+            self.set_font("Arial", "I", 11)
+            self.multi_cell(0, 10, "Imagem de identificação da máquina não enviada.")
+
+    def _desenhar_itens_referencia(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "6. Itens das Pás a Serem Inspecionados", ln=True)
+
+        itens = [
+            ("Extradorso", "E.D."),
+            ("Intradorso", "I.D"),
+            ("Bordo de Ataque", "B.A."),
+            ("Bordo de Fuga", "B.F."),
+            ("Tip", "T.P."),
+            ("Raiz", "R.A."),
+            ("Almas (B.A e B.F)", "A.B.A, A.B.F"),
+            ("Áreas de Colagens (B.A e B.F)", "B.A.C, B.F.C"),
+            ("SPDA", "SPDA")
+        ]
+
+        for nome, sigla in itens:   # Cria uma célula para cada item
+            self.set_fill_color(220, 230, 241) # Cor de fundo azul claro
+            self.set_font("Arial", "B", 12) # Define a fonte para o título
+            self.cell(80, 10, nome, border=1, fill=True, align="C") # Cria célula com borda e fundo azul claro
+            self.set_font("Arial", "", 11) # Define a fonte para o conteúdo
+            self.cell(110, 10, sigla, border=1, ln=True) # Cria célula com borda e quebra de linha (ln=True)
+
+   # ----------------- 7. Referência da Avaliação de Defeitos -----------------------------------------
+        self.ln(5)
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "7. Referência da Avaliação de Defeitos", ln=True)
+
+        referencias = [
+            ("1", "Danos leves", "Operação normal"),
+            ("2", "Danos médios", "Reparo planejado"),
+            ("3", "Danos Graves", "Reparo imediato"),
+            ("4", "Danos Críticos", "Parar o aerogerador")
+        ]
+
+        for ref, desc, acao in referencias:
+            self.set_font("Arial", "", 11)
+            self.cell(20, 10, ref, border=1, align="C")
+            self.cell(70, 10, desc, border=1, align="C")
+            self.cell(100, 10, acao, border=1, ln=True, align="C")
+
+
+# ------------------------ 9. Especificação e Identificação das Pás ---------------------
+    @medido
+    def pagina_identificacao_pas(self, imagens_pás):
+        self.add_page()
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 10, "9. Especificação e Identificação das Pás", ln=True)
+        self.ln(1)
+
+        for nome_pa, lista_imgs in imagens_pás.items():
+            self.set_font("Arial", "B", 11)
+            self.cell(0, 10, nome_pa, ln=True)
+            self.ln(2)
+
+            altura_foto = 50
+            largura_foto = 80
+            espacamento_x = 10
+
+            # 🔵 Cálculo para centralizar
+            total_largura = len(lista_imgs) * largura_foto + (len(lista_imgs) - 1) * espacamento_x
+            x_inicial = (self.w - total_largura) / 2  # Centraliza as imagens
+            y_inicial = self.get_y()
+
+            for i, img in enumerate(lista_imgs):
+                if self.imagem_disponivel(img):
+                    x = x_inicial + i * (largura_foto + espacamento_x)
+                    y = y_inicial
+
+                    # 🔵 Desenha o retângulo (quadro)
+                    self.rect(x, y, largura_foto, altura_foto)
+
+                    # 🔵 Insere a imagem dentro do quadro
+                    self.image(img, x=x + 2, y=y + 2, w=largura_foto - 4, h=altura_foto - 4)
+
+            self.ln(altura_foto + 1)  # espaço abaixo das fotos antes da próxima PÁ
+
+
+# PDF - Tabelas + Fotos
+
+COLUNAS_DEFEITOS = [
+    ("Localização", 50, "Localizacao"),
+    ("Descrição dos danos/ evidências", 70, "Descricao"),
+    ("Área", 30, "Area"),
+    ("Código", 40, "Código"),
+]
+
+
+@medido
+def gerar_tabela_defeitos(pdf, titulo, tabela):
+    # Descrições longas quebram em várias linhas; a tabela continua na página seguinte com o cabeçalho repetido
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, titulo, ln=True)
+    linhas = [[str(linha.get(chave, "")) for _, _, chave in COLUNAS_DEFEITOS] for linha in tabela]
+    desenhar_tabela(pdf, [(nome, largura) for nome, largura, _ in COLUNAS_DEFEITOS], linhas, pdf.h - ALTURA_RODAPE)
+
+# ------------------------ Diagramação dos tópicos com fotos ------------------------
+# Fotos em grade de duas por linha, em quadros de 90 x 60 mm
+LARGURA_QUADRO = 90
+ALTURA_QUADRO = 60
+ESPACO_QUADROS = 10
+FOTOS_POR_LINHA = 2
+MAX_FOTOS_PADRAO = 2
+MAX_FOTOS_TOPICO = {"Superfície do B.A": 4, "Superfície da pá lado da pressão": 4}  # Os demais tópicos: MAX_FOTOS_PADRAO
+# Tópicos com fotos de cada inspeção, na ordem do formulário
+TOPICOS_EXTERNA = [
+    "Superfície da pá lado sucção",
+    "Receptores do SPDA lado sucção",
+    "B.A lado da sucção",
+    "Superfície do B.A",
+    "Superfície da pá lado da pressão",
+    "Receptores do SPDA lado da pressão",
+    "Superfície no B.A lado da pressão"
+]
+TOPICOS_INTERNA = [
+    "B.A",
+    "Superfície entre as almas do B.F e Alma do B.A",
+    "Coletores do SPDA",
+    "B.F"
+]
+ALTURA_RODAPE = 29  # O desenho do rodapé começa 27 mm acima da borda inferior da página
+TOPO_PAGINA = 60  # Onde o conteúdo começa numa página nova, logo abaixo do cabeçalho
+ESPACO_ENTRE_TOPICOS = 6
+
+
+def max_fotos(topico):
+    """Quantas fotos do tópico entram no relatório."""
+    return MAX_FOTOS_TOPICO.get(topico, MAX_FOTOS_PADRAO)
+
+
+def _blocos_topicos(pdf, imagens_obs):
+    """Divide os tópicos em blocos que não podem ser separados entre páginas.
+
+    Cada bloco é uma lista de partes ("titulo", "linha" de fotos ou "obs") e a sua
+    altura em mm. O título fica com a primeira linha de fotos e as observações com
+    a última; as linhas do meio podem ir para a página seguinte sozinhas.
+    `minima` é o que precisa caber na página atual quando o bloco todo não cabe nem numa
+    página vazia (observação muito longa): tudo menos as observações além da primeira linha.
+    """
+    blocos = []
+    pdf.set_font("Arial", "I", 11)  # Fonte das observações, para medir as linhas
+    for titulo, (fotos, obs) in imagens_obs.items():
+        if not (fotos or obs):
+            continue
+        fotos = [foto for foto in fotos[:max_fotos(titulo)] if foto]
+        texto = f"Observações: {obs or '-'}"
+        # Medido sem o `multi_cell(dry_run=True)`: com a escrita desativada, uma observação longa
+        # chegaria a quebrar página (e desenhar cabeçalho e rodapé) só para ser medida
+        altura_obs = 8 * len(quebrar_texto(pdf, texto, pdf.epw - 2 * pdf.c_margin)) + ESPACO_ENTRE_TOPICOS
+
+        linhas = [fotos[i:i + FOTOS_POR_LINHA] for i in range(0, len(fotos), FOTOS_POR_LINHA)] or [[]]
+        for i, linha in enumerate(linhas):
+            partes, altura, minima = [], 0, 0
+            if i == 0:
+                partes.append(("titulo", titulo))
+                altura += 13
+            if linha:
+                partes.append(("linha", linha))
+                altura += ALTURA_QUADRO + 5
+            minima = altura
+            if i == len(linhas) - 1:
+                partes.append(("obs", texto))
+                altura += altura_obs
+                minima += 8
+            blocos.append((partes, altura, minima))
+    return blocos
+
+
+def _desenhar_parte(pdf, tipo, conteudo):
+    if tipo == "titulo":
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 10, f"- {conteudo}", ln=True)
+        pdf.ln(3)
+    elif tipo == "linha":
+        # As fotos já chegam reduzidas, em JPEG e em memória (ver preparação antes da montagem do PDF)
+        y = pdf.get_y()
+        for i, foto in enumerate(conteudo):
+            x = pdf.l_margin + i * (LARGURA_QUADRO + ESPACO_QUADROS)
+            pdf.rect(x, y, LARGURA_QUADRO, ALTURA_QUADRO)
+            pdf.image(BytesIO(foto), x + 2, y + 2, w=LARGURA_QUADRO - 4, h=ALTURA_QUADRO - 4)
+        pdf.set_y(y + ALTURA_QUADRO + 5)
+    else:
+        pdf.set_font("Arial", "I", 11)
+        # Observação que passa de página quebra acima do desenho do rodapé, como os blocos
+        margem = pdf.b_margin
+        pdf.set_auto_page_break(True, ALTURA_RODAPE)
+        pdf.multi_cell(0, 8, conteudo)
+        pdf.set_auto_page_break(True, margem)
+        pdf.ln(ESPACO_ENTRE_TOPICOS)
+
+
+@medido
+def inserir_topicos_fotos(pdf, imagens_obs):
+    """Desenha os tópicos de uma pá (fotos e observações) ocupando o menor número de páginas.
+
+    A ordem dos tópicos é mantida (faz parte da leitura do relatório); com a ordem
+    fixa, encher cada página até o fim antes de quebrar já dá o menor número de
+    páginas. Cada bloco de `_blocos_topicos` só vai para a página seguinte se não
+    couber acima do desenho do rodapé; um bloco maior que uma página inteira começa
+    onde estiver e continua nas seguintes. Já no topo da página não se quebra de novo,
+    o que deixaria uma página em branco.
+    """
+    limite = pdf.h - ALTURA_RODAPE
+    for partes, altura, minima in _blocos_topicos(pdf, imagens_obs):
+        if altura > limite - TOPO_PAGINA:
+            altura = minima
+        if pdf.get_y() > TOPO_PAGINA and pdf.get_y() + altura > limite:
+            pdf.add_page()
+        for tipo, conteudo in partes:
+            _desenhar_parte(pdf, tipo, conteudo)
+
+
+# -------------------------- Montagem do relatório completo -----------------------------
+
+def carregar_recursos():
+    """Deixa o processo pronto para gerar relatórios.
+
+    Importa e exercita o fpdf e o Pillow, decodifica as imagens fixas de `assets/`
+    e grava as páginas fixas montando um relatório de teste, para o primeiro
+    relatório do processo não pagar esse custo. Usado como inicializador dos processos de trabalho.
+    """
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.pagina_sumario()
+    pdf.pagina_dados({}, {})
+    pdf.pagina_nomenclaturas()
+    pdf.pagina_itens_referencia_identificacao()
+    pdf.output()
+
+
+DATA_DOCUMENTO_PADRAO = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def data_documento(dados):
+    # Data de criação gravada no PDF: a da revisão, e não a hora da geração, para os
+    # mesmos dados sempre gerarem exatamente os mesmos bytes
+    try:
+        return datetime.strptime(str(dados.get("data_revisao", "")).strip(), "%d/%m/%Y").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return DATA_DOCUMENTO_PADRAO
+
+
+def titulo_classificacao(inspecao, numero_pa):
+    # Título da tabela de defeitos de uma pá ("externa" ou "interna"), igual no relatório e na pré-visualização
+    if inspecao == "externa":
+        return f"10.{numero_pa} Classificação de defeitos evidenciados na área externa da pá {numero_pa}"
+    return f"11.2 Classificação de defeitos evidenciados na área interna da pá {numero_pa}"
+
+
+# -------------------------- Resumo de defeitos da frota -----------------------------
+COLUNAS_FROTA = [
+    ("Âmbito de aplicação", 42, "ambito_aplicacao"),
+    ("Relatório", 28, "codigo_relatorio"),
+    ("PÁ", 12, "pa"),
+    ("Inspeção", 18, "inspecao"),
+    ("Localização", 22, "localizacao"),
+    ("Descrição dos danos/ evidências", 50, "descricao"),
+    ("Código", 18, "codigo"),
+]
+
+
+def montar_resumo_frota(defeitos, titulo="Defeitos registrados na frota"):
+    """PDF com uma tabela dos defeitos consultados no banco (ver banco_defeitos.consultar)."""
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.set_creation_date(DATA_DOCUMENTO_PADRAO)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, f"{titulo} ({len(defeitos)})", ln=True)
+    linhas = [["" if d.get(chave) is None else str(d[chave]) for _, _, chave in COLUNAS_FROTA] for d in defeitos]
+    desenhar_tabela(
+        pdf, [(nome, largura) for nome, largura, _ in COLUNAS_FROTA], linhas, pdf.h - ALTURA_RODAPE,
+        fonte_cabecalho=("Arial", "B", 9), fonte_linhas=("Arial", "", 9),
+    )
+    return bytes(pdf.output())
+
+
+# -------------------------- Pré-visualização de uma seção -----------------------------
+PREVIA_DPI = 60         # Resolução das fotos na pré-visualização (o PDF final usa imagens.DPI_PADRAO)
+PREVIA_QUALIDADE = 50
+
+
+def montar_previa(titulo, tabela, topicos, numero_pa, cache=None):
+    """Monta um PDF só com a tabela de defeitos e os tópicos com fotos de uma pá.
+
+    As fotos entram como miniaturas de baixa resolução (`PREVIA_DPI`), então a
+    página fica pronta em uma fração do tempo do relatório completo, com o mesmo layout.
+    """
+    tarefas = [
+        (foto, 86, 56, PREVIA_DPI, PREVIA_QUALIDADE)
+        for topico, (fotos, _) in topicos.items() for foto in fotos[:max_fotos(topico)]
+    ]
+    preparadas = iter(preparar_imagens(tarefas, cache=cache))
+    topicos = {
+        topico: ([next(preparadas) for _ in fotos[:max_fotos(topico)]], obs) for topico, (fotos, obs) in topicos.items()
+    }
+
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    gerar_tabela_defeitos(pdf, titulo, tabela)
+    inserir_topicos_fotos(pdf, topicos)
+    return bytes(pdf.output())
+
+
+def rasterizar_paginas(pdf, largura_px=700):
+    """Converte as páginas de um PDF em imagens PIL; devolve None se o pypdfium2 não estiver instalado."""
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    documento = pypdfium2.PdfDocument(pdf)
+    try:
+        paginas = []
+        for pagina in documento:
+            paginas.append(pagina.render(scale=largura_px / pagina.get_width()).to_pil())
+        return paginas
+    finally:
+        documento.close()
+
+
+def _desenhar_relatorio(pdf, dados, cache=None, fim_etapa=lambda nome: None):
+    # Prepara as fotos e desenha todas as páginas de um relatório no `pdf` (sem gerar a saída)
+    pdf.set_creation_date(data_documento(dados))
+    pdf.definir_perfil(dados.get("perfil", PERFIL_PADRAO))
+    topicos_externos = [dict(topicos) for topicos in dados["topicos_externos"]]
+    topicos_internos = [dict(topicos) for topicos in dados["topicos_internos"]]
+
+    # ----------------- Preparação das imagens -----------------
+    # Reduz todas as fotos ao tamanho do quadro e recodifica em JPEG, em um único lote
+    # distribuído entre os núcleos, antes de começar a montar o PDF. A resolução e a
+    # qualidade vêm do perfil e valem para todos os quadros de foto do relatório
+    grupos_topicos = topicos_externos + topicos_internos
+    resolucao = (pdf.perfil["dpi"], pdf.perfil["qualidade"])
+
+    tarefas = []
+    if dados["imagem_maquina"]:
+        tarefas.append((dados["imagem_maquina"], 186, 34, *resolucao))  # Quadro 190 x 38 mm da seção 8
+    for fotos_pa in dados["imagens_pas"].values():
+        for foto in fotos_pa:
+            tarefas.append((foto, 76, 46, *resolucao))                  # Quadro 80 x 50 mm da seção 9
+    for grupo in grupos_topicos:
+        for topico, (fotos, obs) in grupo.items():
+            for foto in fotos[:max_fotos(topico)]:
+                tarefas.append((foto, 86, 56, *resolucao))              # Quadro 90 x 60 mm dos tópicos
+
+    if pdf.somente_layout:
+        preparadas = iter([b"-"] * len(tarefas))  # As imagens não serão desenhadas: basta um valor não vazio
+    else:
+        preparadas = iter(preparar_imagens(tarefas, cache=cache))  # Só processa fotos novas
+
+    # As versões preparadas ficam em memória (BytesIO) e vão direto para o pdf.image
+    imagem_maquina_pdf = BytesIO(next(preparadas)) if dados["imagem_maquina"] else None
+    imagens_pás = {
+        nome_pa: [BytesIO(next(preparadas)) for _ in fotos_pa]
+        for nome_pa, fotos_pa in dados["imagens_pas"].items()
+    }
+    for grupo in grupos_topicos:
+        for topico, (fotos, obs) in grupo.items():
+            grupo[topico] = ([next(preparadas) for _ in fotos[:max_fotos(topico)]], obs)
+    fim_etapa("preparacao_imagens")
+
+    pdf.alias_nb_pages()
+    pdf.add_page()
+
+    # 👇 Depois começa a montar o PDF
+    pdf.primeira_pagina(
+        dados["ambito_aplicacao"],
+        dados["codigo_relatorio"],
+        dados["revisado_por_1"],
+        dados["revisado_por_2"],
+        dados["data_revisao"]
+    )
+
+    pdf.pagina_sumario()
+    pdf.pagina_dados(dados["dados_gerais"], dados["dados_pas"])
+    pdf.pagina_nomenclaturas()
+    pdf.pagina_itens_referencia_identificacao(imagem_maquina_pdf)
+    pdf.pagina_identificacao_pas(imagens_pás)
+    fim_etapa("paginas_iniciais")
+
+    # ----------------- Inspeção Externa -----------------
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "10. Inspeção Externa", ln=True)
+    pdf.ln(2)
+    for numero_pa, (tabela, topicos) in enumerate(zip(dados["tabelas_externas"], topicos_externos), start=1):
+        with pdf.medir(f"Inspeção externa - PÁ {numero_pa}"):
+            if numero_pa > 1:
+                pdf.add_page()
+            gerar_tabela_defeitos(pdf, titulo_classificacao("externa", numero_pa), tabela)
+            inserir_topicos_fotos(pdf, topicos)
+    fim_etapa("inspecao_externa")
+
+    # ----------------- Inspeção Interna -----------------
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 10, "11. Inspeção Interna", ln=True)
+    pdf.ln(2)
+    for numero_pa, (tabela, topicos) in enumerate(zip(dados["tabelas_internas"], topicos_internos), start=1):
+        with pdf.medir(f"Inspeção interna - PÁ {numero_pa}"):
+            if numero_pa > 1:
+                pdf.add_page()
+            gerar_tabela_defeitos(pdf, titulo_classificacao("interna", numero_pa), tabela)
+            inserir_topicos_fotos(pdf, topicos)
+    fim_etapa("inspecao_interna")
+
+
+def montar_relatorio(dados, cache=None, metricas=None):
+    """Gera o relatório completo e devolve os bytes do PDF.
+
+    `dados` é um dicionário só com textos e bytes (pode ser enviado a outro processo):
+    - "ambito_aplicacao", "codigo_relatorio", "revisado_por_1", "revisado_por_2", "data_revisao": capa
+    - "dados_gerais", "dados_pas": dicionários rótulo -> valor das seções 3 e 4
+    - "imagem_maquina": bytes da foto da seção 8 (ou None)
+    - "imagens_pas": {"PÁ 1": [bytes, ...], ...} da seção 9
+    - "tabelas_externas", "tabelas_internas": três tabelas de defeitos (uma por pá)
+    - "topicos_externos", "topicos_internos": três dicionários tópico -> ([bytes, ...], observação)
+    - "perfil" (opcional): nome de um dos `PERFIS`, "final" se ausente
+
+    A saída é determinística: os mesmos dados geram sempre os mesmos bytes (ver
+    `data_documento`).
+
+    Se `metricas` for um dicionário, recebe as medições da montagem: "etapas" (tempo
+    de cada etapa, em s), "secoes" (`PDF.medicoes`), total de imagens e bytes de
+    imagem embutidos, número de páginas e tamanho do PDF.
+    """
+    metricas = {} if metricas is None else metricas
+    etapas = metricas["etapas"] = {}
+    marca = time.perf_counter()
+
+    def fim_etapa(nome):
+        nonlocal marca
+        agora = time.perf_counter()
+        etapas[nome] = agora - marca
+        marca = agora
+
+    pdf = PDF()
+    _desenhar_relatorio(pdf, dados, cache, fim_etapa)
+
+    # ----------------- Finalização -----------------
+    with pdf.medir("output"):
+        saida = bytes(pdf.output())  # Gera o PDF direto em memória, sem arquivo intermediário
+    fim_etapa("saida")
+
+    metricas.update(
+        secoes=pdf.medicoes,
+        imagens=pdf.imagens_inseridas,
+        bytes_imagens=pdf.bytes_imagens,
+        paginas=pdf.pages_count,
+        bytes_pdf=len(saida),
+    )
+    return saida
+
+
+def montar_relatorio_consolidado(fontes, caminho_pdf, carregar, cache=None):
+    """Grava em `caminho_pdf` um documento único com o relatório de cada fonte (lista), em ordem.
+
+    `carregar(fonte)` devolve o dicionário de `montar_relatorio` de uma fonte (ex.: o
+    manifesto de um aerogerador). Um relatório por vez fica em memória: cada um é
+    montado, anexado ao arquivo por `EscritorPDF` e descartado antes do próximo,
+    então o pico de memória não cresce com o número de aerogeradores.
+
+    Para o rodapé "Página X de Y" sair certo, uma primeira passada só calcula a
+    paginação de cada relatório (sem preparar nem embutir imagens) e a segunda
+    desenha cada um já com o deslocamento e o total do documento inteiro.
+    Devolve o número total de páginas.
+    """
+    paginas = []
+    for fonte in fontes:
+        pdf = PDF()
+        pdf.somente_layout = True
+        _desenhar_relatorio(pdf, carregar(fonte))
+        paginas.append(pdf.pages_count)
+    total = sum(paginas)
+
+    with EscritorPDF(caminho_pdf) as escritor:
+        for fonte, paginas_fonte in zip(fontes, paginas):
+            pdf = PDF()
+            pdf.deslocamento_paginas = escritor.total_paginas
+            pdf.total_paginas = total
+            _desenhar_relatorio(pdf, carregar(fonte), cache)
+            escritor.anexar(bytes(pdf.output()))
+            if escritor.total_paginas - pdf.deslocamento_paginas != paginas_fonte:
+                raise RuntimeError(f"Paginação de {fonte} mudou entre as duas passadas.")
+            del pdf
+    return total
@@ -0,0 +1,135 @@
+# Tabelas de tamanho qualquer no PDF: texto quebrado dentro das colunas, altura de cada linha
+# calculada pelo texto mais longo e cabeçalho repetido no topo de cada página nova
+LIMITE_PALAVRAS = 200_000  # Larguras guardadas por fonte antes de recomeçar a tabela da fonte
+
+_larguras = {}  # (família, estilo, tamanho) -> {palavra: largura em mm}
+
+
+def _tabela_larguras(pdf):
+    # Larguras já medidas na fonte atual; as fontes padrão do PDF não têm kerning, então a
+    # largura de uma linha é a soma das larguras das palavras e dos espaços
+    chave = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+    tabela = _larguras.get(chave)
+    if tabela is None or len(tabela) > LIMITE_PALAVRAS:
+        tabela = _larguras[chave] = {}
+    return tabela
+
+
+def _largura(pdf, tabela, palavra):
+    largura = tabela.get(palavra)
+    if largura is None:
+        largura = tabela[palavra] = pdf.get_string_width(palavra)
+    return largura
+
+
+def _partir_palavra(pdf, tabela, palavra, largura_max):
+    # Palavra maior que a coluna: quebra entre letras
+    pedacos, atual, largura_atual = [], "", 0
+    for letra in palavra:
+        largura_letra = _largura(pdf, tabela, letra)
+        if atual and largura_atual + largura_letra > largura_max:
+            pedacos.append(atual)
+            atual, largura_atual = "", 0
+        atual += letra
+        largura_atual += largura_letra
+    return pedacos + [atual]
+
+
+def _quebrar(pdf, tabela, texto, largura_max):
+    espaco = _largura(pdf, tabela, " ")
+    linhas = []
+    for paragrafo in str(texto).split("\n"):
+        atual, largura_atual = [], 0
+        for palavra in paragrafo.split():
+            largura_palavra = _largura(pdf, tabela, palavra)
+            if largura_palavra > largura_max:
+                if atual:
+                    linhas.append(" ".join(atual))
+                *inteiros, resto = _partir_palavra(pdf, tabela, palavra, largura_max)
+                linhas.extend(inteiros)
+                atual, largura_atual = [resto], _largura(pdf, tabela, resto)
+            elif atual and largura_atual + espaco + largura_palavra > largura_max:
+                linhas.append(" ".join(atual))
+                atual, largura_atual = [palavra], largura_palavra
+            else:
+                largura_atual += (espaco if atual else 0) + largura_palavra
+                atual.append(palavra)
+        linhas.append(" ".join(atual))
+    return linhas
+
+
+def quebrar_texto(pdf, texto, largura_max):
+    """Divide `texto` em linhas que cabem em `largura_max` mm na fonte atual do `pdf`."""
+    return _quebrar(pdf, _tabela_larguras(pdf), texto, largura_max)
+
+
+def medir_linhas(pdf, larguras, linhas, altura_texto=5, altura_minima=10):
+    """Quebra o texto de cada célula e calcula a altura de cada linha da tabela.
+
+    `linhas` é uma lista de listas de textos (uma por coluna). Devolve, para cada
+    linha, `(células quebradas em linhas de texto, altura em mm)`. Usa a fonte atual.
+    """
+    tabela = _tabela_larguras(pdf)
+    uteis = [largura - 2 * pdf.c_margin for largura in larguras]
+    quebras = [{} for _ in larguras]  # Por coluna: texto -> linhas (locais e códigos se repetem muito)
+    medidas = []
+    for linha in linhas:
+        celulas = []
+        for texto, largura, vistos in zip(linha, uteis, quebras):
+            quebrado = vistos.get(texto)
+            if quebrado is None:
+                quebrado = vistos[texto] = _quebrar(pdf, tabela, texto, largura)
+            celulas.append(quebrado)
+        altura = max(altura_minima, max(map(len, celulas)) * altura_texto + altura_texto)
+        medidas.append((celulas, altura))
+    return medidas
+
+
+def _desenhar_linha(pdf, larguras, celulas, altura, altura_texto, alinhamento, preenchimento):
+    x, y = pdf.l_margin, pdf.get_y()
+    for texto, largura in zip(celulas, larguras):
+        pdf.rect(x, y, largura, altura, style="DF" if preenchimento else "D")
+        # Texto centralizado na vertical, como no `cell` do fpdf
+        topo = y + (altura - len(texto) * altura_texto) / 2
+        for i, linha_texto in enumerate(texto):
+            if alinhamento == "C":
+                deslocamento = (largura - pdf.get_string_width(linha_texto)) / 2
+            else:
+                deslocamento = pdf.c_margin
+            base = topo + (i + 0.5) * altura_texto + 0.3 * pdf.font_size
+            pdf.text(x + deslocamento, base, linha_texto)
+        x += largura
+    pdf.set_y(y + altura)
+
+
+def desenhar_tabela(pdf, colunas, linhas, limite_inferior=None, altura_texto=5, altura_minima=10,
+                    fonte_cabecalho=("Arial", "B", 10), fonte_linhas=("Arial", "", 10), cor_cabecalho=(220, 230, 241)):
+    """Desenha uma tabela a partir da posição atual, quebrando páginas quando preciso.
+
+    `colunas` é uma lista de `(título, largura em mm)` e `linhas` uma lista de listas
+    de textos. Uma linha que não cabe acima de `limite_inferior` (padrão: margem
+    inferior da página) vai para a página seguinte, que começa repetindo o cabeçalho.
+    """
+    limite = pdf.h - pdf.b_margin if limite_inferior is None else limite_inferior
+    larguras = [largura for _, largura in colunas]
+
+    pdf.set_font(*fonte_cabecalho)
+    (cabecalho, altura_cabecalho), = medir_linhas(pdf, larguras, [[titulo for titulo, _ in colunas]], altura_texto, altura_minima)
+    pdf.set_font(*fonte_linhas)
+    medidas = medir_linhas(pdf, larguras, linhas, altura_texto, altura_minima)
+
+    def desenhar_cabecalho():
+        pdf.set_font(*fonte_cabecalho)
+        pdf.set_fill_color(*cor_cabecalho)
+        _desenhar_linha(pdf, larguras, cabecalho, altura_cabecalho, altura_texto, "C", True)
+        pdf.set_font(*fonte_linhas)
+
+    # O cabeçalho não fica sozinho no fim de uma página
+    if pdf.get_y() + altura_cabecalho + (medidas[0][1] if medidas else 0) > limite:
+        pdf.add_page()
+    desenhar_cabecalho()
+    for celulas, altura in medidas:
+        if pdf.get_y() + altura > limite:
+            pdf.add_page()
+            desenhar_cabecalho()
+        _desenhar_linha(pdf, larguras, celulas, altura, altura_texto, "L", False)
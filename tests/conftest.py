@@ -0,0 +1,36 @@
+# Os testes importam os módulos da raiz do repositório e usam a pasta assets/ relativa a ela
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+
+
+def _tabela(*linhas):
+    return [{"Localizacao": loc, "Descricao": desc, "Area": area, "Código": codigo} for loc, desc, area, codigo in linhas]
+
+
+@pytest.fixture
+def dados_relatorio():
+    """Cria os dados de um relatório sem fotos (formato de `montar_relatorio`), com campos trocáveis."""
+    def criar(**campos):
+        dados = {
+            "perfil": "final",
+            "id_relatorio": None,
+            "ambito_aplicacao": "Complexo Eólico Cutia - WTG SM2-09",
+            "codigo_relatorio": "IQONY-INSP-01",
+            "revisado_por_1": "", "revisado_por_2": "", "data_revisao": "12/04/2025",
+            "dados_gerais": {}, "dados_pas": {},
+            "imagem_maquina": None,
+            "imagens_pas": {"PÁ 1": [], "PÁ 2": [], "PÁ 3": []},
+            "tabelas_externas": [_tabela(("B. A", "Erosão", "10 cm", "3")), [], []],
+            "topicos_externos": [{}, {}, {}],
+            "tabelas_internas": [[], _tabela(("B.A.", "Trinca", "-", "4 - grave")), []],
+            "topicos_internos": [{}, {}, {}],
+        }
+        dados.update(campos)
+        return dados
+    return criar
@@ -0,0 +1,85 @@
+import sqlite3
+
+import banco_defeitos
+
+
+def _tabela(*linhas):
+    return [{"Localizacao": loc, "Descricao": desc, "Area": area, "Código": codigo} for loc, desc, area, codigo in linhas]
+
+
+def _dados(ambito="Complexo Eólico Cutia - WTG SM2-09", **campos):
+    dados = {
+        "perfil": "final",
+        "codigo_relatorio": "IQONY-INSP-01",
+        "ambito_aplicacao": ambito,
+        "data_revisao": "12/04/2025",
+        "tabelas_externas": [_tabela(("B. A", "Erosão", "10 cm", "3"), ("TIP", "", "", "-")), [], []],
+        "tabelas_internas": [[], _tabela(("B.A.", "Trinca", "-", "4 - grave")), []],
+    }
+    dados.update(campos)
+    return dados
+
+
+def test_esquema_criado_com_indices_e_busca(tmp_path):
+    conexao = banco_defeitos.conectar(str(tmp_path / "defeitos.sqlite"))
+    nomes = {nome for nome, in conexao.execute("SELECT name FROM sqlite_master")}
+    assert {"relatorios", "defeitos", "relatorios_busca", "idx_defeitos_local_sev", "idx_defeitos_sev",
+            "idx_defeitos_relatorio"} <= nomes
+    assert conexao.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conexao.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_registra_sem_linhas_vazias_e_substitui_o_mesmo_relatorio(tmp_path):
+    conexao = banco_defeitos.conectar(str(tmp_path / "defeitos.sqlite"))
+    banco_defeitos.registrar_relatorio(conexao, _dados(id_relatorio="r1"))
+    banco_defeitos.registrar_relatorio(conexao, _dados(id_relatorio="r1"))  # Gerado de novo
+    assert banco_defeitos.registrar_relatorio(conexao, _dados(id_relatorio="r2", perfil="rascunho")) is None
+
+    defeitos = banco_defeitos.consultar(conexao)
+    assert [(d["pa"], d["inspecao"], d["localizacao"], d["severidade"]) for d in defeitos] == [
+        (2, "interna", "B.A.", 4), (1, "externa", "B. A", 3),
+    ]
+    assert conexao.execute("SELECT COUNT(*) FROM relatorios").fetchone()[0] == 1
+
+
+def test_consulta_pela_busca_do_ambito_e_pela_localizacao(tmp_path):
+    conexao = banco_defeitos.conectar(str(tmp_path / "defeitos.sqlite"))
+    banco_defeitos.registrar_relatorio(conexao, _dados(id_relatorio="r1"))
+    banco_defeitos.registrar_relatorio(conexao, _dados("Complexo Eólico Cutia - WTG SM2-10", id_relatorio="r2"))
+
+    assert {d["ambito_aplicacao"] for d in banco_defeitos.consultar(conexao, turbina="SM2-09")} == {
+        "Complexo Eólico Cutia - WTG SM2-09"}
+    assert len(banco_defeitos.consultar(conexao, turbina="SM2-1")) == 2  # Prefixo da última palavra
+    assert len(banco_defeitos.consultar(conexao, turbina="Cutia")) == 4
+    assert len(banco_defeitos.consultar(conexao, localizacao="b.a", severidade_min=4)) == 2
+
+    # A busca acompanha as exclusões: o relatório substituído não aparece mais
+    banco_defeitos.registrar_relatorio(conexao, _dados("Outro parque - WTG 01", id_relatorio="r2"))
+    assert banco_defeitos.consultar(conexao, turbina="SM2-10") == []
+    assert len(banco_defeitos.consultar(conexao, turbina="WTG 01")) == 2
+
+
+def test_migra_banco_sem_identidade_e_sem_busca(tmp_path):
+    caminho = str(tmp_path / "antigo.sqlite")
+    antigo = sqlite3.connect(caminho)
+    antigo.executescript("""
+        CREATE TABLE relatorios (id INTEGER PRIMARY KEY, codigo_relatorio TEXT NOT NULL, ambito_aplicacao TEXT NOT NULL,
+                                 data_revisao TEXT, gerado_em TEXT NOT NULL);
+        CREATE TABLE defeitos (relatorio_id INTEGER NOT NULL REFERENCES relatorios(id) ON DELETE CASCADE,
+                               pa INTEGER NOT NULL, inspecao TEXT NOT NULL, localizacao TEXT NOT NULL,
+                               localizacao_chave TEXT NOT NULL, descricao TEXT, area TEXT, codigo TEXT, severidade INTEGER);
+        INSERT INTO relatorios VALUES (1, 'R-1', 'Parque Antigo - WTG 07', '01/01/2024', '2024-01-01 10:00:00');
+        INSERT INTO defeitos VALUES (1, 3, 'externa', 'TIP', 'TIP', 'Raio', '-', '5', 5);
+    """)
+    antigo.close()
+
+    conexao = banco_defeitos.conectar(caminho)
+    assert conexao.execute("SELECT identidade FROM relatorios").fetchall() == [("antigo:1",)]
+    antigos = banco_defeitos.consultar(conexao, turbina="WTG 07")  # Indexados na criação da busca
+    assert [(d["codigo_relatorio"], d["pa"], d["severidade"]) for d in antigos] == [("R-1", 3, 5)]
+
+    # Abrir de novo não migra outra vez
+    banco_defeitos.registrar_relatorio(conexao, _dados(id_relatorio="novo"))
+    conexao.close()
+    conexao = banco_defeitos.conectar(caminho)
+    assert len(banco_defeitos.consultar(conexao)) == 3
@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+import cache_imagens
+from cache_imagens import CacheImagens, chave_conteudo
+
+
+def _envelhecer(cache, chave, segundos_atras):
+    antigo = time.time() - segundos_atras
+    os.utime(cache._caminho(chave), (antigo, antigo))
+
+
+def test_chave_depende_do_conteudo_e_dos_parametros():
+    assert chave_conteudo(b"foto", 86, 56, 200, 80) == chave_conteudo(b"foto", 86, 56, 200, 80)
+    assert chave_conteudo(b"foto", 86, 56, 200, 80) != chave_conteudo(b"foto", 86, 56, 120, 80)
+    assert chave_conteudo(b"foto", 86, 56, 200, 80) != chave_conteudo(b"outra", 86, 56, 200, 80)
+
+
+def test_descarta_os_menos_usados_ao_passar_do_limite(tmp_path):
+    cache = CacheImagens(str(tmp_path), limite_bytes=3000)
+    for i, chave in enumerate("abc"):
+        cache.guardar(chave, bytes(1000))
+        _envelhecer(cache, chave, 300 - i * 100)  # "a" é a mais antiga
+    assert cache.obter("a") == bytes(1000)  # Usada agora: passa a ser a mais recente
+
+    cache.guardar("d", bytes(1000))
+    assert cache.obter("b") is None
+    assert all(cache.obter(chave) is not None for chave in "acd")
+    assert sorted(os.listdir(tmp_path)) == [".trava", "a", "c", "d"]
+
+
+def test_guardar_de_novo_so_marca_o_uso(tmp_path):
+    cache = CacheImagens(str(tmp_path))
+    cache.guardar("a", b"primeira")
+    _envelhecer(cache, "a", 100)
+    cache.guardar("a", b"segunda")
+    assert cache.obter("a") == b"primeira"
+    assert time.time() - os.path.getmtime(cache._caminho("a")) < 10
+    assert cache._total == len(b"primeira")
+
+
+def test_arquivo_apagado_por_outro_processo_conta_como_ausente(tmp_path):
+    cache = CacheImagens(str(tmp_path))
+    outro = CacheImagens(str(tmp_path))
+    cache.guardar("a", b"dados")
+    os.remove(outro._caminho("a"))
+    assert cache.obter("a") is None
+    cache.guardar("a", b"dados")
+    assert outro.obter("a") == b"dados"
+
+
+@pytest.mark.skipif(cache_imagens.fcntl is None, reason="sem fcntl o descarte não é coordenado")
+def test_so_um_processo_descarta_por_vez(tmp_path):
+    fcntl = cache_imagens.fcntl
+    cache = CacheImagens(str(tmp_path), limite_bytes=1000)
+    with open(tmp_path / ".trava", "a") as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)  # Outro processo descartando
+        cache.guardar("a", bytes(800))
+        cache.guardar("b", bytes(800))
+        assert cache.obter("a") is not None  # Passou do limite, mas o descarte ficou com o outro
+        fcntl.flock(trava, fcntl.LOCK_UN)
+    _envelhecer(cache, "a", 100)
+    _envelhecer(cache, "b", 50)
+    cache.guardar("c", bytes(100))
+    assert cache.obter("a") is None and cache.obter("b") is not None
+
+
+def test_temporarios_abandonados_sao_apagados_e_nao_contam_no_total(tmp_path):
+    abandonado, em_uso = tmp_path / ".tmp_abandonado", tmp_path / ".tmp_em_uso"
+    abandonado.write_bytes(bytes(5000))
+    em_uso.write_bytes(bytes(5000))
+    antigo = time.time() - cache_imagens.IDADE_TEMPORARIOS - 10
+    os.utime(abandonado, (antigo, antigo))
+
+    cache = CacheImagens(str(tmp_path), limite_bytes=1000)
+    assert cache._total == 0
+    cache.guardar("a", bytes(600))
+    cache.guardar("b", bytes(600))  # Passa do limite: descarta "a" e limpa os temporários
+    assert not abandonado.exists() and em_uso.exists()
+    assert cache.obter("b") is not None
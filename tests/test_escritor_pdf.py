@@ -0,0 +1,88 @@
+from io import BytesIO
+
+from pypdf import PdfReader
+
+from escritor_pdf import EscritorPDF
+from relatorio_pdf import PDF, montar_relatorio_consolidado
+
+
+def _parte(numero):
+    # Duas páginas com marcadores, a mesma imagem fixa e um anexo próprio
+    pdf = PDF()
+    pdf.set_font("Arial", "", 12)
+    for pagina in range(2):
+        pdf.add_page()
+        pdf.start_section(f"Turbina {numero} 1 0 R página {pagina}")
+        pdf.cell(0, 10, f"Texto (1 0 R) da turbina {numero}")
+        pdf.image("assets/logo_iqony.png", 10, 40, 40)
+    pdf.embed_file(basename=f"anexo{numero}.txt", bytes=f"anexo {numero}".encode())
+    return bytes(pdf.output())
+
+
+def test_junta_tres_partes_legiveis_por_um_leitor_de_pdf(tmp_path):
+    caminho = tmp_path / "parque.pdf"
+    partes = [_parte(n) for n in range(3)]
+    with EscritorPDF(caminho) as escritor:
+        for parte in partes:
+            escritor.anexar(parte)
+        assert escritor.total_paginas == 6
+
+    leitor = PdfReader(caminho, strict=True)
+    textos = [pagina.extract_text() for pagina in leitor.pages]
+    assert len(textos) == 6
+    for n in range(3):
+        assert all(f"Texto (1 0 R) da turbina {n}" in texto for texto in textos[2 * n:2 * n + 2])
+    assert [item.title for item in leitor.outline] == [
+        f"Turbina {n} 1 0 R página {p}" for n in range(3) for p in range(2)
+    ]
+    assert [leitor.get_destination_page_number(item) for item in leitor.outline] == list(range(6))
+    assert sorted(leitor.attachments) == ["anexo0.txt", "anexo1.txt", "anexo2.txt"]
+    assert leitor.attachments["anexo2.txt"] == [b"anexo 2"]
+
+
+def _imagens(leitor):
+    return {pagina["/Resources"]["/XObject"].raw_get(nome).idnum
+            for pagina in leitor.pages for nome in pagina["/Resources"]["/XObject"]}
+
+
+def test_imagens_repetidas_entre_partes_sao_gravadas_uma_vez(tmp_path):
+    caminho = tmp_path / "parque.pdf"
+    parte = _parte(0)
+    with EscritorPDF(caminho) as escritor:
+        for n in range(3):
+            escritor.anexar(_parte(n))
+
+    assert len(_imagens(PdfReader(caminho))) == len(_imagens(PdfReader(BytesIO(parte))))
+
+
+def test_nome_repetido_com_valores_diferentes_e_recusado(tmp_path):
+    def com_anexo(conteudo):
+        pdf = PDF()
+        pdf.add_page()
+        pdf.embed_file(basename="anexo.txt", bytes=conteudo)
+        return bytes(pdf.output())
+
+    with EscritorPDF(tmp_path / "parque.pdf") as escritor:
+        escritor.anexar(com_anexo(b"um"))
+        try:
+            escritor.anexar(com_anexo(b"outro"))
+        except ValueError as e:
+            assert "anexo.txt" in str(e)
+        else:
+            raise AssertionError("anexo repetido aceito")
+
+
+def test_consolidado_de_tres_aerogeradores_numera_o_documento_inteiro(tmp_path, dados_relatorio):
+    fontes = {f"WTG-0{n}": dados_relatorio(ambito_aplicacao=f"Complexo Eólico Cutia - WTG-0{n}") for n in range(1, 4)}
+    caminho = tmp_path / "parque.pdf"
+
+    total = montar_relatorio_consolidado(list(fontes), str(caminho), fontes.__getitem__)
+
+    leitor = PdfReader(caminho, strict=True)
+    assert len(leitor.pages) == total
+    assert total % 3 == 0
+    textos = [pagina.extract_text() for pagina in leitor.pages]
+    assert all(f"Página {i} de {total}" in texto for i, texto in enumerate(textos, start=1))
+    for n in range(1, 4):
+        primeira = (n - 1) * total // 3
+        assert f"WTG-0{n}" in textos[primeira]
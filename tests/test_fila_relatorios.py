@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+import banco_defeitos
+from fila_relatorios import FilaCheia, FilaRelatorios, digest_dados
+
+
+@pytest.fixture
+def criar_fila():
+    filas = []
+
+    def criar(**parametros):
+        fila = FilaRelatorios(**{"max_workers": 1, **parametros})
+        filas.append(fila)
+        return fila
+
+    yield criar
+    for fila in filas:
+        fila.fechar()
+
+
+def _enviar_quando_houver_vaga(fila, sessao, dados, espera=10):
+    # A vaga é liberada no callback do trabalho anterior, que pode rodar logo depois de `result()` voltar
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            return fila.enviar(sessao, dados)
+        except FilaCheia:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.01)
+
+
+def test_recusa_pedidos_alem_do_limite_e_libera_a_vaga_ao_terminar(criar_fila, dados_relatorio):
+    fila = criar_fila(max_pendentes=1)
+    primeiro = fila.enviar("sessao-1", dados_relatorio(codigo_relatorio="R-1"))
+    with pytest.raises(FilaCheia):
+        fila.enviar("sessao-2", dados_relatorio(codigo_relatorio="R-2"))
+
+    fila.futuro(primeiro).result(timeout=60)
+    segundo = _enviar_quando_houver_vaga(fila, "sessao-2", dados_relatorio(codigo_relatorio="R-2"))
+    fila.futuro(segundo).result(timeout=60)
+    assert fila.resultado(segundo).startswith(b"%PDF")
+
+
+def test_falha_na_geracao_tambem_libera_a_vaga(criar_fila, dados_relatorio):
+    fila = criar_fila(max_pendentes=1)
+    quebrado = fila.enviar("sessao-1", dados_relatorio(tabelas_externas=None))
+    with pytest.raises(Exception):
+        fila.futuro(quebrado).result(timeout=60)
+    assert fila.estado(quebrado) == "erro"
+
+    valido = _enviar_quando_houver_vaga(fila, "sessao-1", dados_relatorio())
+    fila.futuro(valido).result(timeout=60)
+    assert fila.resultado(valido).startswith(b"%PDF")
+
+
+def test_digest_ignora_a_forma_da_foto_e_o_id_do_relatorio(tmp_path, dados_relatorio):
+    foto = tmp_path / "foto.jpg"
+    foto.write_bytes(b"bytes da foto")
+    em_memoria = dados_relatorio(imagem_maquina=b"bytes da foto", id_relatorio="a")
+    no_disco = dados_relatorio(imagem_maquina=str(foto), id_relatorio="b")
+    assert digest_dados(em_memoria) == digest_dados(no_disco)
+    assert digest_dados(em_memoria) != digest_dados(dados_relatorio(imagem_maquina=b"outra foto"))
+    assert digest_dados(dados_relatorio()) != digest_dados(dados_relatorio(codigo_relatorio="OUTRO"))
+
+
+def test_pedidos_iguais_reaproveitam_o_mesmo_trabalho_e_o_pdf_pronto(criar_fila, dados_relatorio):
+    fila = criar_fila(max_pendentes=1)
+    primeiro = fila.enviar("sessao-1", dados_relatorio())
+    assert fila.enviar("sessao-1", dados_relatorio()) == primeiro  # Clique repetido
+    em_geracao = fila.enviar("sessao-2", dados_relatorio())  # Não ocupa outra vaga
+    assert fila.futuro(em_geracao) is fila.futuro(primeiro)
+
+    pdf = fila.futuro(primeiro).result(timeout=60)[0]
+    pronto = _enviar_quando_houver_vaga(fila, "sessao-3", dados_relatorio(id_relatorio="outro"))
+    assert fila.estado(pronto) == "pronto"
+    assert fila.resultado(pronto) == pdf
+    assert fila.metricas(pronto)["em_cache"] and not fila.metricas(primeiro).get("em_cache")
+
+
+def test_sem_espaco_para_guardar_o_pdf_gera_de_novo(criar_fila, dados_relatorio):
+    fila = criar_fila(limite_prontos=0)
+    primeiro = fila.enviar("sessao-1", dados_relatorio())
+    fila.futuro(primeiro).result(timeout=60)
+    segundo = fila.enviar("sessao-2", dados_relatorio())
+    fila.futuro(segundo).result(timeout=60)
+    assert not fila.metricas(segundo).get("em_cache")
+
+
+def test_cada_pedido_atendido_entra_no_banco_com_o_seu_id(tmp_path, criar_fila, dados_relatorio):
+    caminho = str(tmp_path / "defeitos.sqlite")
+    fila = criar_fila(caminho_banco=caminho)
+    gerado = fila.enviar("sessao-1", dados_relatorio(id_relatorio="r1"))
+    fila.futuro(gerado).result(timeout=60)
+    reaproveitado = fila.enviar("sessao-2", dados_relatorio(id_relatorio="r2"))
+    assert fila.metricas(reaproveitado)["em_cache"]
+
+    conexao = banco_defeitos.conectar(caminho)
+    limite = time.monotonic() + 10
+    while conexao.execute("SELECT COUNT(*) FROM relatorios").fetchone()[0] < 2 and time.monotonic() < limite:
+        time.sleep(0.05)  # Os defeitos são gravados em segundo plano
+    assert sorted(i for i, in conexao.execute("SELECT identidade FROM relatorios")) == ["r1", "r2"]
@@ -0,0 +1,54 @@
+from io import BytesIO
+
+import fpdf
+import pytest
+from fontTools import ttLib
+from fpdf.fonts import TTFFont
+from pypdf import PdfReader
+
+import fontes_pdf
+from relatorio_pdf import PDF
+
+TEXTO = "Trinca “longa” no B.A — 12 cm² · Łódź ő € ½"
+
+pytestmark = pytest.mark.skipif(not fontes_pdf.arquivos_fontes(), reason="nenhuma fonte TrueType instalada")
+
+
+def test_modelo_igual_a_fonte_lida_pelo_fpdf():
+    # Os atributos internos do TTFFont preenchidos por `_modelo` são os que o fpdf2 fixado usa
+    caminho = fontes_pdf.arquivos_fontes()[""]
+    lida = TTFFont(fpdf.FPDF(), caminho, "arial", "")
+    modelo = fontes_pdf._nova_fonte(PDF(), caminho, "arial", "")
+
+    # Atributos de cada documento ou comparados à parte; todos os outros precisam existir e ser iguais
+    proprios = {"i", "fontkey", "emphasis", "ttfont", "subset", "_hbfont", "desc", "cw"}
+    for nome in TTFFont.__slots__:
+        if hasattr(lida, nome):
+            assert hasattr(modelo, nome), nome
+            if nome not in proprios:
+                assert getattr(modelo, nome) == getattr(lida, nome), nome
+    assert vars(modelo.desc) == vars(lida.desc)
+    # `cw` guarda também os caracteres sem glifo já consultados (largura padrão): compara pelos da fonte
+    assert {codigo: modelo.cw[codigo] for codigo in lida.cw} == dict(lida.cw)
+
+
+def test_documento_embute_os_glifos_usados_e_o_texto_e_extraido():
+    pdf = PDF()
+    pdf.add_page()
+    for estilo in ("", "B", "I"):
+        pdf.set_font("Arial", estilo, 11)
+        pdf.multi_cell(0, 8, TEXTO)
+        pdf.ln()
+    leitor = PdfReader(BytesIO(bytes(pdf.output())), strict=True)
+
+    assert leitor.pages[0].extract_text().count(TEXTO) == 3
+
+    fontes = [fonte.get_object() for fonte in leitor.pages[0]["/Resources"]["/Font"].values()]
+    assert fontes and all(fonte["/Subtype"] == "/Type0" for fonte in fontes)  # TrueType, e não as fontes padrão do PDF
+    for fonte in fontes:
+        descritor = fonte["/DescendantFonts"][0].get_object()["/FontDescriptor"]
+        embutida = ttLib.TTFont(BytesIO(descritor["/FontFile2"].get_data()))
+        assert len(embutida.getGlyphOrder()) < 400  # Subconjunto, não o arquivo inteiro
+        mapa, glifos = embutida.getBestCmap(), embutida["glyf"]
+        for caractere in set(TEXTO) - {" "}:
+            assert glifos[mapa[ord(caractere)]].numberOfContours != 0, caractere  # Glifo com desenho
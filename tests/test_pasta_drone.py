@@ -0,0 +1,55 @@
+from io import BytesIO
+import os
+import time
+
+from PIL import Image
+
+import imagens
+import pasta_drone
+from cache_imagens import CacheImagens
+from relatorio_pdf import PERFIS, PREVIA_DPI, PREVIA_QUALIDADE
+
+
+def _copia_terminada(caminho):
+    antigo = time.time() - pasta_drone.ESTABILIDADE - 1
+    os.utime(caminho, (antigo, antigo))
+
+
+def _gravar_foto(caminho, orientacao=1):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    exif = Image.Exif()
+    exif[0x0112] = orientacao
+    exif[0x010F] = "DJI"
+    Image.new("RGB", (1600, 1200), (90, 120, 150)).save(caminho, "JPEG", exif=exif)
+    _copia_terminada(caminho)
+
+
+def test_indexa_e_deixa_os_quadros_de_topico_e_de_pa_no_cache(tmp_path, monkeypatch):
+    pasta = tmp_path / "drone"
+    _gravar_foto(str(pasta / "WTG 01" / "PA1" / "DJI_0001.JPG"), orientacao=6)
+    (pasta / "WTG 01" / "PA1" / "quebrada.jpg").write_bytes(b"nao e uma foto")
+    _copia_terminada(str(pasta / "WTG 01" / "PA1" / "quebrada.jpg"))
+    conexao = pasta_drone.conectar(str(tmp_path / "indice.sqlite"))
+    cache = CacheImagens(str(tmp_path / "cache"))
+
+    assert pasta_drone.varrer(conexao, str(pasta), cache) == (2, 0)
+
+    validas = pasta_drone.fotos(conexao, "WTG 01", 1)
+    assert [(f["nome"], f["pa"]) for f in validas] == [("DJI_0001.JPG", 1)]
+    largura, altura, camera, erro = conexao.execute(
+        "SELECT largura, altura, camera, erro FROM fotos WHERE nome = 'DJI_0001.JPG'"
+    ).fetchone()
+    assert (largura, altura, camera, erro) == (1200, 1600, "DJI", None)  # Orientação do EXIF aplicada
+    assert conexao.execute("SELECT erro FROM fotos WHERE nome = 'quebrada.jpg'").fetchone()[0]
+    assert Image.open(BytesIO(pasta_drone.miniaturas(conexao, [validas[0]["caminho"]])[0])).format == "JPEG"
+
+    # O relatório pede as versões do quadro dos tópicos e do quadro das pás: nenhuma é preparada de novo
+    def nao_prepara(tarefa):
+        raise AssertionError(f"foto preparada fora do cache: {tarefa[1:]}")
+
+    monkeypatch.setattr(imagens, "_preparar_tarefa", nao_prepara)
+    caminho = validas[0]["caminho"]
+    for perfil in PERFIS.values():
+        for quadro in ((86, 56), (76, 46)):
+            imagens.preparar_imagens([(caminho, *quadro, perfil["dpi"], perfil["qualidade"])], cache=cache)
+    imagens.preparar_imagens([(caminho, 86, 56, PREVIA_DPI, PREVIA_QUALIDADE)], cache=cache)
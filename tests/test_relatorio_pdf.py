@@ -0,0 +1,42 @@
+from io import BytesIO
+
+from pypdf import PdfReader
+
+from relatorio_pdf import PDF, inserir_topicos_fotos
+
+
+def _palavras_por_pagina(pdf):
+    leitor = PdfReader(BytesIO(bytes(pdf.output())))
+    return [pagina.extract_text().count("palavra") for pagina in leitor.pages]
+
+
+def test_observacao_maior_que_uma_pagina_comeca_na_pagina_atual():
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_y(200)
+    inserir_topicos_fotos(pdf, {"Superfície do B.A": ([], " ".join(["palavra"] * 3000))})
+    paginas = _palavras_por_pagina(pdf)
+    assert paginas[0] > 0
+    assert all(paginas)
+    assert sum(paginas) == 3000
+
+
+def test_topo_da_pagina_nao_gera_pagina_em_branco():
+    pdf = PDF()
+    pdf.add_page()
+    inserir_topicos_fotos(pdf, {
+        "Superfície do B.A": ([], " ".join(["palavra"] * 3000)),
+        "Bordo de fuga": ([], "palavra"),
+    })
+    paginas = _palavras_por_pagina(pdf)
+    assert all(paginas)
+    assert sum(paginas) == 3001
+
+
+def test_bytes_imagens_inclui_as_imagens_fixas_uma_vez():
+    pdf = PDF()
+    pdf.add_page()
+    pdf.add_page()
+    assert pdf.imagens_inseridas > 0
+    embutidas = {id(info): info for info in pdf.image_cache.images.values() if info["usages"]}
+    assert pdf.bytes_imagens == sum(len(info["data"]) + len(info.get("smask") or b"") for info in embutidas.values())
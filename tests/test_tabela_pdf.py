@@ -0,0 +1,79 @@
+from io import BytesIO
+
+from fpdf import FPDF
+from pypdf import PdfReader
+
+import tabela_pdf
+from tabela_pdf import desenhar_tabela, medir_linhas, quebrar_texto
+
+COLUNAS = [("Localização", 30), ("Descrição dos danos", 100), ("Código", 30)]
+
+
+def _pdf():
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", "", 10)
+    return pdf
+
+
+def _textos_por_pagina(pdf):
+    leitor = PdfReader(BytesIO(bytes(pdf.output())))
+    return [pagina.extract_text() for pagina in leitor.pages]
+
+
+def test_cabecalho_repetido_em_cada_pagina_e_linhas_inteiras():
+    pdf = _pdf()
+    linhas = [[f"L{i}", f"Erosão no ponto {i} " + "com desgaste da pintura " * (i % 4), str(i % 5)] for i in range(120)]
+    desenhar_tabela(pdf, COLUNAS, linhas)
+
+    paginas = _textos_por_pagina(pdf)
+    assert len(paginas) > 2
+    for texto in paginas:
+        assert "Descrição dos danos" in texto
+    # Cada linha aparece uma vez, em ordem, sem ser cortada entre duas páginas
+    marcas = [marca for texto in paginas for marca in texto.split() if marca.startswith("L") and marca[1:].isdigit()]
+    assert marcas == [f"L{i}" for i in range(120)]
+
+
+def test_linhas_nao_passam_do_limite_inferior(monkeypatch):
+    pdf = _pdf()
+    limite = pdf.h - 40
+    fundos = []
+    desenhar = tabela_pdf._desenhar_linha
+
+    def registrar(pdf, larguras, celulas, altura, *args):
+        fundos.append((pdf.page, pdf.get_y() + altura))
+        desenhar(pdf, larguras, celulas, altura, *args)
+
+    monkeypatch.setattr(tabela_pdf, "_desenhar_linha", registrar)
+    desenhar_tabela(pdf, COLUNAS, [[str(i), "texto " * (i % 30), "1"] for i in range(80)], limite)
+    assert len({pagina for pagina, _ in fundos}) > 1
+    assert all(fundo <= limite for _, fundo in fundos)
+
+
+def test_cabecalho_nao_fica_sozinho_no_fim_da_pagina():
+    pdf = _pdf()
+    pdf.set_y(pdf.h - pdf.b_margin - 12)  # Cabe o cabeçalho, mas não a primeira linha
+    desenhar_tabela(pdf, COLUNAS, [["B.A", "Trinca", "4"]])
+    paginas = _textos_por_pagina(pdf)
+    assert "Localização" not in paginas[0]
+    assert "Localização" in paginas[1] and "Trinca" in paginas[1]
+
+
+def test_quebra_palavras_maiores_que_a_coluna_entre_letras():
+    pdf = _pdf()
+    linhas = quebrar_texto(pdf, "curta " + "A" * 80 + " fim", 30)
+    assert "".join(linhas).replace(" ", "") == "curta" + "A" * 80 + "fim"
+    assert all(pdf.get_string_width(linha) <= 30 for linha in linhas)
+    (celulas, altura), = medir_linhas(pdf, [30 + 2 * pdf.c_margin], [["curta " + "A" * 80 + " fim"]])
+    assert celulas[0] == linhas and altura == len(linhas) * 5 + 5
+
+
+def test_larguras_guardadas_nao_sao_medidas_de_novo(monkeypatch):
+    pdf = _pdf()
+    medidas = []
+    medir = pdf.get_string_width
+    monkeypatch.setattr(pdf, "get_string_width", lambda texto: medidas.append(texto) or medir(texto))
+    tabela = {"\u200b": 0.0}  # Largura zero também é uma medida guardada
+    tabela_pdf._quebrar(pdf, tabela, "\u200b palavra \u200b palavra", 50)
+    assert sorted(medidas) == [" ", "palavra"]